@@ -1,13 +1,29 @@
 import argparse
+import csv
+import json
 import os
+import signal
 import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
-from core.state import MoodEngine
+from core.replay import ReplayTimings, SimulatedClock, replay
+from core.scorecache import ScoreCache
+from core.sentiment import scoring_version, set_score_cache
+from core.state import SLEEP_TIMEOUT_SECONDS, MoodEngine
 from parsers.claude_code import ClaudeCodeParser
 from parsers.opencode import OpenCodeParser
 from watcher.monitor import AgentMonitor, WatcherLoop
-from server.app import run_server, set_watcher
+from watcher.store import MoodStore
+from server.app import (
+    DEFAULT_CONNECTION_TIMEOUT, DEFAULT_WORKERS, run_server, set_poll_logger, set_profiler,
+    set_watcher,
+)
+from server.polllog import PollLogger
+from server.profiler import DEFAULT_HZ, SamplingProfiler
+from sprites.manifest import SpriteManifest
+from sprites.reloader import AssetWatcher
 
 
 def main() -> None:
@@ -22,16 +38,94 @@ def main() -> None:
         "--host", type=str, default="0.0.0.0", help="HTTP server host (default: 0.0.0.0)"
     )
     parser.add_argument(
-        "--interval", type=float, default=10.0, help="File poll interval in seconds (default: 10)"
+        "--interval", type=float, default=10.0,
+        help="Initial file poll interval in seconds (default: 10)"
+    )
+    parser.add_argument(
+        "--min-interval", type=float, default=0.5,
+        help="Poll interval right after a session changes (default: 0.5)"
+    )
+    parser.add_argument(
+        "--max-interval", type=float, default=60.0,
+        help="Longest poll interval an idle agent backs off to (default: 60)"
     )
     parser.add_argument(
         "--no-sleep", action="store_true", help="Never return sleeping=true (for battery testing)"
     )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS,
+        help=f"HTTP worker threads, 0 for single-threaded (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        "--connection-timeout", type=float, default=DEFAULT_CONNECTION_TIMEOUT,
+        help=f"Idle/stalled connection timeout in seconds (default: {DEFAULT_CONNECTION_TIMEOUT:g})"
+    )
+    parser.add_argument(
+        "--no-sprite-reload", action="store_true", help="Don't watch sprite assets for changes"
+    )
+    parser.add_argument(
+        "--profiler", action="store_true",
+        default=os.environ.get("MOODBOT_PROFILER", "") not in ("", "0"),
+        help="Enable the /debug/profile sampling profiler endpoint (or MOODBOT_PROFILER=1)"
+    )
+    parser.add_argument(
+        "--profile-hz", type=float, default=DEFAULT_HZ,
+        help=f"Default profiler sampling rate in Hz (default: {DEFAULT_HZ:g})"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay a session through the mood engine and print the mood timeline",
+        description="Replay a Claude Code JSONL or OpenCode database session through the mood "
+                    "engine on a simulated clock, as fast as possible, and print every mood it "
+                    "produces. A per-stage timing breakdown goes to stderr.",
+    )
+    replay_parser.add_argument("path", type=Path, help="Claude Code .jsonl file or OpenCode database")
+    replay_parser.add_argument(
+        "--agent", choices=("claude-code", "opencode"),
+        help="Log format (default: claude-code for .jsonl files, opencode otherwise)"
+    )
+    replay_parser.add_argument(
+        "--session", help="OpenCode session id (default: the most recently updated session)"
+    )
+    replay_parser.add_argument(
+        "--format", choices=("csv", "json"), default="csv",
+        help="csv, or json for one object per line (default: csv)"
+    )
+    replay_parser.add_argument(
+        "--output", "-o", type=Path, help="Write the timeline here instead of stdout"
+    )
+    replay_parser.add_argument(
+        "--changes-only", action="store_true",
+        help="Only emit steps where activity, emotion or sleeping changed"
+    )
+    replay_parser.add_argument(
+        "--sleep-timeout", type=float, default=SLEEP_TIMEOUT_SECONDS,
+        help=f"Seconds of inactivity before sleeping (default: {SLEEP_TIMEOUT_SECONDS})"
+    )
     args = parser.parse_args()
 
+    if args.command == "replay":
+        run_replay(args)
+        return
+
     sleep_timeout = float("inf") if args.no_sleep else None
     engine_kwargs = {"sleep_timeout": sleep_timeout} if sleep_timeout else {}
 
+    sprites = SpriteManifest()
+    sprites.warm_up()
+    engine_kwargs["sprites"] = sprites
+    sprite_watcher = None
+    if not args.no_sprite_reload:
+        sprite_watcher = AssetWatcher(sprites)
+        sprite_watcher.start()
+
+    score_cache = None
+    score_cache_path = os.environ.get("MOODBOT_SCORE_CACHE")
+    if score_cache_path:
+        score_cache = ScoreCache(Path(score_cache_path), version=scoring_version())
+        score_cache.start()
+        set_score_cache(score_cache)
+
     claude_path = os.environ.get("CLAUDE_PROJECTS_PATH")
     claude_base = Path(claude_path) if claude_path else None
 
@@ -43,25 +137,125 @@ def main() -> None:
         AgentMonitor("opencode", OpenCodeParser(db_path=opencode_db_path), engine=MoodEngine(**engine_kwargs)),
     ]
 
-    watcher = WatcherLoop(monitors, interval=args.interval)
+    mood_store = None
+    mood_store_path = os.environ.get("MOODBOT_MOOD_STORE")
+    if mood_store_path:
+        mood_store = MoodStore(Path(mood_store_path))
+        mood_store.start()
+
+    checkpoint = os.environ.get("MOODBOT_CHECKPOINT")
+    watcher = WatcherLoop(monitors, store=mood_store,
+                          interval=args.interval, min_interval=args.min_interval,
+                          max_interval=args.max_interval,
+                          checkpoint_path=Path(checkpoint) if checkpoint else None)
     set_watcher(watcher)
+    if sprite_watcher:
+        sprite_watcher.on_reload = watcher.refresh_sprites
+
+    poll_logger = None
+    battery_log = os.environ.get("MOODBOT_BATTERY_LOG")
+    if battery_log:
+        poll_logger = PollLogger(
+            Path(battery_log), fmt=os.environ.get("MOODBOT_BATTERY_LOG_FORMAT", "text")
+        )
+        poll_logger.start()
+        set_poll_logger(poll_logger)
+
+    if args.profiler:
+        set_profiler(SamplingProfiler(hz=args.profile_hz))
 
     watcher.start()
     print(f"Moodbot server starting on {args.host}:{args.port}")
     print(f"Agents: {', '.join(watcher.agent_names)}")
-    print(f"Poll interval: {args.interval}s")
+    print(f"Poll interval: {args.min_interval:g}-{args.max_interval:g}s (adaptive)")
     if args.no_sleep:
         print("Sleep disabled (battery test mode)")
+    if args.profiler:
+        print(f"Profiler enabled: curl 'http://localhost:{args.port}/debug/profile?seconds=10'")
     print(f"Try: curl http://localhost:{args.port}/mood/claude-code")
 
-    server = run_server(host=args.host, port=args.port)
+    # Shut down (and write the checkpoint) on SIGTERM as on Ctrl-C.
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    server = run_server(host=args.host, port=args.port, workers=args.workers,
+                        connection_timeout=args.connection_timeout)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down...")
         watcher.stop()
+        if sprite_watcher:
+            sprite_watcher.stop()
+        if poll_logger:
+            poll_logger.close()
+        if score_cache:
+            score_cache.close()
+        if mood_store:
+            mood_store.close()
         server.shutdown()
 
 
+REPLAY_COLUMNS = ("time", "activity", "emotion", "variant", "sleeping", "score", "trigger")
+
+
+def run_replay(args) -> None:
+    agent = args.agent or ("claude-code" if args.path.suffix == ".jsonl" else "opencode")
+    if not args.path.exists():
+        sys.exit(f"moodbot replay: {args.path} does not exist")
+    if agent == "claude-code":
+        messages = ClaudeCodeParser(base_path=args.path.parent).iter_messages(args.path)
+    else:
+        parser = OpenCodeParser(db_path=args.path)
+        messages = parser.iter_messages(Path(args.session) if args.session else args.path)
+
+    # Resolve every sprite up front so lookups in the replay are table hits.
+    sprites = SpriteManifest()
+    sprites.warm_up(background=False)
+    clock = SimulatedClock()
+    engine = MoodEngine(sleep_timeout=args.sleep_timeout, sprites=sprites, clock=clock)
+    timings = ReplayTimings()
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(out) if args.format == "csv" else None
+    if writer:
+        writer.writerow(REPLAY_COLUMNS)
+
+    start = time.perf_counter()
+    steps = emitted = 0
+    last = None
+    try:
+        for step in replay(messages, engine, clock, path=args.path, timings=timings):
+            steps += 1
+            mood = step.mood
+            state = (mood.activity, mood.emotion, mood.sleeping)
+            if args.changes_only and state == last:
+                continue
+            last = state
+            emitted += 1
+            row = (
+                datetime.fromtimestamp(step.time, timezone.utc).isoformat(timespec="milliseconds"),
+                mood.activity, mood.emotion, mood.variant, mood.sleeping,
+                round(mood.sentiment_score, 4),
+                step.message.role if step.message else "sleep",
+            )
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(REPLAY_COLUMNS, row))) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{steps} steps ({emitted} emitted) in {elapsed:.3f}s"
+          f" ({steps / elapsed if elapsed else 0:,.0f} steps/s)", file=sys.stderr)
+    for stage, seconds in timings.to_dict().items():
+        share = seconds / elapsed if elapsed else 0
+        print(f"  {stage:<8} {seconds:8.3f}s {share:6.1%}", file=sys.stderr)
+
+
+def _interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
 if __name__ == "__main__":
     main()
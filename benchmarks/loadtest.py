@@ -0,0 +1,123 @@
+"""Simulated device load test for the mood server.
+
+Starts an in-process server on a synthetic Claude Code session (or targets
+--url) and has N simulated devices poll /mood/<agent> concurrently, each on
+its own keep-alive connection, reporting p50/p99 latency.
+
+    python benchmarks/loadtest.py --devices 100 --polls 20
+    python benchmarks/loadtest.py --url http://moodbot.local:9400 --devices 30
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers.claude_code import ClaudeCodeParser  # noqa: E402
+from server.app import DEFAULT_WORKERS, run_server, set_watcher  # noqa: E402
+from watcher.monitor import AgentMonitor, WatcherLoop  # noqa: E402
+
+
+def _local_server(workers: int):
+    tmp = Path(tempfile.mkdtemp(prefix="moodbot-load-"))
+    project = tmp / "proj"
+    project.mkdir()
+    entry = {
+        "type": "assistant",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": [
+            {"type": "text", "text": "This is a wonderful and helpful response"},
+        ]},
+    }
+    (project / "session.jsonl").write_text(json.dumps(entry) + "\n")
+
+    watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp))])
+    watcher.poll_all()
+    set_watcher(watcher)
+    server = run_server(host="127.0.0.1", port=0, workers=workers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _device(base: str, agent: str, polls: int, interval: float,
+            latencies: list, errors: list, lock: threading.Lock) -> None:
+    url = urlparse(base)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    for _ in range(polls):
+        start = time.perf_counter()
+        try:
+            conn.request("GET", f"/mood/{agent}?poll={interval:g}&fw=load&vbat=4.10")
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException) as e:
+            with lock:
+                errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+            continue
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(f"HTTP {resp.status}")
+        if interval:
+            time.sleep(interval)
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Target server (default: start one in-process)")
+    parser.add_argument("--agent", default="claude-code")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--polls", type=int, default=20, help="Requests per device")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="Pause between a device's polls in seconds")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Worker threads for the in-process server")
+    args = parser.parse_args()
+
+    server = None
+    base = args.url
+    if not base:
+        server, base = _local_server(args.workers)
+
+    latencies: list[float] = []
+    errors: list[str] = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_device, args=(base, args.agent, args.polls, args.interval,
+                                               latencies, errors, lock))
+        for _ in range(args.devices)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    if server:
+        server.shutdown()
+
+    print(f"devices={args.devices} requests={len(latencies)} errors={len(errors)} "
+          f"wall={wall:.2f}s rps={len(latencies) / wall:.0f}")
+    if len(latencies) >= 2:
+        pct = statistics.quantiles(latencies, n=100)
+        print(f"p50={pct[49] * 1000:.2f}ms p90={pct[89] * 1000:.2f}ms "
+              f"p99={pct[98] * 1000:.2f}ms max={max(latencies) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
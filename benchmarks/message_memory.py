@@ -0,0 +1,88 @@
+"""Measure bytes per ParsedMessage, before and after the slotted layout.
+
+Builds a corpus the way the parsers do (a fresh datetime and fresh role and
+tool-name strings per message, as json.loads hands them out) once with the
+old plain dataclass and once with ParsedMessage, and reports the memory
+tracemalloc attributes to each, with and without the message text.
+
+    python benchmarks/message_memory.py --messages 1000000
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers.base import Activity, ParsedMessage  # noqa: E402
+
+TOOLS = ("Read", "Edit", "Bash", "Grep", None)
+ACTIVITIES = (Activity.READING, Activity.EDITING, Activity.EXECUTING,
+              Activity.READING, Activity.CONVERSING)
+START = datetime(2026, 2, 20, tzinfo=timezone.utc)
+
+
+@dataclass
+class LegacyParsedMessage:
+    timestamp: datetime
+    text: str
+    activity: Activity
+    tool_name: Optional[str] = None
+    role: str = "assistant"
+    is_error: bool = False
+
+
+def _fresh(s: Optional[str]) -> Optional[str]:
+    # json.loads returns a new str object for every occurrence.
+    return "".join(list(s)) if s else s
+
+
+def _corpus(factory: Callable, n: int) -> list:
+    messages = []
+    for i in range(n):
+        messages.append(factory(
+            timestamp=START + timedelta(milliseconds=i * 1500),
+            text=f"Step {i}: updated the parser and the tests pass again",
+            activity=ACTIVITIES[i % 5],
+            tool_name=_fresh(TOOLS[i % 5]),
+            role=_fresh("assistant"),
+        ))
+    return messages
+
+
+def _measure(factory: Callable, n: int, drop_text: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    messages = _corpus(factory, n)
+    if drop_text:
+        for msg in messages:
+            msg.sentiment = (0.0, 0.2)
+            msg.drop_text()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del messages
+    return size / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    legacy = _measure(LegacyParsedMessage, args.messages, drop_text=False)
+    slotted = _measure(ParsedMessage, args.messages, drop_text=False)
+    dropped = _measure(ParsedMessage, args.messages, drop_text=True)
+    print(f"{args.messages} messages, bytes per message:")
+    print(f"  dataclass            {legacy:7.1f}")
+    print(f"  slotted              {slotted:7.1f} ({slotted / legacy - 1:+.0%})")
+    print(f"  slotted, text freed  {dropped:7.1f} ({dropped / legacy - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
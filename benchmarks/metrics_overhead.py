@@ -0,0 +1,115 @@
+"""Measure what metrics instrumentation costs per monitor poll.
+
+Polls a synthetic Claude Code session alternately with instrumentation
+enabled and with Histogram.observe / Counter.inc stubbed out (interleaved so
+drift hits both sides equally), and also times the per-poll instrumentation
+work on its own, which is far less noisy than the end-to-end difference.
+Polls find the session unchanged, as nearly all do; ``--parse`` bumps the
+mtime first so every poll parses and computes.
+
+    python benchmarks/metrics_overhead.py --messages 100 --polls 5000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.metrics import Counter, Histogram, MetricsRegistry  # noqa: E402
+from parsers.claude_code import ClaudeCodeParser  # noqa: E402
+from watcher.monitor import QUIET_POLL_SAMPLE, AgentMonitor  # noqa: E402
+
+
+def _session(messages: int) -> tuple[Path, Path]:
+    tmp = Path(tempfile.mkdtemp(prefix="moodbot-metrics-"))
+    project = tmp / "proj"
+    project.mkdir()
+    lines = [
+        json.dumps({
+            "type": "assistant",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": [
+                {"type": "text", "text": f"Step {i}: the change looks good and tests pass"},
+                {"type": "tool_use", "name": "Bash", "input": {"command": "pytest"}},
+            ]},
+        })
+        for i in range(messages)
+    ]
+    (project / "session.jsonl").write_text("\n".join(lines) + "\n")
+    return tmp, project / "session.jsonl"
+
+
+def _timed_poll(monitor: AgentMonitor, session: Path, parse: bool) -> float:
+    if parse:
+        stat = session.stat()
+        os.utime(session, (stat.st_atime, stat.st_mtime + 1))
+    start = time.perf_counter()
+    monitor.poll()
+    return time.perf_counter() - start
+
+
+def _instrumentation_cost(parse: bool, rounds: int = 20000) -> float:
+    """The metrics work of one poll, timed on a private registry.
+
+    A parsing poll makes five timed histogram observations and a counter
+    increment; an unchanged one reads the clock once, and every
+    QUIET_POLL_SAMPLE-th also times two observations and flushes the
+    batched count.
+    """
+    registry = MetricsRegistry()
+    hist = registry.histogram("h", "H", ("agent",))
+    counter = registry.counter("c", "C", ("agent", "result"))
+    start = time.perf_counter()
+    for i in range(rounds):
+        t = time.perf_counter()
+        if parse:
+            for _ in range(5):
+                hist.observe(time.perf_counter() - t, "bench")
+            counter.inc("bench", "changed")
+        elif (i + 1) % QUIET_POLL_SAMPLE == 0:
+            for _ in range(2):
+                hist.observe(time.perf_counter() - t, "bench")
+            counter.inc("bench", "unchanged", amount=QUIET_POLL_SAMPLE)
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--polls", type=int, default=5000)
+    parser.add_argument("--parse", action="store_true",
+                        help="bump the mtime so every poll parses the session")
+    args = parser.parse_args()
+
+    base, session = _session(args.messages)
+    monitor = AgentMonitor("bench", ClaudeCodeParser(base_path=base))
+    monitor.poll()
+
+    observe, inc = Histogram.observe, Counter.inc
+    instrumented, bare = [], []
+    try:
+        for _ in range(args.polls):
+            Histogram.observe, Counter.inc = observe, inc
+            instrumented.append(_timed_poll(monitor, session, args.parse))
+            Histogram.observe = lambda self, value, *labels: None
+            Counter.inc = lambda self, *labels, amount=1: None
+            bare.append(_timed_poll(monitor, session, args.parse))
+    finally:
+        Histogram.observe, Counter.inc = observe, inc
+
+    with_metrics, without = statistics.median(instrumented), statistics.median(bare)
+    cost = _instrumentation_cost(args.parse)
+    print(f"poll median: instrumented={with_metrics * 1e6:.1f}us bare={without * 1e6:.1f}us "
+          f"difference={(with_metrics - without) / without:+.2%}")
+    print(f"instrumentation per poll: {cost * 1e6:.2f}us ({cost / without:.2%} of a bare poll)")
+
+
+if __name__ == "__main__":
+    main()
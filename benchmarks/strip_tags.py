@@ -0,0 +1,64 @@
+"""Compare the system tag scanner with the regex it replaced.
+
+Runs both over pathological inputs (many openers with no closer, openers
+cut off before their ``>``, one huge reminder block) and a typical
+message, doubling the size each round so quadratic behaviour shows up as
+a 4x step instead of 2x.
+
+    python benchmarks/strip_tags.py --size 1000 --rounds 3
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers.claude_code import strip_system_tags  # noqa: E402
+
+SYSTEM_TAGS = re.compile(
+    r"<(system-reminder|task-notification|user-prompt-submit-hook)[^>]*>.*?"
+    r"</(system-reminder|task-notification|user-prompt-submit-hook)>",
+    re.DOTALL,
+)
+
+INPUTS: dict[str, Callable[[int], str]] = {
+    "unterminated": lambda n: "<system-reminder>x" * n,
+    "no-gt": lambda n: "<task-notification" * n,
+    "huge-block": lambda n: ("<system-reminder>" + "reminder text " * (n * 10)
+                             + "</system-reminder>All tests pass now."),
+    "typical": lambda n: ("Fixed the parser. " * (n // 10)
+                          + "<system-reminder>Use the todo list.</system-reminder>"),
+}
+
+
+def _time(fn: Callable[[str], str], text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, make in INPUTS.items():
+        for r in range(args.rounds):
+            text = make(args.size << r)
+            assert SYSTEM_TAGS.sub("", text) == strip_system_tags(text)
+            regex = _time(lambda t: SYSTEM_TAGS.sub("", t), text)
+            scan = _time(strip_system_tags, text)
+            print(f"{name:>12} {len(text):>9} chars: regex={regex * 1e3:8.2f}ms "
+                  f"scan={scan * 1e3:7.3f}ms ({regex / scan:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
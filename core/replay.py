@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from parsers.base import ParsedMessage, ParsedSession
+from .sentiment import score_message
+from .state import MoodEngine, MoodState
+
+# Messages held back to put slightly out-of-order transcripts in time order.
+REORDER_WINDOW = 64
+
+
+class SimulatedClock:
+    """A clock for ``MoodEngine`` that only moves when the replay moves it."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@dataclass
+class ReplayTimings:
+    """Seconds spent per replay stage.
+
+    ``read`` is pulling messages from the parser, ``score`` sentiment
+    scoring, ``window`` assembling what the engine reads, ``compute`` the
+    rest of ``MoodEngine.compute`` apart from the sprite ``lookup``, and
+    ``emit`` the consumer's time between steps.
+    """
+
+    read: float = 0.0
+    score: float = 0.0
+    window: float = 0.0
+    compute: float = 0.0
+    lookup: float = 0.0
+    emit: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return sum(getattr(self, f.name) for f in fields(self))
+
+    def to_dict(self) -> dict[str, float]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass(frozen=True)
+class ReplayStep:
+    """The mood after ``message`` arrived at simulated ``time``, or after falling asleep."""
+
+    time: float
+    mood: MoodState
+    message: Optional[ParsedMessage] = None
+
+
+def in_time_order(messages: Iterable[ParsedMessage],
+                  window: int = REORDER_WINDOW) -> Iterator[ParsedMessage]:
+    """``messages`` sorted by timestamp, as long as none is more than ``window`` out of place."""
+    heap: list[tuple[int, int, ParsedMessage]] = []
+    seq = itertools.count()
+    for msg in messages:
+        heapq.heappush(heap, (msg.epoch_ms, next(seq), msg))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def replay(messages: Iterable[ParsedMessage], engine: MoodEngine, clock: SimulatedClock,
+           path: Path = Path("replay"),
+           timings: Optional[ReplayTimings] = None) -> Iterator[ReplayStep]:
+    """Run ``messages`` through ``engine`` one at a time, yielding every resulting mood.
+
+    ``engine`` must read ``clock``. The clock is set to each message's
+    timestamp, which also stands in for the file's mtime, so sleep is
+    judged as it would have been live; when the gap before the next
+    message (or the end of the transcript) passes the sleep timeout, an
+    extra step without a message is yielded at the time it fell asleep.
+    """
+    timings = timings if timings is not None else ReplayTimings()
+    recent: deque[ParsedMessage] = deque(maxlen=engine.window)
+    session: Optional[ParsedSession] = None
+    asleep = False
+    pending = iter(in_time_order(messages))
+
+    def compute(now: float) -> MoodState:
+        clock.now = now
+        start = time.perf_counter()
+        mood = engine.compute(session)
+        timings.compute += time.perf_counter() - start - engine.last_lookup_seconds
+        timings.lookup += engine.last_lookup_seconds
+        return mood
+
+    while True:
+        start = time.perf_counter()
+        msg = next(pending, None)
+        timings.read += time.perf_counter() - start
+        at = None if msg is None else max(msg.epoch_ms / 1000, clock.now)
+
+        if session is not None and not asleep:
+            sleep_at = engine.sleep_at(session)
+            if math.isfinite(sleep_at) and (at is None or sleep_at <= at):
+                mood = compute(max(sleep_at, clock.now))
+                asleep = mood.sleeping
+                start = time.perf_counter()
+                yield ReplayStep(clock.now, mood)
+                timings.emit += time.perf_counter() - start
+        if msg is None:
+            return
+
+        start = time.perf_counter()
+        if msg.role in ("assistant", "user") and msg.has_text:
+            score_message(msg)
+        timings.score += time.perf_counter() - start
+
+        start = time.perf_counter()
+        recent.append(msg)
+        session = ParsedSession(file_path=path, messages=list(recent),
+                                last_modified=at)
+        timings.window += time.perf_counter() - start
+
+        mood = compute(at)
+        asleep = mood.sleeping
+        start = time.perf_counter()
+        yield ReplayStep(at, mood, msg)
+        timings.emit += time.perf_counter() - start
@@ -0,0 +1,152 @@
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_QUEUE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS scores (
+    entry_id TEXT PRIMARY KEY,
+    text_crc INTEGER NOT NULL,
+    raw_score REAL NOT NULL,
+    weight REAL NOT NULL
+);
+"""
+
+# (entry_id, text_crc, raw_score, weight)
+Row = tuple[str, int, float, float]
+
+
+class ScoreCache:
+    """Sentiment scores kept on disk across restarts, keyed by transcript entry id.
+
+    Each row also stores a CRC of the scored text, so an entry whose text
+    has grown since (a reply still streaming in) misses instead of
+    returning a stale score. The cache is stamped with ``version``; opening
+    it with a different one discards every row. Lookups read SQLite on the
+    caller's thread; new scores are queued and written in batches by a
+    background thread, and dropped if the queue is full.
+    """
+
+    def __init__(self, path: Path, version: str,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.path = Path(path)
+        self.version = version
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        # Queued but not yet written, so a lookup right after put() still hits.
+        self._pending: dict[str, Row] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if not row or row[0] != self.version:
+            with conn:
+                conn.execute("DELETE FROM scores")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+        self._conn = conn
+        self._thread = threading.Thread(target=self._run, name="moodbot-scorecache", daemon=True)
+        self._thread.start()
+
+    def get(self, entry_id: str, text_crc: int) -> Optional[tuple[float, float]]:
+        with self._lock:
+            row = self._pending.get(entry_id)
+            if row is None and self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT entry_id, text_crc, raw_score, weight FROM scores WHERE entry_id = ?",
+                        (entry_id,),
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+        if row is None or row[1] != text_crc:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[2], row[3]
+
+    def put(self, entry_id: str, text_crc: int, raw_score: float, weight: float) -> None:
+        row = (entry_id, text_crc, raw_score, weight)
+        with self._lock:
+            self._pending[entry_id] = row
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            with self._lock:
+                if self._pending.get(entry_id) is row:
+                    del self._pending[entry_id]
+
+    def close(self) -> None:
+        """Write everything queued so far and stop the writer."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                batch: list[Row] = []
+                deadline = time.monotonic() + self.flush_interval
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        stop = True
+                        break
+                    batch.append(row)
+                if batch:
+                    self._write(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list[Row]) -> None:
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)", batch)
+        except sqlite3.Error:
+            self.dropped += len(batch)
+        with self._lock:
+            for row in batch:
+                if self._pending.get(row[0]) is row:
+                    del self._pending[row[0]]
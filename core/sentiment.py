@@ -1,6 +1,9 @@
+import hashlib
 import math
 import re
+import zlib
 from enum import Enum
+from typing import Optional
 
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
@@ -51,10 +54,43 @@ BAND_CENTERS = {
     EmotionBand.ELATED: 0.60,
 }
 
+# Sprite variants drawn per band; MoodEngine rotates through them.
+VARIANT_COUNTS = {
+    EmotionBand.NEGATIVE: 1,
+    EmotionBand.UNEASY: 2,
+    EmotionBand.NEUTRAL: 4,
+    EmotionBand.POSITIVE: 4,
+    EmotionBand.ELATED: 1,
+}
+
 HYSTERESIS = 0.08
 WINDOW_SIZE = 15
 
+# Bump when score_text or emotional_weight change in a way the regexes
+# and lexicon below don't capture; cached scores are then discarded.
+SCORE_VERSION = 1
+
 _analyzer = SentimentIntensityAnalyzer()
+_score_cache = None
+
+
+def scoring_version() -> str:
+    """Fingerprint of everything a cached (raw_score, weight) depends on."""
+    digest = hashlib.sha1(f"v{SCORE_VERSION}".encode())
+    for pattern in (EMOTIONAL_PUNCTUATION, EPISTEMIC_PHRASES, POSITIVE_ADJECTIVES,
+                    NEGATIVE_ADJECTIVES, UNCERTAINTY_WORDS, CODE_BLOCKS, INLINE_CODE,
+                    TECHNICAL_KEYWORDS, TECHNICAL_PUNCTUATION):
+        digest.update(pattern.pattern.encode())
+    # vaderSentiment keeps the lexicon file's contents in these attributes.
+    for source in ("lexicon_full_filepath", "emoji_full_filepath"):
+        digest.update(str(getattr(_analyzer, source, "")).encode())
+    return digest.hexdigest()
+
+
+def set_score_cache(cache) -> None:
+    """Consult ``cache`` (a ScoreCache, or None) for messages with an entry id."""
+    global _score_cache
+    _score_cache = cache
 
 
 def score_text(text: str) -> float:
@@ -91,6 +127,27 @@ def emotional_weight(text: str) -> float:
     return max(0.2, min(1.0, weight))
 
 
+def score_message(msg) -> tuple[float, float]:
+    """``(raw_score, weight)`` for a ParsedMessage, cached on the message.
+
+    With a score cache set, messages that carry an entry id are looked up
+    there first, so a restart doesn't re-score the whole window.
+    """
+    if msg.sentiment is not None:
+        return msg.sentiment
+    cache = _score_cache
+    if cache is None or not msg.entry_id:
+        msg.sentiment = (score_text(msg.text), emotional_weight(msg.text))
+        return msg.sentiment
+    crc = zlib.crc32(msg.text.encode())
+    scored: Optional[tuple[float, float]] = cache.get(msg.entry_id, crc)
+    if scored is None:
+        scored = (score_text(msg.text), emotional_weight(msg.text))
+        cache.put(msg.entry_id, crc, *scored)
+    msg.sentiment = scored
+    return scored
+
+
 def score_to_band(score: float) -> EmotionBand:
     for threshold, band in BAND_THRESHOLDS:
         if score < threshold:
@@ -119,8 +176,10 @@ class SentimentScorer:
         if not text.strip():
             return self._current_band
 
-        raw_score = score_text(text)
-        weight = emotional_weight(text)
+        return self.add_score(score_text(text), emotional_weight(text))
+
+    def add_score(self, raw_score: float, weight: float) -> EmotionBand:
+        """Like ``add_message`` for text that has already been scored."""
         self._scores.append((raw_score, weight))
 
         if len(self._scores) > self.window_size:
@@ -1,5 +1,5 @@
 from parsers.base import ParsedMessage
-from .sentiment import score_text, emotional_weight
+from .sentiment import score_message
 
 FAILURE_PER_ERROR = -0.03
 FAILURE_CONSECUTIVE_BONUS = -0.05
@@ -34,11 +34,9 @@ def compute_context_modifier(messages: list[ParsedMessage]) -> float:
     for msg in messages:
         if msg.role != "user":
             continue
-        if not msg.text.strip():
+        if not msg.has_text:
             continue
-        raw = score_text(msg.text)
-        weight = emotional_weight(msg.text)
-        user_scores.append((raw, weight))
+        user_scores.append(score_message(msg))
 
     if not user_scores:
         return 0.0
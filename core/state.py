@@ -2,20 +2,12 @@ import random
 import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Optional
 
 from parsers.base import Activity, ParsedMessage, ParsedSession
 from sprites.manifest import SpriteManifest
-from .sentiment import EmotionBand, SentimentScorer, score_to_band
-from .signals import compute_failure_modifier, compute_context_modifier
-
-VARIANT_COUNTS = {
-    EmotionBand.NEGATIVE: 1,
-    EmotionBand.UNEASY: 2,
-    EmotionBand.NEUTRAL: 4,
-    EmotionBand.POSITIVE: 4,
-    EmotionBand.ELATED: 1,
-}
+from .sentiment import VARIANT_COUNTS, EmotionBand, SentimentScorer, score_message, score_to_band
+from .signals import compute_context_modifier, compute_failure_modifier
 
 EMOJI_MATRIX: dict[tuple[str, str], str] = {
     ("thinking", "negative"): "\U0001f623",   # 😣
@@ -53,6 +45,7 @@ EMOJI_MATRIX: dict[tuple[str, str], str] = {
 SLEEPING_EMOJI = "\U0001f634"
 
 SLEEP_TIMEOUT_SECONDS = 30 * 60
+MAX_MESSAGES = 100
 
 
 @dataclass
@@ -81,19 +74,31 @@ class MoodState:
 
 class MoodEngine:
     def __init__(self, sleep_timeout: int = SLEEP_TIMEOUT_SECONDS,
-                 sprites: Optional[SpriteManifest] = None):
+                 sprites: Optional[SpriteManifest] = None,
+                 keep_text: bool = True,
+                 clock: Callable[[], float] = time.time):
         self.scorer = SentimentScorer()
         self.sleep_timeout = sleep_timeout
+        # Unix time source for sleep detection; replays pass a simulated one.
+        self.clock = clock
+        # Without keep_text, message text is released once scored; the
+        # cached (raw_score, weight) is all a later compute() needs.
+        self.keep_text = keep_text
         self.sprites = sprites or SpriteManifest()
         self._last_activity = Activity.THINKING
         self._last_variant: dict[tuple[str, str], int] = {}
+        self.last_lookup_seconds = 0.0
+        # How many recent messages compute() reads. The sentiment window is
+        # only the newest assistant messages, but both modifiers read every
+        # error and user turn in this window.
+        self.window = MAX_MESSAGES
 
     def compute(self, session: ParsedSession) -> MoodState:
         self.scorer.reset()
 
         for msg in session.messages:
-            if msg.role == "assistant" and msg.text:
-                self.scorer.add_message(msg.text)
+            if msg.role == "assistant" and msg.has_text:
+                self.scorer.add_score(*score_message(msg))
             if msg.role == "assistant":
                 self._last_activity = msg.activity
 
@@ -101,6 +106,9 @@ class MoodEngine:
         failure_mod = compute_failure_modifier(session.messages)
         context_mod = compute_context_modifier(session.messages)
         modified_score = base_score + failure_mod + context_mod
+        if not self.keep_text:
+            for msg in session.messages:
+                msg.drop_text()
 
         emotion = score_to_band(modified_score)
         activity = self._last_activity
@@ -108,9 +116,11 @@ class MoodEngine:
 
         variant = self._pick_variant(activity, emotion)
 
+        lookup_start = time.perf_counter()
         bitmap = self.sprites.lookup(
             activity.value, emotion.value, variant, sleeping=sleeping
         )
+        self.last_lookup_seconds = time.perf_counter() - lookup_start
 
         if sleeping:
             emoji = SLEEPING_EMOJI
@@ -131,21 +141,40 @@ class MoodEngine:
             sentiment_score=modified_score,
         )
 
-    def _is_sleeping(self, session: ParsedSession) -> bool:
-        if session.last_modified:
-            file_elapsed = time.time() - session.last_modified
-            if file_elapsed < self.sleep_timeout:
-                return False
+    def checkpoint(self) -> dict:
+        """What ``compute`` carries from one call to the next."""
+        return {
+            "last_activity": self._last_activity.value,
+            "last_variant": [[a, e, v] for (a, e), v in self._last_variant.items()],
+        }
 
+    def restore(self, data: dict) -> None:
+        try:
+            self._last_activity = Activity(data["last_activity"])
+            self._last_variant = {(a, e): v for a, e, v in data["last_variant"]}
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def sleep_at(self, session: ParsedSession) -> float:
+        """Unix time at which ``session`` falls asleep if nothing new happens.
+
+        Asleep once both the file's mtime and the last message are older than
+        the timeout; a session with neither is asleep already.
+        """
+        candidates = []
+        if session.last_modified:
+            candidates.append(session.last_modified + self.sleep_timeout)
         last_time = session.last_activity_time
-        if not last_time:
-            return True
-        now = datetime.now(timezone.utc)
-        if last_time.tzinfo is None:
-            from datetime import timezone as tz
-            last_time = last_time.replace(tzinfo=tz.utc)
-        elapsed = (now - last_time).total_seconds()
-        return elapsed > self.sleep_timeout
+        if last_time:
+            if last_time.tzinfo is None:
+                last_time = last_time.replace(tzinfo=timezone.utc)
+            candidates.append(last_time.timestamp() + self.sleep_timeout)
+        elif not session.last_modified:
+            return float("-inf")
+        return max(candidates)
+
+    def _is_sleeping(self, session: ParsedSession) -> bool:
+        return self.clock() >= self.sleep_at(session)
 
     def _pick_variant(self, activity: Activity, emotion: EmotionBand) -> int:
         max_variants = VARIANT_COUNTS.get(emotion, 1)
@@ -1,9 +1,14 @@
+import itertools
+import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MS = timedelta(milliseconds=1)
 
 
 class Activity(Enum):
@@ -15,14 +20,65 @@ class Activity(Enum):
     SYSTEM = "system"
 
 
-@dataclass
 class ParsedMessage:
-    timestamp: datetime
-    text: str
-    activity: Activity
-    tool_name: Optional[str] = None
-    role: str = "assistant"
-    is_error: bool = False
+    """One message from a transcript, kept small since many can be alive at once.
+
+    Slotted, with the role and tool name interned. The timestamp is kept
+    as given, a datetime (naive means UTC) or UTC epoch milliseconds, and
+    ``timestamp`` / ``epoch_ms`` convert only when the other form is read:
+    parsers hand over the datetime ``fromisoformat`` already built, and
+    converting every message up front cost more than parsing it. Once scored,
+    ``sentiment`` holds ``(raw_score, weight)`` and ``drop_text`` can
+    release the text. ``entry_id`` is the transcript's own id for the
+    entry (Claude Code ``uuid``, OpenCode message id) when it has one.
+    """
+
+    __slots__ = ("_time", "text", "activity", "tool_name", "role", "is_error",
+                 "entry_id", "sentiment")
+    _FIELDS = ("epoch_ms",) + __slots__[1:-1]
+
+    def __init__(self, timestamp: Union[datetime, int], text: str, activity: Activity,
+                 tool_name: Optional[str] = None, role: str = "assistant",
+                 is_error: bool = False, entry_id: Optional[str] = None):
+        self._time = timestamp
+        self.text = text
+        self.activity = activity
+        self.tool_name = sys.intern(tool_name) if tool_name else tool_name
+        self.role = sys.intern(role)
+        self.is_error = is_error
+        self.entry_id = entry_id
+        self.sentiment: Optional[tuple[float, float]] = None
+
+    @property
+    def timestamp(self) -> datetime:
+        time = self._time
+        return EPOCH + time * ONE_MS if isinstance(time, int) else as_utc(time)
+
+    @property
+    def epoch_ms(self) -> int:
+        time = self._time
+        return time if isinstance(time, int) else epoch_ms(time)
+
+    @property
+    def has_text(self) -> bool:
+        """Whether there is (or was, before ``drop_text``) text to score."""
+        return self.sentiment is not None or bool(self.text and not self.text.isspace())
+
+    def drop_text(self) -> None:
+        if self.sentiment is not None:
+            self.text = ""
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ParsedMessage):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (f"ParsedMessage(timestamp={self.timestamp!r}, text={self.text!r}, "
+                f"activity={self.activity}, tool_name={self.tool_name!r}, role={self.role!r}, "
+                f"is_error={self.is_error})")
 
 
 @dataclass
@@ -38,11 +94,37 @@ class ParsedSession:
         return None
 
 
+def take_recent(newest_first: Iterable[ParsedMessage], n: int) -> list[ParsedMessage]:
+    """The first ``n`` of ``newest_first``, oldest-first; the rest is never pulled."""
+    kept = list(itertools.islice(newest_first, max(n, 0)))
+    kept.reverse()
+    return kept
+
+
+def as_utc(ts: datetime) -> datetime:
+    """Treat naive timestamps as UTC so they compare with aware ones."""
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def epoch_ms(ts: datetime) -> int:
+    return (as_utc(ts) - EPOCH) // ONE_MS
+
+
 class AgentParser(ABC):
     @abstractmethod
     def discover_sessions(self) -> list[Path]:
         """Find all JSONL session files for this agent."""
 
+    @abstractmethod
+    def iter_messages(self, path: Path, start: Optional[datetime] = None,
+                      reverse: bool = False) -> Iterator[ParsedMessage]:
+        """Stream a session's messages without materialising the session.
+
+        Oldest-first by default, newest-first with ``reverse``. ``start``
+        skips messages older than it (naive times are UTC); newest-first
+        iteration stops at the first such message.
+        """
+
     @abstractmethod
     def parse_session(self, path: Path, last_n: int = 100) -> ParsedSession:
         """Parse a session file, returning the last N messages."""
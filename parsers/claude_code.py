@@ -1,10 +1,19 @@
 import json
 import re
+import sys
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-
-from .base import Activity, AgentParser, ParsedMessage, ParsedSession
+from typing import Iterable, Iterator, Optional
+
+from .base import (
+    Activity,
+    AgentParser,
+    ParsedMessage,
+    ParsedSession,
+    epoch_ms,
+    take_recent,
+)
 
 TOOL_ACTIVITY_MAP = {
     "Read": Activity.READING,
@@ -39,14 +48,129 @@ TOOL_PREAMBLE = re.compile(
 TOOL_KEYWORDS = re.compile(
     r"\b(read|grep|glob|bash|search|file|edit|write|check|run)\b", re.IGNORECASE
 )
-SYSTEM_TAGS = re.compile(
-    r"<(system-reminder|task-notification|user-prompt-submit-hook)[^>]*>.*?"
-    r"</(system-reminder|task-notification|user-prompt-submit-hook)>",
-    re.DOTALL,
-)
+SYSTEM_TAG_NAMES = ("system-reminder", "task-notification", "user-prompt-submit-hook")
+SYSTEM_TAG_OPEN = re.compile("<(?:" + "|".join(SYSTEM_TAG_NAMES) + ")")
+SYSTEM_TAG_CLOSE = re.compile("</(?:" + "|".join(SYSTEM_TAG_NAMES) + ")>")
+
+# fromisoformat reads a trailing "Z" natively from 3.11 on.
+ISO_Z_NATIVE = sys.version_info >= (3, 11)
 
 MIN_MESSAGE_LENGTH = 20
 MAX_MESSAGE_LENGTH = 1500
+LINES_PER_MESSAGE = 3
+READ_CHUNK_SIZE = 64 * 1024
+# Entries written twice (a reply replayed on resume) land close together, so
+# only the most recent uuids are remembered; the scan of a huge transcript
+# holds no more than this many.
+DEDUPE_WINDOW = 256
+
+
+def strip_system_tags(text: str) -> str:
+    """Remove injected ``<system-reminder>``-style blocks from ``text``.
+
+    A block runs from an opening tag to the nearest closing tag of any of
+    the three names; an opener with no closer after it is left alone, as
+    is everything after it. Every search starts where the previous one
+    ended, so the scan is linear in the length of the text however many
+    unterminated tags it contains.
+    """
+    pieces = []
+    pos = 0
+    while True:
+        opener = SYSTEM_TAG_OPEN.search(text, pos)
+        if not opener:
+            break
+        body = text.find(">", opener.end()) + 1
+        if not body:
+            break
+        closer = SYSTEM_TAG_CLOSE.search(text, body)
+        if not closer:
+            break
+        pieces.append(text[pos:opener.start()])
+        pos = closer.end()
+    if not pieces:
+        return text
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+def parse_timestamp(ts: Optional[str]) -> Optional[datetime]:
+    """Parse an entry timestamp; naive stamps stay naive.
+
+    Claude Code always writes ``YYYY-MM-DDTHH:MM:SS.sssZ``. Those skip the
+    ``Z`` rewrite and its string copy, and come back with the shared
+    ``timezone.utc`` singleton as their tzinfo.
+    """
+    if not ts or not isinstance(ts, str):
+        return None
+    try:
+        if ISO_Z_NATIVE and len(ts) == 24 and ts[23] == "Z" and ts[10] == "T":
+            return datetime.fromisoformat(ts)
+        if ts.endswith("Z"):
+            return datetime.fromisoformat(ts[:-1] + "+00:00")
+        return datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+
+
+def read_lines(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from f
+
+
+def read_lines_reversed(path: Path, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the lines of ``path`` last to first, reading backwards in chunks."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, 2)
+        if pos == 0:
+            return
+        tail = b""
+        at_end = True
+        while pos > 0:
+            size = min(chunk_size, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size) + tail
+            if at_end and chunk.endswith(b"\n"):
+                chunk = chunk[:-1]  # a final newline ends the last line, it doesn't start one
+            at_end = False
+            lines = chunk.split(b"\n")
+            tail = lines[0]
+            yield from reversed(lines[1:])
+        yield tail
+
+
+def _read_entries(lines: Iterable[bytes], max_lines: Optional[int] = None) -> Iterator[dict]:
+    """Decoded JSONL entries, skipping blank and malformed lines and recently seen ``uuid``s."""
+    seen: OrderedDict[str, None] = OrderedDict()
+    for n, line in enumerate(lines):
+        if max_lines is not None and n >= max_lines:
+            return
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(entry, dict):
+            continue
+        uuid = entry.get("uuid")
+        if uuid:
+            if uuid in seen:
+                seen.move_to_end(uuid)
+                continue
+            seen[uuid] = None
+            if len(seen) > DEDUPE_WINDOW:
+                seen.popitem(last=False)
+        yield entry
+
+
+def _assistant_message_id(entry: dict) -> Optional[str]:
+    if entry.get("type") != "assistant":
+        return None
+    message = entry.get("message")
+    return message.get("id") if isinstance(message, dict) else None
 
 
 class ClaudeCodeParser(AgentParser):
@@ -65,32 +189,77 @@ class ClaudeCodeParser(AgentParser):
         except OSError:
             return session
 
-        entries = self._read_tail(path, last_n * 3)
-        messages = []
-        for entry in entries:
-            parsed = self._parse_entry(entry)
-            if parsed:
-                messages.append(parsed)
-
-        session.messages = messages[-last_n:]
+        session.messages = take_recent(
+            self._iter_messages(path, reverse=True, max_lines=last_n * LINES_PER_MESSAGE),
+            last_n,
+        )
         return session
 
-    def _read_tail(self, path: Path, max_lines: int) -> list[dict]:
-        entries = []
+    def iter_messages(self, path: Path, start: Optional[datetime] = None,
+                      reverse: bool = False) -> Iterator[ParsedMessage]:
+        return self._iter_messages(path, start=start, reverse=reverse)
+
+    def _iter_messages(self, path: Path, start: Optional[datetime] = None,
+                       reverse: bool = False,
+                       max_lines: Optional[int] = None) -> Iterator[ParsedMessage]:
+        """Messages one line at a time; ``max_lines`` bounds how far the scan goes."""
+        start_ms = epoch_ms(start) if start else None
+        lines = read_lines_reversed(path) if reverse else read_lines(path)
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            for line in lines[-max_lines:]:
-                line = line.strip()
-                if not line:
+            for parsed in self._parse_entries(_read_entries(lines, max_lines), reverse):
+                if start_ms is not None and parsed.epoch_ms < start_ms:
+                    if reverse:
+                        return
                     continue
-                try:
-                    entries.append(json.loads(line))
-                except json.JSONDecodeError:
+                yield parsed
+        except OSError:
+            return
+
+    def _parse_entries(self, entries: Iterable[dict], reverse: bool) -> Iterator[ParsedMessage]:
+        """Parse entries, merging the assistant entries one streamed reply was split into.
+
+        Claude Code writes an entry per content block as a reply streams in,
+        all sharing the reply's ``message.id``. A run of them is parsed as one
+        message; entries in between that produce no message (tool results,
+        progress lines) don't end the run.
+        """
+        group: list[dict] = []
+        group_id = None
+        for entry in entries:
+            msg_id = _assistant_message_id(entry)
+            if group and msg_id is not None and msg_id == group_id:
+                group.append(entry)
+                continue
+            parsed = None
+            if msg_id is None:
+                parsed = self._parse_entry(entry)
+                if parsed is None:
                     continue
-        except (OSError, UnicodeDecodeError):
-            pass
-        return entries
+            if group:
+                merged = self._parse_group(group, reverse)
+                if merged:
+                    yield merged
+            group, group_id = ([entry], msg_id) if msg_id is not None else ([], None)
+            if parsed:
+                yield parsed
+        if group:
+            merged = self._parse_group(group, reverse)
+            if merged:
+                yield merged
+
+    def _parse_group(self, entries: list[dict], reverse: bool) -> Optional[ParsedMessage]:
+        """Parse the entries of one reply as a single entry stamped with the latest."""
+        if len(entries) == 1:
+            return self._parse_entry(entries[0])
+        if reverse:
+            entries = entries[::-1]
+        blocks = []
+        for entry in entries:
+            content = entry["message"].get("content")
+            if isinstance(content, list):
+                blocks.extend(content)
+        latest = entries[-1]
+        return self._parse_entry({**latest, "message": {**latest["message"], "content": blocks}})
 
     def _parse_entry(self, entry: dict) -> Optional[ParsedMessage]:
         entry_type = entry.get("type")
@@ -101,7 +270,7 @@ class ClaudeCodeParser(AgentParser):
         if entry_type != "assistant":
             return None
 
-        timestamp = self._parse_timestamp(entry.get("timestamp"))
+        timestamp = parse_timestamp(entry.get("timestamp"))
         if not timestamp:
             return None
 
@@ -147,10 +316,11 @@ class ClaudeCodeParser(AgentParser):
             text=text,
             activity=activity,
             tool_name=tool_name,
+            entry_id=entry.get("uuid"),
         )
 
     def _parse_user_entry(self, entry: dict) -> Optional[ParsedMessage]:
-        timestamp = self._parse_timestamp(entry.get("timestamp"))
+        timestamp = parse_timestamp(entry.get("timestamp"))
         if not timestamp:
             return None
 
@@ -178,6 +348,7 @@ class ClaudeCodeParser(AgentParser):
                     activity=Activity.EXECUTING,
                     role="tool_result",
                     is_error=True,
+                    entry_id=entry.get("uuid"),
                 )
 
         text_parts = []
@@ -201,6 +372,7 @@ class ClaudeCodeParser(AgentParser):
             text=text,
             activity=Activity.CONVERSING,
             role="user",
+            entry_id=entry.get("uuid"),
         )
 
     def _classify_tool(self, tool_name: str, tool_input: dict) -> Activity:
@@ -216,8 +388,7 @@ class ClaudeCodeParser(AgentParser):
         return TOOL_ACTIVITY_MAP.get(base_name, Activity.SYSTEM)
 
     def _clean_text(self, text: str) -> str:
-        text = SYSTEM_TAGS.sub("", text)
-        return text.strip()
+        return strip_system_tags(text).strip()
 
     def _is_tool_call_boilerplate(self, text: str) -> bool:
         if TOOL_CALL_XML.search(text):
@@ -225,12 +396,3 @@ class ClaudeCodeParser(AgentParser):
         if len(text) < 80 and TOOL_PREAMBLE.match(text) and TOOL_KEYWORDS.search(text):
             return True
         return False
-
-    def _parse_timestamp(self, ts: Optional[str]) -> Optional[datetime]:
-        if not ts:
-            return None
-        try:
-            ts = ts.replace("Z", "+00:00")
-            return datetime.fromisoformat(ts)
-        except (ValueError, TypeError):
-            return None
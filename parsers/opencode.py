@@ -1,11 +1,19 @@
 import json
 import re
 import sqlite3
-from datetime import datetime, timezone
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
-
-from .base import Activity, AgentParser, ParsedMessage, ParsedSession
+from typing import Iterable, Iterator, Optional
+
+from .base import (
+    Activity,
+    AgentParser,
+    ParsedMessage,
+    ParsedSession,
+    epoch_ms,
+    take_recent,
+)
 
 TOOL_ACTIVITY_MAP = {
     "read": Activity.READING,
@@ -39,6 +47,15 @@ MIN_MESSAGE_LENGTH = 20
 MAX_MESSAGE_LENGTH = 1500
 
 DB_NAME = "opencode.db"
+FETCH_SIZE = 256
+
+
+def _fetch_rows(cursor: sqlite3.Cursor) -> Iterator[tuple]:
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
 
 
 class OpenCodeParser(AgentParser):
@@ -95,14 +112,41 @@ class OpenCodeParser(AgentParser):
 
         try:
             conn = sqlite3.connect(str(self.db_path))
-            session.last_modified = self._get_session_mtime(conn, session_id)
-
-            parts = self._fetch_parts(conn, session_id)
-            conn.close()
+            try:
+                session.last_modified = self._get_session_mtime(conn, session_id)
+            finally:
+                conn.close()
         except sqlite3.Error:
             return session
 
-        messages = []
+        session.messages = take_recent(self._iter_session(session_id, reverse=True), last_n)
+        return session
+
+    def iter_messages(self, path: Path, start: Optional[datetime] = None,
+                      reverse: bool = False) -> Iterator[ParsedMessage]:
+        session_id = self._resolve_session_id(path)
+        if not session_id or not self.db_path.exists():
+            return iter(())
+        return self._iter_session(session_id, start=start, reverse=reverse)
+
+    def _iter_session(self, session_id: str, start: Optional[datetime] = None,
+                      reverse: bool = False) -> Iterator[ParsedMessage]:
+        """Messages from a cursor read ``FETCH_SIZE`` rows at a time."""
+        try:
+            conn = sqlite3.connect(str(self.db_path))
+        except sqlite3.Error:
+            return
+        try:
+            since_ms = epoch_ms(start) if start else None
+            cursor = self._fetch_parts(conn, session_id, newest_first=reverse, since_ms=since_ms)
+            yield from self._build_messages(_fetch_rows(cursor))
+        except sqlite3.Error:
+            return
+        finally:
+            conn.close()
+
+    def _build_messages(self, rows: Iterable[tuple]) -> Iterator[ParsedMessage]:
+        """Group part rows (ordered by message) into messages, in row order."""
         current_msg_id = None
         current_role = None
         text_parts: list[str] = []
@@ -112,15 +156,15 @@ class OpenCodeParser(AgentParser):
         is_error = False
         has_reasoning = False
 
-        for msg_id, msg_data_str, part_data_str, part_time in parts:
+        for msg_id, msg_data_str, part_data_str, part_time in rows:
             if msg_id != current_msg_id:
                 if current_msg_id is not None:
                     msg = self._build_message(
-                        current_role, timestamp, text_parts, activity,
+                        current_msg_id, current_role, timestamp, text_parts, activity,
                         tool_name, is_error, has_reasoning,
                     )
                     if msg:
-                        messages.append(msg)
+                        yield msg
 
                 current_msg_id = msg_id
                 text_parts = []
@@ -163,14 +207,11 @@ class OpenCodeParser(AgentParser):
 
         if current_msg_id is not None:
             msg = self._build_message(
-                current_role, timestamp, text_parts, activity,
+                current_msg_id, current_role, timestamp, text_parts, activity,
                 tool_name, is_error, has_reasoning,
             )
             if msg:
-                messages.append(msg)
-
-        session.messages = messages[-last_n:]
-        return session
+                yield msg
 
     def _get_session_mtime(self, conn: sqlite3.Connection, session_id: str) -> Optional[float]:
         row = conn.execute(
@@ -180,36 +221,44 @@ class OpenCodeParser(AgentParser):
             return row[0] / 1000.0
         return None
 
-    def _fetch_parts(self, conn: sqlite3.Connection, session_id: str) -> list[tuple]:
+    def _fetch_parts(self, conn: sqlite3.Connection, session_id: str,
+                     newest_first: bool = False,
+                     since_ms: Optional[int] = None) -> sqlite3.Cursor:
+        """Part rows grouped by message; parts stay in order within a message."""
+        order = "DESC" if newest_first else "ASC"
+        since = "AND m.time_created >= ?" if since_ms is not None else ""
+        params = (session_id,) if since_ms is None else (session_id, since_ms)
         return conn.execute(
-            """
+            f"""
             SELECT m.id, m.data, p.data, p.time_created
             FROM part p
             JOIN message m ON p.message_id = m.id
-            WHERE p.session_id = ?
-            ORDER BY m.time_created ASC, p.id ASC
+            WHERE p.session_id = ? {since}
+            ORDER BY m.time_created {order}, m.id {order}, p.id ASC
             """,
-            (session_id,),
-        ).fetchall()
+            params,
+        )
 
-    def _extract_timestamp(self, msg_data: dict, part_time: int) -> datetime:
+    def _extract_timestamp(self, msg_data: dict, part_time: int) -> int:
+        """Epoch milliseconds, which is also how ParsedMessage stores it."""
         time_obj = msg_data.get("time", {})
         ts_ms = time_obj.get("created") or time_obj.get("completed") or part_time
         if ts_ms:
-            return datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc)
-        return datetime.now(tz=timezone.utc)
+            return int(ts_ms)
+        return int(time.time() * 1000)
 
     def _build_message(
         self,
+        msg_id: str,
         role: Optional[str],
-        timestamp: Optional[datetime],
+        timestamp: Optional[int],
         text_parts: list[str],
         activity: Activity,
         tool_name: Optional[str],
         is_error: bool,
         has_reasoning: bool,
     ) -> Optional[ParsedMessage]:
-        if not timestamp:
+        if timestamp is None:
             return None
 
         text = " ".join(text_parts)
@@ -222,6 +271,7 @@ class OpenCodeParser(AgentParser):
                 text=text[:MAX_MESSAGE_LENGTH],
                 activity=Activity.CONVERSING,
                 role="user",
+                entry_id=msg_id,
             )
 
         if is_error and text:
@@ -232,6 +282,7 @@ class OpenCodeParser(AgentParser):
                 tool_name=tool_name,
                 role="tool_result",
                 is_error=True,
+                entry_id=msg_id,
             )
 
         if len(text) < MIN_MESSAGE_LENGTH and not tool_name:
@@ -241,6 +292,7 @@ class OpenCodeParser(AgentParser):
                 timestamp=timestamp,
                 text="",
                 activity=Activity.THINKING,
+                entry_id=msg_id,
             )
 
         return ParsedMessage(
@@ -248,6 +300,7 @@ class OpenCodeParser(AgentParser):
             text=text[:MAX_MESSAGE_LENGTH],
             activity=activity,
             tool_name=tool_name,
+            entry_id=msg_id,
         )
 
     def _classify_tool(self, tool_name: str, part_data: dict) -> Activity:
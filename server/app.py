@@ -1,80 +1,441 @@
 import json
-import os
+import math
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
+from core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from sprites.delta import DELTAS
+from sprites.encoder import bitmap_to_base64
+from watcher.events import MoodChanged, OverflowPolicy, Subscription
 from watcher.monitor import WatcherLoop
+from watcher.store import RESOLUTIONS, pick_resolution
+from .longpoll import LongPollHub
+from .polllog import PollLogger, PollRecord
+from .profiler import ProfilerBusy, SamplingProfiler
+from .sse import SseHub
 
 _watcher: Optional[WatcherLoop] = None
+_longpoll: Optional[LongPollHub] = None
+_sse: Optional[SseHub] = None
+_subscriptions: list[Subscription] = []
+_poll_logger: Optional[PollLogger] = None
+_profiler: Optional[SamplingProfiler] = None
+_deltas = DELTAS
+
+DEFAULT_WORKERS = 32
+DEFAULT_CONNECTION_TIMEOUT = 10.0
+DEFAULT_KEEPALIVE_TIMEOUT = 2.0
+MAX_DEVICE_SERIES = 256
+DEFAULT_HISTORY_SPAN = 3600.0
+DEFAULT_ROLLUP_SPAN = 7 * 86400.0
+MAX_HISTORY_BUCKETS = 100_000
+
+HTTP_SECONDS = REGISTRY.histogram(
+    "moodbot_http_request_seconds", "Time spent handling a request", ("route", "agent"))
+HTTP_RESPONSES = REGISTRY.counter(
+    "moodbot_http_responses_total", "Responses by route and status code", ("route", "code"))
+HTTP_BYTES = REGISTRY.counter(
+    "moodbot_http_bytes_sent_total", "Response body bytes written by handlers", ("route",))
+DEVICE_POLL_INTERVAL = REGISTRY.gauge(
+    "moodbot_device_poll_interval_seconds", "Poll interval reported by the device",
+    ("device",), max_series=MAX_DEVICE_SERIES)
+DEVICE_SEEN_INTERVAL = REGISTRY.gauge(
+    "moodbot_device_seen_interval_seconds", "Time between the device's last two polls",
+    ("device",), max_series=MAX_DEVICE_SERIES)
+DEVICE_LAST_SEEN = REGISTRY.gauge(
+    "moodbot_device_last_seen_timestamp_seconds", "Unix time of the device's last poll",
+    ("device",), max_series=MAX_DEVICE_SERIES)
+DEVICE_VBAT = REGISTRY.gauge(
+    "moodbot_device_battery_volts", "Battery voltage reported by the device",
+    ("device",), max_series=MAX_DEVICE_SERIES)
+DEVICE_INFO = REGISTRY.gauge(
+    "moodbot_device_info", "Firmware and agent last reported by the device",
+    ("device", "agent", "fw"), max_series=MAX_DEVICE_SERIES)
 
 
 def set_watcher(watcher: WatcherLoop) -> None:
-    global _watcher
+    global _watcher, _longpoll, _sse, _subscriptions
+    for subscription in _subscriptions:
+        subscription.close()
+    if _longpoll:
+        _longpoll.stop()
+    if _sse:
+        _sse.stop()
     _watcher = watcher
+    _longpoll = LongPollHub()
+    _sse = SseHub()
+    for name in watcher.agent_names:
+        snapshot = watcher.get_snapshot(name)
+        if snapshot:
+            _sse.notify(name, snapshot)
+
+    longpoll, sse = _longpoll, _sse
+
+    def wake_waiters(event: MoodChanged) -> None:
+        longpoll.notify(event.agent, event.snapshot)
+
+    def stream(event: MoodChanged) -> None:
+        sse.notify(event.agent, event.snapshot)
+
+    # Waiters only care about the newest mood; the stream keeps every change.
+    _subscriptions = [
+        watcher.bus.subscribe(wake_waiters, policy=OverflowPolicy.COALESCE, name="longpoll"),
+        watcher.bus.subscribe(stream, policy=OverflowPolicy.DROP_OLDEST, name="sse"),
+    ]
+
+
+def set_poll_logger(logger: Optional[PollLogger]) -> None:
+    global _poll_logger
+    _poll_logger = logger
+
+
+def set_profiler(profiler: Optional[SamplingProfiler]) -> None:
+    """Enable ``/debug/profile``; it returns 404 while no profiler is set."""
+    global _profiler
+    _profiler = profiler
+
+
+def _collect_runtime():
+    """Scrape-time values kept by caches, hubs and the bus themselves."""
+    manifests = {}
+    if _watcher:
+        for monitor in _watcher.monitors.values():
+            sprites = getattr(monitor.engine, "sprites", None)
+            if sprites is not None:
+                manifests[id(sprites)] = sprites
+    yield ("moodbot_sprite_cache_hits_total", "counter", "Sprite lookups served from the table",
+           [({}, sum(m.hits for m in manifests.values()))])
+    yield ("moodbot_sprite_cache_misses_total", "counter", "Sprite lookups resolved from disk",
+           [({}, sum(m.misses for m in manifests.values()))])
+    yield ("moodbot_delta_cache_hits_total", "counter", "Frame deltas served from cache",
+           [({}, _deltas.hits)])
+    yield ("moodbot_delta_cache_misses_total", "counter", "Frame deltas computed",
+           [({}, _deltas.misses)])
+    if _watcher:
+        yield ("moodbot_bus_dropped_total", "counter", "Mood events dropped per subscriber",
+               [({"subscriber": s.name}, s.dropped) for s in _watcher.bus.subscriptions])
+    if _longpoll:
+        yield ("moodbot_longpoll_waiting", "gauge", "Parked long-poll requests",
+               [({}, _longpoll.waiting)])
+    if _sse:
+        yield ("moodbot_sse_subscribers", "gauge", "Open event streams",
+               [({}, _sse.subscribers)])
+    if _poll_logger:
+        yield ("moodbot_poll_log_dropped_total", "counter", "Poll log records dropped",
+               [({}, _poll_logger.dropped)])
+
+
+REGISTRY.add_collector(_collect_runtime)
 
 
 class MoodHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    _route = "other"
+    _status = 0
+
+    def setup(self) -> None:
+        self.timeout = getattr(self.server, "connection_timeout", DEFAULT_CONNECTION_TIMEOUT)
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs add ~40 ms to every response on a kept-alive connection.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code
+        super().send_response(code, message)
+
     def do_GET(self) -> None:
+        start = time.perf_counter()
         parsed = urlparse(self.path)
         path = parsed.path.rstrip("/")
         params = parse_qs(parsed.query)
+        self._status = 0
+        agent = ""
 
-        if path.startswith("/mood/"):
+        if path == "/mood/stream":
+            self._route = "stream"
+            self._handle_stream(params)
+        elif path.startswith("/mood/") and path.endswith("/delta"):
+            self._route = "delta"
+            agent = path[6:-6]
+            self._handle_delta(agent, params)
+        elif path.startswith("/mood/"):
+            self._route = "mood"
             agent = path[6:]
             self._handle_mood(agent, params)
+        elif path.startswith("/history/") and path.endswith("/rollup"):
+            self._route = "rollup"
+            agent = path[9:-7]
+            self._handle_rollup(agent, params)
+        elif path.startswith("/history/"):
+            self._route = "history"
+            agent = path[9:]
+            self._handle_history(agent, params)
         elif path == "/mood":
+            self._route = "agents"
             self._handle_agents_list()
         elif path.startswith("/firmware/latest"):
+            self._route = "firmware"
             self._handle_firmware()
         elif path == "/health":
-            self._respond_json({"status": "ok"})
+            self._route = "health"
+            self._handle_health()
+        elif path == "/debug/profile":
+            self._route = "profile"
+            self._handle_profile(params)
+        elif path == "/metrics":
+            self._route = "metrics"
+            self._respond_bytes(REGISTRY.render().encode("utf-8"),
+                                content_type=METRICS_CONTENT_TYPE)
         else:
+            self._route = "other"
             self._respond_error(404, "Not found")
 
+        # Unknown agent names would otherwise mint a new series per typo.
+        if agent and not (_watcher and agent in _watcher.monitors):
+            agent = "unknown"
+        HTTP_SECONDS.observe(time.perf_counter() - start, self._route, agent)
+        HTTP_RESPONSES.inc(self._route, str(self._status) if self._status else "detached")
+
     def _handle_mood(self, agent: str, params: dict) -> None:
         if not _watcher:
             self._respond_error(503, "Watcher not initialized")
             return
 
+        snapshot = _watcher.get_snapshot(agent)
+        if snapshot is None:
+            self._respond_error(404, f"Agent '{agent}' not found or no data yet")
+            return
+
+        if "wait" in params:
+            try:
+                wait = float(params["wait"][0])
+            except ValueError:
+                self._respond_error(400, "wait must be a number of seconds")
+                return
+            since = params.get("since", [self.headers.get("If-None-Match")])[0]
+            if since == snapshot.etag and wait > 0 and _longpoll:
+                self._log_poll(agent, params)
+                self._park(agent, since, wait, snapshot)
+                return
+
+        if self.headers.get("If-None-Match") == snapshot.etag:
+            self._respond_not_modified(snapshot.etag)
+        else:
+            self._respond_bytes(snapshot.body, etag=snapshot.etag, gzip_body=snapshot.gzip_body)
+        self._log_poll(agent, params)
+
+    def _handle_stream(self, params: dict) -> None:
+        if not _watcher or not _sse:
+            self._respond_error(503, "Watcher not initialized")
+            return
+
+        agent = params.get("agent", [None])[0]
+        if agent and agent not in _watcher.monitors:
+            self._respond_error(404, f"Agent '{agent}' not found")
+            return
+
+        last_id = params.get("lastEventId", [self.headers.get("Last-Event-ID")])[0]
+        self.close_connection = True
+        self.wfile.flush()
+        self.server.detach(self.request)
+        _sse.subscribe(self.request, agent=agent, last_event_id=last_id)
+
+    def _park(self, agent: str, since: str, wait: float, snapshot) -> None:
+        # Hand the socket to the long-poll hub; this worker is free again as
+        # soon as we return, and the server must not close the socket.
+        self.close_connection = True
+        self.wfile.flush()
+        self.server.detach(self.request)
+        _longpoll.park(agent, self.request, since, wait, snapshot,
+                       gzip_ok="gzip" in self.headers.get("Accept-Encoding", ""))
+
+    def _handle_delta(self, agent: str, params: dict) -> None:
+        if not _watcher:
+            self._respond_error(503, "Watcher not initialized")
+            return
+
         mood = _watcher.get_mood(agent)
         if mood is None:
             self._respond_error(404, f"Agent '{agent}' not found or no data yet")
             return
 
-        self._respond_json(mood.to_dict())
+        data = mood.to_dict()
+        data["bitmap"] = None
+        data["frame"] = None
+        data["spans"] = []
+        have = params.get("have", [None])[0]
+        if mood.bitmap:
+            frame, spans = _deltas.delta(have, mood.bitmap)
+            data["frame"] = frame
+            data["spans"] = [
+                [start, count, bitmap_to_base64(rows)] for start, count, rows in spans
+            ]
+        self._respond_json(data)
         self._log_poll(agent, params)
 
+    def _handle_history(self, agent: str, params: dict) -> None:
+        if not _watcher:
+            self._respond_error(503, "Watcher not initialized")
+            return
+
+        if agent not in _watcher.monitors:
+            self._respond_error(404, f"Agent '{agent}' not found")
+            return
+
+        try:
+            end = float(params["to"][0]) if "to" in params else time.time()
+            start = float(params["from"][0]) if "from" in params else end - DEFAULT_HISTORY_SPAN
+            step = float(params["step"][0]) if "step" in params else None
+        except ValueError:
+            self._respond_error(400, "from, to and step must be numbers")
+            return
+        if not all(math.isfinite(v) for v in (start, end, step or 0.0)):
+            self._respond_error(400, "from, to and step must be finite")
+            return
+        if end < start or (step is not None and step <= 0):
+            self._respond_error(400, "from must not be after to, and step must be positive")
+            return
+        if step is not None and not (end - start) / step <= MAX_HISTORY_BUCKETS:
+            self._respond_error(
+                400, f"step must split the range into at most {MAX_HISTORY_BUCKETS} buckets")
+            return
+
+        try:
+            points = _watcher.history.query(agent, start, end, step)
+        except (ValueError, OverflowError):
+            self._respond_error(400, "from, to and step do not make a valid range")
+            return
+        self._respond_json({
+            "agent": agent,
+            "from": start,
+            "to": end,
+            "step": step,
+            "points": points,
+        })
+
+    def _handle_rollup(self, agent: str, params: dict) -> None:
+        if not _watcher:
+            self._respond_error(503, "Watcher not initialized")
+            return
+
+        if not _watcher.store:
+            self._respond_error(404, "Mood store not enabled")
+            return
+
+        if agent not in _watcher.monitors:
+            self._respond_error(404, f"Agent '{agent}' not found")
+            return
+
+        try:
+            end = float(params["to"][0]) if "to" in params else time.time()
+            start = float(params["from"][0]) if "from" in params else end - DEFAULT_ROLLUP_SPAN
+        except ValueError:
+            self._respond_error(400, "from and to must be numbers")
+            return
+        if not (math.isfinite(start) and math.isfinite(end)):
+            self._respond_error(400, "from and to must be finite")
+            return
+        resolution = params.get("resolution", [None])[0] or pick_resolution(end - start)
+        if end < start or (resolution != "raw" and resolution not in RESOLUTIONS):
+            self._respond_error(
+                400, "from must not be after to, and resolution one of raw, minute, hour, day")
+            return
+
+        if resolution == "raw":
+            points = _watcher.store.samples(agent, start, end)
+        else:
+            points = _watcher.store.rollups(agent, start, end, resolution)
+        self._respond_json({
+            "agent": agent,
+            "from": start,
+            "to": end,
+            "resolution": resolution,
+            "points": points,
+        })
+
     def _handle_agents_list(self) -> None:
         if not _watcher:
             self._respond_error(503, "Watcher not initialized")
             return
 
-        agents = {}
-        for name in _watcher.agent_names:
-            mood = _watcher.get_mood(name)
-            agents[name] = mood.to_dict() if mood else None
+        self._respond_bytes(_watcher.agents_body())
+
+    def _handle_profile(self, params: dict) -> None:
+        if not _profiler:
+            self._respond_error(404, "Not found")
+            return
+
+        try:
+            seconds = float(params.get("seconds", ["10"])[0])
+            hz = float(params["hz"][0]) if "hz" in params else None
+        except ValueError:
+            self._respond_error(400, "seconds and hz must be numbers")
+            return
+        if not (math.isfinite(seconds) and seconds > 0) or (
+                hz is not None and not (math.isfinite(hz) and hz > 0)):
+            self._respond_error(400, "seconds and hz must be positive")
+            return
+
+        try:
+            stacks = _profiler.profile(seconds, hz=hz, thread=params.get("thread", [None])[0])
+        except ProfilerBusy:
+            self._respond_error(409, "A profile is already running")
+            return
+        self._respond_bytes(stacks.encode("utf-8"), content_type="text/plain; charset=utf-8")
 
-        self._respond_json({"agents": agents})
+    def _handle_health(self) -> None:
+        # Stays "ok" while the server answers; per-monitor detail is informational.
+        data = {"status": "ok"}
+        if _watcher:
+            data["monitors"] = _watcher.health()
+        self._respond_json(data)
 
     def _handle_firmware(self) -> None:
         self._respond_json({"version": "0.1.0", "update_available": False})
 
     def _respond_json(self, data: dict) -> None:
-        body = json.dumps(data).encode("utf-8")
+        self._respond_bytes(json.dumps(data).encode("utf-8"))
+
+    def _respond_bytes(self, body: bytes, etag: Optional[str] = None,
+                       gzip_body: Optional[bytes] = None,
+                       content_type: str = "application/json") -> None:
         self.send_response(200)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Access-Control-Allow-Origin", "*")
+        if gzip_body is not None:
+            self.send_header("Vary", "Accept-Encoding")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip_body
+                self.send_header("Content-Encoding", "gzip")
+        if etag:
+            self.send_header("ETag", etag)
         self.send_header("Content-Length", str(len(body)))
+        self._send_connection_header()
         self.end_headers()
         self.wfile.write(body)
+        HTTP_BYTES.inc(self._route, amount=len(body))
+
+    def _respond_not_modified(self, etag: str) -> None:
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", "0")
+        self._send_connection_header()
+        self.end_headers()
 
     def do_OPTIONS(self) -> None:
         self.send_response(204)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
     def _respond_error(self, code: int, message: str) -> None:
@@ -83,24 +444,136 @@ class MoodHandler(BaseHTTPRequestHandler):
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Content-Length", str(len(body)))
+        self._send_connection_header()
         self.end_headers()
         self.wfile.write(body)
+        HTTP_BYTES.inc(self._route, amount=len(body))
+
+    def _send_connection_header(self) -> None:
+        # Idle keep-alive connections pin a worker each: wait only briefly for
+        # the next request, and not at all once other devices are queued.
+        if getattr(self.server, "saturated", False):
+            self.send_header("Connection", "close")
+        else:
+            self.connection.settimeout(
+                min(self.timeout, getattr(self.server, "keepalive_timeout", DEFAULT_KEEPALIVE_TIMEOUT))
+            )
 
     def _log_poll(self, agent: str, params: dict) -> None:
-        log_path = os.environ.get("MOODBOT_BATTERY_LOG")
-        if not log_path:
+        self._record_device(agent, params)
+        if not _poll_logger:
             return
-        poll = params.get("poll", ["?"])[0]
-        vbat = params.get("vbat", ["?"])[0]
-        fw = params.get("fw", ["?"])[0]
-        line = f"{datetime.now().isoformat(timespec='seconds')} poll={poll}s vbat={vbat}V fw={fw} agent={agent}\n"
-        with open(log_path, "a") as f:
-            f.write(line)
+        _poll_logger.log(PollRecord(
+            time=datetime.now(),
+            device=self.client_address[0],
+            agent=agent,
+            poll=params.get("poll", ["?"])[0],
+            vbat=params.get("vbat", ["?"])[0],
+            fw=params.get("fw", ["?"])[0],
+        ))
+
+    def _record_device(self, agent: str, params: dict) -> None:
+        device = self.client_address[0]
+        now = time.time()
+        last_seen = DEVICE_LAST_SEEN.value(device)
+        if last_seen is not None:
+            DEVICE_SEEN_INTERVAL.set(now - last_seen, device)
+        DEVICE_LAST_SEEN.set(now, device)
+        for gauge, name in ((DEVICE_POLL_INTERVAL, "poll"), (DEVICE_VBAT, "vbat")):
+            try:
+                gauge.set(float(params[name][0]), device)
+            except (KeyError, ValueError):
+                pass
+        DEVICE_INFO.set(1, device, agent, params.get("fw", ["?"])[0])
 
     def log_message(self, format, *args) -> None:
         pass
 
 
-def run_server(host: str = "0.0.0.0", port: int = 9400) -> HTTPServer:
-    server = HTTPServer((host, port), MoodHandler)
-    return server
+class MoodHTTPServer(HTTPServer):
+    """HTTPServer whose handlers can take over a client socket.
+
+    A detached socket is left open when its handler returns, for long-poll
+    waiters whose response is written later from another thread.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128  # socketserver's default of 5 drops SYNs when many desks poll at once
+
+    def __init__(self, server_address, handler_class,
+                 connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT,
+                 keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT):
+        super().__init__(server_address, handler_class)
+        self.connection_timeout = connection_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._detached: set = set()
+        self._detached_lock = threading.Lock()
+
+    @property
+    def saturated(self) -> bool:
+        """Always true: the one thread can't sit on an idle keep-alive connection."""
+        return True
+
+    def detach(self, request) -> None:
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request) -> None:
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+class PooledHTTPServer(MoodHTTPServer):
+    """HTTPServer that handles each connection on a bounded worker pool.
+
+    A stalled or slow client only ties up one worker, and only until its
+    connection timeout expires, instead of blocking every other device.
+    """
+
+    def __init__(self, server_address, handler_class, workers: int = DEFAULT_WORKERS,
+                 connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT,
+                 keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT):
+        super().__init__(server_address, handler_class, connection_timeout=connection_timeout,
+                         keepalive_timeout=keepalive_timeout)
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moodbot-http")
+        self._connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self) -> bool:
+        """True when every worker is busy and further connections are queued."""
+        return self._connections > self.workers
+
+    def process_request(self, request, client_address) -> None:
+        with self._lock:
+            self._connections += 1
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self._connections -= 1
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def run_server(host: str = "0.0.0.0", port: int = 9400, workers: int = DEFAULT_WORKERS,
+               connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT,
+               keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT) -> HTTPServer:
+    if workers <= 0:
+        return MoodHTTPServer((host, port), MoodHandler, connection_timeout=connection_timeout,
+                              keepalive_timeout=keepalive_timeout)
+    return PooledHTTPServer((host, port), MoodHandler, workers=workers,
+                            connection_timeout=connection_timeout,
+                            keepalive_timeout=keepalive_timeout)
@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from watcher.monitor import MoodSnapshot
+
+MAX_WAIT_SECONDS = 300.0
+SEND_TIMEOUT_SECONDS = 2.0
+
+
+def raw_response(status: int, reason: str, headers: list[tuple[str, str]],
+                 body: bytes = b"") -> bytes:
+    """Serialise a complete HTTP/1.1 response for writing straight to a socket."""
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def snapshot_response(snapshot: MoodSnapshot, gzip_ok: bool) -> bytes:
+    headers = [
+        ("Content-Type", "application/json"),
+        ("Access-Control-Allow-Origin", "*"),
+        ("Vary", "Accept-Encoding"),
+        ("ETag", snapshot.etag),
+    ]
+    body = snapshot.body
+    if gzip_ok:
+        headers.append(("Content-Encoding", "gzip"))
+        body = snapshot.gzip_body
+    return raw_response(200, "OK", headers, body)
+
+
+def not_modified_response(etag: str) -> bytes:
+    return raw_response(304, "Not Modified", [
+        ("ETag", etag),
+        ("Access-Control-Allow-Origin", "*"),
+    ])
+
+
+@dataclass(eq=False)
+class _Waiter:
+    agent: str
+    sock: socket.socket
+    since: str
+    gzip_ok: bool
+    deadline: float
+    done: bool = field(default=False)
+
+
+class LongPollHub:
+    """Holds parked long-poll connections until their agent's mood changes.
+
+    Handlers hand over the client socket and return, so a waiting device
+    costs a socket and a small record rather than a worker thread. A single
+    hub thread answers waiters when ``notify`` reports a new snapshot, or
+    with ``304 Not Modified`` once their deadline passes.
+    """
+
+    def __init__(self):
+        self._waiters: dict[str, list[_Waiter]] = {}
+        self._deadlines: list[tuple[float, int, _Waiter]] = []
+        self._latest: dict[str, MoodSnapshot] = {}
+        self._changed: set[str] = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stopped = False
+
+    @property
+    def waiting(self) -> int:
+        with self._cond:
+            return sum(len(w) for w in self._waiters.values())
+
+    def park(self, agent: str, sock: socket.socket, since: str, wait: float,
+             current: MoodSnapshot, gzip_ok: bool = False) -> None:
+        """Take ownership of ``sock`` until ``agent`` moves off ``since``."""
+        with self._cond:
+            # The bus delivers asynchronously, so the handler may already hold
+            # a newer snapshot than the last one we were notified about.
+            latest = self._latest.get(agent)
+            if current.newer_than(latest):
+                self._latest[agent] = latest = current
+            if latest.etag != since:
+                ready = latest
+            elif self._stopped:
+                ready = None
+            else:
+                waiter = _Waiter(agent, sock, since, gzip_ok,
+                                 time.monotonic() + min(wait, MAX_WAIT_SECONDS))
+                self._waiters.setdefault(agent, []).append(waiter)
+                heapq.heappush(self._deadlines, (waiter.deadline, next(self._seq), waiter))
+                self._ensure_thread()
+                self._cond.notify()
+                return
+        if ready is not None:
+            self._send(sock, snapshot_response(ready, gzip_ok))
+        else:
+            self._send(sock, not_modified_response(since))
+
+    def notify(self, agent: str, snapshot: MoodSnapshot) -> None:
+        """Record a new snapshot; waiters are answered on the hub thread."""
+        with self._cond:
+            if not snapshot.newer_than(self._latest.get(agent)):
+                return
+            self._latest[agent] = snapshot
+            if self._waiters.get(agent):
+                self._changed.add(agent)
+                self._cond.notify()
+
+    def stop(self) -> None:
+        """Stop the hub thread and answer every parked waiter with a 304.
+
+        The devices simply poll again, reaching whichever hub replaced this
+        one; anything parked after this point is answered straight away.
+        """
+        with self._cond:
+            self._running = False
+            self._stopped = True
+            self._cond.notify()
+            waiters = [w for ws in self._waiters.values() for w in ws]
+            self._waiters.clear()
+            self._deadlines.clear()
+            self._changed.clear()
+        if self._thread:
+            self._thread.join(timeout=1)
+        for waiter in waiters:
+            waiter.done = True
+            self._send(waiter.sock, not_modified_response(waiter.since))
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="moodbot-longpoll",
+                                            daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._changed and not self._expired():
+                    timeout = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                answers = self._collect_changed() + self._collect_expired()
+            for sock, payload in answers:
+                self._send(sock, payload)
+
+    def _expired(self) -> bool:
+        return bool(self._deadlines) and self._deadlines[0][0] <= time.monotonic()
+
+    def _collect_changed(self) -> list[tuple[socket.socket, bytes]]:
+        answers = []
+        for agent in self._changed:
+            snapshot = self._latest[agent]
+            payloads: dict[bool, bytes] = {}
+            remaining = []
+            for waiter in self._waiters.pop(agent, []):
+                if waiter.since == snapshot.etag:
+                    remaining.append(waiter)
+                    continue
+                waiter.done = True
+                if waiter.gzip_ok not in payloads:
+                    payloads[waiter.gzip_ok] = snapshot_response(snapshot, waiter.gzip_ok)
+                answers.append((waiter.sock, payloads[waiter.gzip_ok]))
+            if remaining:
+                self._waiters[agent] = remaining
+        self._changed.clear()
+        return answers
+
+    def _collect_expired(self) -> list[tuple[socket.socket, bytes]]:
+        answers = []
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, waiter = heapq.heappop(self._deadlines)
+            if waiter.done:
+                continue
+            waiter.done = True
+            waiters = self._waiters.get(waiter.agent, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            answers.append((waiter.sock, not_modified_response(waiter.since)))
+        return answers
+
+    def _send(self, sock: socket.socket, payload: bytes) -> None:
+        try:
+            sock.settimeout(SEND_TIMEOUT_SECONDS)
+            sock.sendall(payload)
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        finally:
+            sock.close()
@@ -0,0 +1,237 @@
+import csv
+import io
+import itertools
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+LOG_FORMATS = ("text", "csv")
+CSV_FIELDS = ("time", "device", "agent", "poll", "vbat", "fw")
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+DEFAULT_BACKUPS = 5
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class PollRecord:
+    time: datetime
+    device: str
+    agent: str
+    poll: str = "?"
+    vbat: str = "?"
+    fw: str = "?"
+
+    def to_text(self) -> str:
+        return (f"{self.time.isoformat(timespec='seconds')} poll={self.poll}s "
+                f"vbat={self.vbat}V fw={self.fw} agent={self.agent} device={self.device}\n")
+
+    def to_csv(self) -> str:
+        buf = io.StringIO()
+        csv.writer(buf).writerow([self.time.isoformat(timespec="seconds"), self.device,
+                                  self.agent, self.poll, self.vbat, self.fw])
+        return buf.getvalue()
+
+
+class PollLogger:
+    """Writes device poll records on a background thread.
+
+    Request handlers only enqueue; the writer thread batches records into a
+    single write per flush and rotates the file by size or age, keeping
+    ``backups`` old files as ``<path>.1`` (newest) to ``<path>.N``. If the
+    queue fills up (disk stalled), records are dropped and counted rather
+    than slowing down responses.
+    """
+
+    def __init__(self, path: Path, fmt: str = "text",
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE_SECONDS,
+                 backups: int = DEFAULT_BACKUPS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"Unknown poll log format '{fmt}', expected one of {LOG_FORMATS}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._opened_at = time.time()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # Age-based rotation counts from the first record in the current file.
+        self._opened_at = _first_record_time(self.path) or time.time()
+        self._thread = threading.Thread(target=self._run, name="moodbot-polllog", daemon=True)
+        self._thread.start()
+
+    def log(self, record: PollRecord) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Flush everything queued so far and stop the writer."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch: list[PollRecord] = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: list[PollRecord]) -> None:
+        # Any disk error (including a failed rotation, which is retried on the
+        # next flush) costs this batch, never the writer thread.
+        try:
+            self._maybe_rotate()
+            new_file = not self.path.exists() or self.path.stat().st_size == 0
+            if self.fmt == "csv":
+                lines = [r.to_csv() for r in batch]
+                if new_file:
+                    lines.insert(0, ",".join(CSV_FIELDS) + "\r\n")
+            else:
+                lines = [r.to_text() for r in batch]
+            with open(self.path, "a", newline="") as f:
+                f.write("".join(lines))
+        except OSError:
+            self.dropped += len(batch)
+
+    def _maybe_rotate(self) -> None:
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            self._opened_at = time.time()
+            return
+        too_big = self.max_bytes and size >= self.max_bytes
+        too_old = self.max_age and time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old) or size == 0:
+            return
+        for n in range(self.backups - 1, 0, -1):
+            src = self._backup(n)
+            if src.exists():
+                os.replace(src, self._backup(n + 1))
+        if self.backups > 0:
+            os.replace(self.path, self._backup(1))
+        else:
+            self.path.unlink()
+        self._opened_at = time.time()
+
+    def _backup(self, n: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{n}")
+
+
+def _first_record_time(path: Path) -> Optional[float]:
+    for record in _read_file(path):
+        return record.time.timestamp()
+    return None
+
+
+def log_files(path: Path) -> list[Path]:
+    """The current log and its rotated backups, oldest first."""
+    path = Path(path)
+    backups = sorted(
+        (p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]), reverse=True,
+    )
+    return backups + ([path] if path.exists() else [])
+
+
+def read_poll_log(path: Path) -> Iterator[PollRecord]:
+    """Yield records from a poll log and its backups, in either format."""
+    for file in log_files(path):
+        yield from _read_file(file)
+
+
+def _read_file(path: Path) -> Iterator[PollRecord]:
+    try:
+        with open(path, newline="") as f:
+            first = f.readline()
+            if first.startswith(",".join(CSV_FIELDS)):
+                for row in csv.DictReader(f, fieldnames=CSV_FIELDS):
+                    record = _from_fields(row)
+                    if record:
+                        yield record
+                return
+            for line in itertools.chain([first], f):
+                record = _parse_text(line)
+                if record:
+                    yield record
+    except OSError:
+        return
+
+
+def _parse_text(line: str) -> Optional[PollRecord]:
+    parts = line.split()
+    if not parts:
+        return None
+    fields = {"time": parts[0]}
+    for part in parts[1:]:
+        key, sep, value = part.partition("=")
+        if sep:
+            fields[key] = value
+    fields["poll"] = fields.get("poll", "?").rstrip("s")
+    fields["vbat"] = fields.get("vbat", "?").rstrip("V")
+    return _from_fields(fields)
+
+
+def _from_fields(fields: dict) -> Optional[PollRecord]:
+    try:
+        ts = datetime.fromisoformat(fields["time"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    agent = fields.get("agent") or "?"
+    return PollRecord(
+        time=ts,
+        # Logs written before device tracking have no device column; fall
+        # back to the agent so each desk's curve still separates.
+        device=fields.get("device") or agent,
+        agent=agent,
+        poll=fields.get("poll") or "?",
+        vbat=fields.get("vbat") or "?",
+        fw=fields.get("fw") or "?",
+    )
+
+
+def drain_curves(records: Iterable[PollRecord]) -> dict[str, list[tuple[datetime, float]]]:
+    """Group battery voltage readings into a time-ordered curve per device."""
+    curves: dict[str, list[tuple[datetime, float]]] = {}
+    for record in records:
+        try:
+            vbat = float(record.vbat)
+        except ValueError:
+            continue
+        curves.setdefault(record.device, []).append((record.time, vbat))
+    for points in curves.values():
+        points.sort(key=lambda p: p[0])
+    return curves
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Optional
+
+DEFAULT_HZ = 100.0
+MAX_HZ = 1000.0
+MAX_SECONDS = 60.0
+MAX_DEPTH = 128
+
+
+def _clamp(value: float, limit: float, name: str) -> float:
+    # min() passes NaN through, and a NaN deadline or interval never ends.
+    if not value > 0:
+        raise ValueError(f"{name} must be positive, got {value}")
+    return min(value, limit)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """Samples thread stacks with ``sys._current_frames`` and collapses them.
+
+    Nothing is hooked into the interpreter: between samples the profiler
+    sleeps, so the cost is one stack walk per thread per sample, paid on the
+    requesting thread. Output is one ``thread;outer;...;inner count`` line
+    per distinct stack, the format flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, hz: float = DEFAULT_HZ):
+        self.hz = _clamp(hz, MAX_HZ, "hz")
+        self._lock = threading.Lock()
+        self._labels: dict[CodeType, str] = {}
+
+    def profile(self, seconds: float, hz: Optional[float] = None,
+                thread: Optional[str] = None) -> str:
+        """Sample for ``seconds``; ``thread`` keeps only threads whose name starts with it."""
+        seconds = _clamp(seconds, MAX_SECONDS, "seconds")
+        hz = _clamp(hz, MAX_HZ, "hz") if hz is not None else self.hz
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+        try:
+            stacks = self._sample(seconds, hz, thread)
+        finally:
+            self._lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _sample(self, seconds: float, hz: float, prefix: Optional[str]) -> Counter:
+        stacks: Counter = Counter()
+        me = threading.get_ident()
+        interval = 1.0 / hz
+        deadline = time.monotonic() + seconds
+        next_at = time.monotonic()
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident)
+                if ident == me or name is None:
+                    continue
+                if prefix and not name.startswith(prefix):
+                    continue
+                stacks[self._collapse(name, frame)] += 1
+            next_at += interval
+            now = time.monotonic()
+            if next_at >= deadline:
+                break
+            if next_at > now:
+                time.sleep(next_at - now)
+            else:
+                # Fell behind; skip missed ticks rather than sampling in a burst.
+                next_at = now
+        return stacks
+
+    def _collapse(self, thread_name: str, frame: Optional[FrameType]) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":").replace(" ", "_"))
+        return ";".join(reversed(labels))
+
+
+def _label(code: CodeType) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}:{name}".replace(";", ":").replace(" ", "_")
@@ -0,0 +1,155 @@
+import itertools
+import json
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from watcher.monitor import MoodSnapshot
+
+EVENT_LOG_SIZE = 256
+HEARTBEAT_SECONDS = 15.0
+SEND_TIMEOUT_SECONDS = 2.0
+
+STREAM_HEAD = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+HEARTBEAT = b": ping\n\n"
+
+
+@dataclass(frozen=True)
+class _Event:
+    id: int
+    agent: str
+    payload: bytes
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    sock: socket.socket
+    agent: Optional[str]
+
+    def wants(self, agent: str) -> bool:
+        return self.agent is None or self.agent == agent
+
+
+def encode_event(event_id: int, agent: str, snapshot: MoodSnapshot) -> bytes:
+    data = snapshot.mood.to_dict()
+    del data["bitmap"]
+    data["agent"] = agent
+    data["etag"] = snapshot.etag
+    return f"id: {event_id}\nevent: mood\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class SseHub:
+    """Fans mood changes out to Server-Sent Events subscribers.
+
+    Each change is serialised once into an event frame and the same bytes
+    are written to every matching subscriber from a single hub thread. A
+    bounded log of recent events lets reconnecting clients resume from
+    ``Last-Event-ID``; anyone older than the log, or holding an id this hub
+    never issued (ids restart with the process), gets the latest state per
+    agent instead.
+    """
+
+    def __init__(self, log_size: int = EVENT_LOG_SIZE,
+                 heartbeat: float = HEARTBEAT_SECONDS):
+        self.heartbeat = heartbeat
+        self._log: deque[_Event] = deque(maxlen=log_size)
+        self._latest: dict[str, _Event] = {}
+        self._pending: list[_Event] = []
+        self._subscribers: list[_Subscriber] = []
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def subscribers(self) -> int:
+        with self._cond:
+            return len(self._subscribers)
+
+    def notify(self, agent: str, snapshot: MoodSnapshot) -> None:
+        with self._cond:
+            event_id = next(self._ids)
+            event = _Event(event_id, agent, encode_event(event_id, agent, snapshot))
+            self._log.append(event)
+            self._latest[agent] = event
+            if self._subscribers:
+                self._pending.append(event)
+                self._cond.notify()
+
+    def subscribe(self, sock: socket.socket, agent: Optional[str] = None,
+                  last_event_id: Optional[str] = None) -> None:
+        """Take ownership of ``sock`` and stream events to it."""
+        subscriber = _Subscriber(sock, agent)
+        with self._cond:
+            backlog = self._backlog(subscriber, last_event_id)
+            if not self._send(subscriber, STREAM_HEAD + b"".join(e.payload for e in backlog)):
+                return
+            self._subscribers.append(subscriber)
+            self._ensure_thread()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+            subscribers, self._subscribers = self._subscribers, []
+        for subscriber in subscribers:
+            subscriber.sock.close()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _backlog(self, subscriber: _Subscriber, last_event_id: Optional[str]) -> list[_Event]:
+        try:
+            last = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last = None
+        if last is not None and self._log and self._log[0].id <= last + 1 <= self._log[-1].id + 1:
+            return [e for e in self._log if e.id > last and subscriber.wants(e.agent)]
+        return sorted((e for e in self._latest.values() if subscriber.wants(e.agent)),
+                      key=lambda e: e.id)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="moodbot-sse", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending and self._running:
+                    self._cond.wait(self.heartbeat)
+                if not self._running:
+                    return
+                pending, self._pending = self._pending, []
+                subscribers = list(self._subscribers)
+
+            dead = []
+            for subscriber in subscribers:
+                if pending:
+                    payload = b"".join(e.payload for e in pending if subscriber.wants(e.agent))
+                else:
+                    payload = HEARTBEAT
+                if payload and not self._send(subscriber, payload):
+                    dead.append(subscriber)
+
+            if dead:
+                with self._cond:
+                    self._subscribers = [s for s in self._subscribers if s not in dead]
+
+    def _send(self, subscriber: _Subscriber, payload: bytes) -> bool:
+        try:
+            subscriber.sock.settimeout(SEND_TIMEOUT_SECONDS)
+            subscriber.sock.sendall(payload)
+            return True
+        except OSError:
+            subscriber.sock.close()
+            return False
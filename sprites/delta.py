@@ -0,0 +1,147 @@
+"""Row-delta encoding between two packed 1-bit frames.
+
+A device that reports the hash of the frame it is currently showing only needs
+the rows that differ from the frame it is about to show. Changed rows are
+grouped into contiguous spans:
+
+    (start_row, count, bytes)
+
+where ``bytes`` holds ``count * BYTES_PER_ROW`` packed bytes in the normal
+wire format (row-major, MSB first). A full frame is simply the single span
+``(0, DISPLAY_HEIGHT, bitmap)``, so the device applies every response the
+same way and can use the span range as its partial-refresh window.
+
+Frame hashes are the first 16 hex digits of the SHA-1 of the packed bytes.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .encoder import BYTES_PER_ROW, DISPLAY_HEIGHT, base64_to_bitmap
+
+Span = tuple[int, int, bytes]
+
+DEFAULT_MAX_DELTAS = 256
+DEFAULT_MAX_FRAMES = 256
+
+
+def frame_hash(bitmap: bytes) -> str:
+    """Stable short identifier for a packed frame."""
+    return hashlib.sha1(bitmap).hexdigest()[:16]
+
+
+def row_spans(old: bytes, new: bytes) -> list[Span]:
+    """Return the contiguous runs of rows that differ between two frames."""
+    if len(old) != len(new):
+        return [(0, len(new) // BYTES_PER_ROW, new)]
+
+    spans: list[Span] = []
+    run_start = None
+    rows = len(new) // BYTES_PER_ROW
+    for row in range(rows):
+        lo = row * BYTES_PER_ROW
+        hi = lo + BYTES_PER_ROW
+        if old[lo:hi] != new[lo:hi]:
+            if run_start is None:
+                run_start = row
+        elif run_start is not None:
+            spans.append(_span(new, run_start, row))
+            run_start = None
+    if run_start is not None:
+        spans.append(_span(new, run_start, rows))
+    return spans
+
+
+def _span(frame: bytes, start: int, end: int) -> Span:
+    return (start, end - start, frame[start * BYTES_PER_ROW:end * BYTES_PER_ROW])
+
+
+class DeltaCache:
+    """Known frames by hash plus lazily computed deltas per frame pair.
+
+    Frames are registered as snapshots are built, so any frame a device could
+    be showing, however it got it, is known by its hash. Frames (and the base64 strings they were
+    decoded from) are kept in an LRU of ``max_frames``, so re-rendered
+    sprites eventually push out the art they replaced; a device still
+    showing an evicted frame gets a full frame. Deltas are computed on first
+    request for a ``(from, to)`` pair and kept in a bounded LRU.
+    """
+
+    def __init__(self, max_deltas: int = DEFAULT_MAX_DELTAS,
+                 max_frames: int = DEFAULT_MAX_FRAMES):
+        self.max_deltas = max_deltas
+        self.max_frames = max_frames
+        self._frames: OrderedDict[str, bytes] = OrderedDict()
+        self._encoded: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._deltas: OrderedDict[tuple[str, str], list[Span]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, encoded: str) -> tuple[str, bytes]:
+        """Decode a base64 bitmap once, returning ``(hash, packed bytes)``."""
+        with self._lock:
+            known = self._encoded.get(encoded)
+            if known:
+                self._encoded.move_to_end(encoded)
+                if known[0] in self._frames:
+                    self._frames.move_to_end(known[0])
+                    return known
+        bitmap = base64_to_bitmap(encoded)
+        digest = frame_hash(bitmap)
+        with self._lock:
+            self._frames[digest] = bitmap
+            self._frames.move_to_end(digest)
+            self._encoded[encoded] = (digest, bitmap)
+            self._encoded.move_to_end(encoded)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+            while len(self._encoded) > self.max_frames:
+                self._encoded.popitem(last=False)
+        return digest, bitmap
+
+    def frame(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            return self._frames.get(digest)
+
+    def delta(self, have: Optional[str], encoded: str) -> tuple[str, list[Span]]:
+        """Spans that turn frame ``have`` into ``encoded``.
+
+        Falls back to a single full-frame span when ``have`` is unknown.
+        """
+        digest, bitmap = self.register(encoded)
+        if have == digest:
+            return digest, []
+
+        old = self.frame(have) if have else None
+        if old is None:
+            return digest, [(0, DISPLAY_HEIGHT, bitmap)]
+
+        key = (have, digest)
+        with self._lock:
+            spans = self._deltas.get(key)
+            if spans is not None:
+                self._deltas.move_to_end(key)
+                self.hits += 1
+                return digest, spans
+
+        spans = row_spans(old, bitmap)
+        with self._lock:
+            self.misses += 1
+            self._deltas[key] = spans
+            while len(self._deltas) > self.max_deltas:
+                self._deltas.popitem(last=False)
+        return digest, spans
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._encoded.clear()
+            self._deltas.clear()
+
+
+# Shared by the watcher, which registers each frame as it builds a snapshot,
+# and the server, which answers /delta from it.
+DELTAS = DeltaCache()
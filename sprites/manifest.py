@@ -16,21 +16,50 @@ Sprite spec (for art generation):
     - Color: black and white only (1-bit, no grayscale)
     - Format: PNG (will be converted to packed bitmap)
     - Character should be centered with ~10px margin
+
+The full (activity, emotion, variant, sleeping) table can be resolved once up
+front with ``warm_up()``; after that ``lookup`` is a single dict get with no
+filesystem access. Until the table is ready, lookups resolve lazily and cache
+misses as well as hits.
 """
 
+import threading
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
 
+from core.sentiment import VARIANT_COUNTS, EmotionBand
+from parsers.base import Activity
 from .encoder import encode_sprite
 
 # Default assets directory (sibling to this file)
 _DEFAULT_ASSETS_DIR = Path(__file__).parent / "assets"
 
+ACTIVITIES = tuple(a.value for a in Activity)
+EMOTIONS = tuple(b.value for b in EmotionBand)
+MAX_VARIANTS = max(VARIANT_COUNTS.values())
+
+LookupKey = tuple[str, str, int, bool]
+
+_MISSING = object()
+
 
 class SpriteManifest:
     def __init__(self, assets_dir: Optional[Path] = None):
         self.assets_dir = assets_dir or _DEFAULT_ASSETS_DIR
-        self._cache: dict[str, str] = {}
+        self._cache: dict[str, Optional[str]] = {}
+        self._table: Mapping[LookupKey, Optional[str]] = MappingProxyType({})
+        self._warm_thread: Optional[threading.Thread] = None
+        # _lock guards writes to _cache; _build_lock keeps a warm-up and a
+        # reload from publishing tables out of order.
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def warmed(self) -> bool:
+        return bool(self._table)
 
     def lookup(self, activity: str, emotion: str, variant: int,
                sleeping: bool = False) -> Optional[str]:
@@ -38,50 +67,117 @@ class SpriteManifest:
 
         Returns None if no matching sprite file exists.
         """
+        result = self._table.get((activity, emotion, variant, sleeping), _MISSING)
+        if result is not _MISSING:
+            self.hits += 1
+            return result
+        self.misses += 1
+        return self._resolve(activity, emotion, variant, sleeping)
+
+    def warm_up(self, background: bool = True) -> None:
+        """Resolve every known mood state into an immutable lookup table.
+
+        With ``background=True`` the work runs on a daemon thread and lookups
+        keep resolving lazily until the table is swapped in.
+        """
+        if not background:
+            with self._build_lock:
+                self._table = self._build_table()
+            return
+        self._warm_thread = threading.Thread(
+            target=self.warm_up, kwargs={"background": False},
+            name="sprite-warmup", daemon=True,
+        )
+        self._warm_thread.start()
+
+    def wait_warm(self, timeout: Optional[float] = None) -> bool:
+        """Block until a background warm-up finishes. Returns ``warmed``."""
+        if self._warm_thread:
+            self._warm_thread.join(timeout)
+        return self.warmed
+
+    def reload(self, changed: Iterable[str]) -> None:
+        """Re-encode only the changed sprite files and swap in a new table.
+
+        The replacement cache and table are built privately and published
+        with plain attribute assignment, so concurrent lookups see either the
+        old table or the new one, never a partial rebuild.
+        """
+        with self._build_lock:
+            with self._lock:
+                cache = dict(self._cache)
+            for name in changed:
+                cache.pop(name, None)
+            table = self._build_table(cache)
+            with self._lock:
+                self._cache = cache
+            self._table = table
+
+    def _build_table(self, cache: Optional[dict] = None) -> Mapping[LookupKey, Optional[str]]:
+        table: dict[LookupKey, Optional[str]] = {}
+        for activity in ACTIVITIES:
+            for emotion in EMOTIONS:
+                for variant in range(MAX_VARIANTS):
+                    for sleeping in (False, True):
+                        key = (activity, emotion, variant, sleeping)
+                        table[key] = self._resolve(*key, cache=cache)
+        return MappingProxyType(table)
+
+    def _resolve(self, activity: str, emotion: str, variant: int,
+                 sleeping: bool, cache: Optional[dict] = None) -> Optional[str]:
+        """Walk the fallback chain for one mood state."""
         if sleeping:
-            result = self._try_encode("sleeping_0")
+            result = self._try_encode("sleeping_0", cache=cache)
             if result:
                 return result
 
         # Try exact match: activity_emotion_variant.png
-        result = self._try_encode(f"{activity}_{emotion}_{variant}")
+        result = self._try_encode(f"{activity}_{emotion}_{variant}", cache=cache)
         if result:
             return result
 
         # Fallback: variant 0
         if variant != 0:
-            result = self._try_encode(f"{activity}_{emotion}_0")
+            result = self._try_encode(f"{activity}_{emotion}_0", cache=cache)
             if result:
                 return result
 
         # Fallback: thinking as default activity
         if activity != "thinking":
-            result = self._try_encode(f"thinking_{emotion}_0")
+            result = self._try_encode(f"thinking_{emotion}_0", cache=cache)
             if result:
                 return result
 
         return None
 
-    def _try_encode(self, stem: str, ext: str = "png") -> Optional[str]:
-        """Try to load and encode a sprite file, using cache."""
+    def _try_encode(self, stem: str, ext: str = "png",
+                    cache: Optional[dict] = None) -> Optional[str]:
+        """Try to load and encode a sprite file, caching hits and misses."""
+        shared = cache is None
+        if shared:
+            cache = self._cache
         # Normalize the key
         key = f"{stem}.{ext}" if "." not in stem else stem
         if not key.endswith(f".{ext}"):
             key = f"{key}.{ext}"
 
-        if key in self._cache:
-            return self._cache[key]
+        if key in cache:
+            return cache[key]
 
         path = self.assets_dir / key
-        if not path.exists():
-            return None
-
-        try:
-            encoded = encode_sprite(path)
-            self._cache[key] = encoded
-            return encoded
-        except (ValueError, ImportError, OSError):
-            return None
+        encoded = None
+        if path.exists():
+            try:
+                encoded = encode_sprite(path)
+            except (ValueError, ImportError, OSError):
+                encoded = None
+        if shared:
+            # Copied by reload() on another thread; never resize it unlocked.
+            with self._lock:
+                self._cache[key] = encoded
+        else:
+            cache[key] = encoded
+        return encoded
 
     def list_sprites(self) -> list[str]:
         """Return all PNG filenames in the assets directory."""
@@ -91,7 +187,9 @@ class SpriteManifest:
 
     def clear_cache(self) -> None:
         """Clear the encoded bitmap cache (e.g. after sprite files change)."""
-        self._cache.clear()
+        with self._lock:
+            self._cache = {}
+        self._table = MappingProxyType({})
 
     def sprite_exists(self, activity: str, emotion: str, variant: int) -> bool:
         """Check if a specific sprite file exists (without encoding it)."""
@@ -0,0 +1,187 @@
+"""Hot-reload of sprite assets.
+
+Watches the manifest's assets directory and re-encodes changed PNGs without
+restarting the server. Change detection uses inotify on Linux (through libc,
+no extra dependency) and falls back to polling file mtimes/sizes elsewhere.
+
+Two threads are involved so that encoding never blocks change detection:
+
+    watcher thread  → pushes changed filenames onto a queue
+    reload thread   → debounces, then calls ``SpriteManifest.reload()``
+
+``SpriteManifest.reload()`` builds the new cache and lookup table privately
+and swaps them in, so in-flight lookups always see a complete table. Moods
+already published still carry the old bitmap, so ``on_reload`` (usually
+``WatcherLoop.refresh_sprites``) is called after each reload to republish
+them.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from .manifest import SpriteManifest
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 0.5
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+            | _IN_CREATE | _IN_DELETE)
+_IN_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1") or not hasattr(libc, "inotify_add_watch"):
+        return None
+    return libc
+
+
+class AssetWatcher:
+    def __init__(self, manifest: SpriteManifest,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 use_inotify: bool = True,
+                 on_reload: Optional[Callable[[], None]] = None):
+        self.manifest = manifest
+        self.on_reload = on_reload
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+        self.mode: Optional[str] = None
+        self._changes: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._reloads = 0
+
+    @property
+    def reload_count(self) -> int:
+        return self._reloads
+
+    def start(self) -> None:
+        libc = _load_inotify() if self.use_inotify else None
+        fd = self._inotify_open(libc) if libc else None
+        if fd is not None:
+            self.mode = "inotify"
+            detect = threading.Thread(target=self._watch_inotify, args=(fd,),
+                                      name="sprite-watch", daemon=True)
+        else:
+            self.mode = "poll"
+            detect = threading.Thread(target=self._watch_poll,
+                                      name="sprite-watch", daemon=True)
+        reload = threading.Thread(target=self._reload_loop,
+                                  name="sprite-reload", daemon=True)
+        self._threads = [detect, reload]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._changes.put(None)
+        for thread in self._threads:
+            thread.join(timeout=self.poll_interval + 1)
+
+    def _inotify_open(self, libc) -> Optional[int]:
+        if not self.manifest.assets_dir.is_dir():
+            return None
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        wd = libc.inotify_add_watch(fd, str(self.manifest.assets_dir).encode(), _IN_MASK)
+        if wd < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _watch_inotify(self, fd: int) -> None:
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                for name in _parse_events(data):
+                    if name.endswith(".png"):
+                        self._changes.put(name)
+        finally:
+            os.close(fd)
+
+    def _watch_poll(self) -> None:
+        previous = self._scan()
+        while not self._stop.wait(self.poll_interval):
+            current = self._scan()
+            for name in previous.keys() | current.keys():
+                if previous.get(name) != current.get(name):
+                    self._changes.put(name)
+            previous = current
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        assets_dir: Path = self.manifest.assets_dir
+        if not assets_dir.is_dir():
+            return stats
+        for entry in os.scandir(assets_dir):
+            if not entry.name.endswith(".png"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            stats[entry.name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _reload_loop(self) -> None:
+        while not self._stop.is_set():
+            name = self._changes.get()
+            if name is None:
+                return
+            changed = {name}
+            # Collect the rest of a burst (editors and render scripts write
+            # many files at once) before paying for a rebuild.
+            while True:
+                try:
+                    name = self._changes.get(timeout=self.debounce)
+                except queue.Empty:
+                    break
+                if name is None:
+                    return
+                changed.add(name)
+            self.manifest.reload(changed)
+            self._reloads += 1
+            if self.on_reload:
+                try:
+                    self.on_reload()
+                except Exception:
+                    pass
+
+
+def _parse_events(data: bytes) -> Iterator[str]:
+    offset = 0
+    while offset + _IN_EVENT.size <= len(data):
+        _, _, _, length = _IN_EVENT.unpack_from(data, offset)
+        offset += _IN_EVENT.size
+        raw = data[offset:offset + length]
+        offset += length
+        name = raw.split(b"\0", 1)[0]
+        if name:
+            yield name.decode("utf-8", "replace")
@@ -0,0 +1,186 @@
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from parsers.base import Activity, ParsedMessage
+from parsers.claude_code import ClaudeCodeParser
+from watcher.checkpoint import (
+    CHECKPOINT_VERSION,
+    load_checkpoint,
+    message_from_row,
+    message_to_row,
+    save_checkpoint,
+)
+from watcher.monitor import AgentMonitor, WatcherLoop
+
+
+def _write_jsonl(tmp_path, text="This is a helpful and positive response"):
+    project_dir = tmp_path / "proj"
+    project_dir.mkdir(parents=True, exist_ok=True)
+    path = project_dir / "s.jsonl"
+    entry = json.dumps({
+        "type": "assistant",
+        "uuid": "entry-1",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": [{"type": "text", "text": text}]},
+    })
+    path.write_text(entry + "\n")
+    return path
+
+
+def _monitor(tmp_path):
+    return AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))
+
+
+class TestCheckpointFile:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "state.json.gz"
+        save_checkpoint(path, {"agents": {"a": 1}})
+        assert load_checkpoint(path) == {"version": CHECKPOINT_VERSION, "agents": {"a": 1}}
+        assert not (tmp_path / "state.json.gz.tmp").exists()
+
+    def test_missing_or_corrupt(self, tmp_path):
+        assert load_checkpoint(tmp_path / "missing") is None
+        (tmp_path / "bad").write_bytes(b"not gzip")
+        assert load_checkpoint(tmp_path / "bad") is None
+
+    def test_other_version_ignored(self, tmp_path):
+        path = tmp_path / "state.json.gz"
+        path.write_bytes(gzip.compress(json.dumps({"version": CHECKPOINT_VERSION + 1}).encode()))
+        assert load_checkpoint(path) is None
+
+    def test_message_rows(self):
+        msg = ParsedMessage(timestamp=datetime(2026, 2, 20, tzinfo=timezone.utc), text="hi there",
+                            activity=Activity.EDITING, tool_name="Edit", entry_id="u1")
+        msg.sentiment = (0.5, 0.3)
+        row = json.loads(json.dumps(message_to_row(msg)))
+        restored = message_from_row(row)
+        assert restored == msg
+        assert restored.sentiment == (0.5, 0.3)
+        assert message_from_row(row, keep_sentiment=False).sentiment is None
+
+
+class TestMonitorRestore:
+    def test_restored_monitor_skips_first_parse(self, tmp_path, monkeypatch):
+        _write_jsonl(tmp_path)
+        first = _monitor(tmp_path)
+        first.poll()
+        data = json.loads(json.dumps(first.checkpoint()))
+
+        second = _monitor(tmp_path)
+        assert second.restore(data)
+        assert second.snapshot.body == first.snapshot.body
+        monkeypatch.setattr(second.parser, "parse_session", lambda *a, **k: 1 / 0)
+        assert second.poll() is False
+
+    def test_changed_file_is_not_restored(self, tmp_path):
+        path = _write_jsonl(tmp_path)
+        first = _monitor(tmp_path)
+        first.poll()
+        data = json.loads(json.dumps(first.checkpoint()))
+
+        with open(path, "a") as f:
+            f.write("\n")
+        second = _monitor(tmp_path)
+        assert not second.restore(data)
+        assert second.current_mood is None
+        assert second.poll() is True
+
+    def test_engine_state_restored_without_session(self, tmp_path):
+        first = _monitor(tmp_path)
+        first.engine._last_variant[("reading", "neutral")] = 2
+        second = _monitor(tmp_path)
+        assert not second.restore(first.checkpoint())
+        assert second.engine._last_variant == {("reading", "neutral"): 2}
+
+
+class TestWatcherCheckpoint:
+    def test_stop_saves_and_start_restores(self, tmp_path, monkeypatch):
+        _write_jsonl(tmp_path)
+        state = tmp_path / "state.json.gz"
+        watcher = WatcherLoop([_monitor(tmp_path)], interval=60, checkpoint_path=state)
+        watcher.start()
+        body = watcher.get_snapshot("claude-code").body
+        watcher.stop()
+        assert load_checkpoint(state)["agents"]["claude-code"]["session"]
+
+        monitor = _monitor(tmp_path)
+        parses = []
+        original = monitor.parser.parse_session
+        monkeypatch.setattr(monitor.parser, "parse_session",
+                            lambda *a, **k: parses.append(a) or original(*a, **k))
+        restarted = WatcherLoop([monitor], interval=60, checkpoint_path=state)
+        restarted.start()
+        try:
+            assert restarted.get_snapshot("claude-code").body == body
+            assert parses == []
+        finally:
+            restarted.stop()
+
+    def test_scores_dropped_when_scoring_changes(self, tmp_path, monkeypatch):
+        import watcher.monitor as monitor_module
+
+        _write_jsonl(tmp_path)
+        state = tmp_path / "state.json.gz"
+        watcher = WatcherLoop([_monitor(tmp_path)], interval=60, checkpoint_path=state)
+        watcher.start()
+        watcher.stop()
+
+        monkeypatch.setattr(monitor_module, "scoring_version", lambda: "changed")
+        monitor = _monitor(tmp_path)
+        restarted = WatcherLoop([monitor], interval=60, checkpoint_path=state)
+        assert restarted.restore_checkpoint() == ["claude-code"]
+        assert all(m.sentiment is None for m in monitor._session.messages)
+
+    def test_periodic_checkpoint(self, tmp_path):
+        _write_jsonl(tmp_path)
+        state = tmp_path / "state.json.gz"
+        watcher = WatcherLoop([_monitor(tmp_path)], interval=60, checkpoint_path=state,
+                              checkpoint_interval=0.05)
+        watcher.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not state.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert state.exists()
+        finally:
+            watcher.stop()
+
+    def test_saves_do_not_overlap(self, tmp_path, monkeypatch):
+        import watcher.monitor as monitor_module
+
+        _write_jsonl(tmp_path)
+        state = tmp_path / "state.json.gz"
+        watcher = WatcherLoop([_monitor(tmp_path)], interval=60, checkpoint_path=state)
+        watcher.poll_all()
+        writing = []
+        overlaps = []
+
+        def slow_save(path, data):
+            overlaps.append(bool(writing))
+            writing.append(True)
+            time.sleep(0.05)
+            save_checkpoint(path, data)
+            writing.pop()
+
+        monkeypatch.setattr(monitor_module, "save_checkpoint", slow_save)
+        threads = [threading.Thread(target=watcher.save_checkpoint) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert overlaps == [False] * 4
+        assert load_checkpoint(state)["agents"]["claude-code"]["session"]
+
+    @pytest.mark.parametrize("interval", [0.1, 1000.0])
+    def test_intervals_restored_within_bounds(self, tmp_path, interval):
+        state = tmp_path / "state.json.gz"
+        save_checkpoint(state, {"intervals": {"claude-code": interval}, "agents": {}})
+        watcher = WatcherLoop([_monitor(tmp_path)], interval=10, min_interval=1,
+                              max_interval=60, checkpoint_path=state)
+        watcher.restore_checkpoint()
+        assert watcher.effective_interval("claude-code") == min(max(interval, 1), 60)
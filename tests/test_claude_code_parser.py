@@ -1,12 +1,21 @@
 import json
+import random
+import re
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 import pytest
 
-from parsers.base import Activity, ParsedMessage, ParsedSession
-from parsers.claude_code import ClaudeCodeParser
+from parsers.base import Activity, ParsedMessage, ParsedSession, take_recent
+from parsers.claude_code import (
+    DEDUPE_WINDOW,
+    ClaudeCodeParser,
+    _read_entries,
+    parse_timestamp,
+    read_lines_reversed,
+    strip_system_tags,
+)
 
 
 def _make_assistant_entry(
@@ -328,6 +337,85 @@ class TestNoiseFiltering:
         assert len(session.messages[0].text) == 1500
 
 
+# The regex strip_system_tags replaced; its output is the golden reference.
+LEGACY_SYSTEM_TAGS = re.compile(
+    r"<(system-reminder|task-notification|user-prompt-submit-hook)[^>]*>.*?"
+    r"</(system-reminder|task-notification|user-prompt-submit-hook)>",
+    re.DOTALL,
+)
+
+TAG_FRAGMENTS = [
+    "<system-reminder>", "<system-reminder", "</system-reminder>", "</system-reminder",
+    "<system-reminders>", "<task-notification id=\"1\">", "</task-notification>",
+    "<user-prompt-submit-hook>", "</user-prompt-submit-hook>", "<", "</", ">",
+    "text ", "line\n",
+]
+
+
+class TestParseTimestamp:
+    @pytest.mark.parametrize("ts", [
+        "2026-02-20T14:30:00.123Z",
+        "2026-02-20T14:30:00Z",
+        "2026-02-20T14:30:00.123456Z",
+        "2026-02-20T14:30:00.123+00:00",
+        "2026-02-20T16:30:00+02:00",
+        "2026-02-20T14:30:00",
+    ])
+    def test_matches_fromisoformat(self, ts):
+        assert parse_timestamp(ts) == datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+    def test_claude_code_stamps_share_utc(self):
+        parsed = parse_timestamp("2026-02-20T14:30:00.123Z")
+        assert parsed == datetime(2026, 2, 20, 14, 30, 0, 123000, tzinfo=timezone.utc)
+        assert parsed.tzinfo is timezone.utc
+
+    def test_naive_stays_naive(self):
+        assert parse_timestamp("2026-02-20T14:30:00").tzinfo is None
+
+    @pytest.mark.parametrize("ts", [None, "", "garbage", "2026-02-2xT14:30:00.123Z", 1234])
+    def test_invalid(self, ts):
+        assert parse_timestamp(ts) is None
+
+
+class TestStripSystemTags:
+    @pytest.mark.parametrize("text", [
+        "",
+        "plain text",
+        "<system-reminder>hidden</system-reminder>visible",
+        "before <system-reminder>a</system-reminder> middle <task-notification>b</task-notification> after",
+        "<system-reminder>mismatched closer</task-notification>kept",
+        "<system-reminder attr='x'>multi\nline</system-reminder>kept",
+        "<system-reminder>nested <system-reminder>inner</system-reminder> tail</system-reminder>",
+        "<system-reminder>never closed",
+        "<system-reminder no gt </system-reminder>",
+        "<system-reminderish>prefix match</system-reminder>",
+        "</system-reminder>closer first<system-reminder>x</system-reminder>",
+        "a < b and c > d",
+    ])
+    def test_matches_legacy_regex(self, text):
+        assert strip_system_tags(text) == LEGACY_SYSTEM_TAGS.sub("", text)
+
+    def test_matches_legacy_regex_on_random_input(self):
+        rng = random.Random(42)
+        for _ in range(5000):
+            text = "".join(rng.choice(TAG_FRAGMENTS) for _ in range(rng.randint(0, 15)))
+            assert strip_system_tags(text) == LEGACY_SYSTEM_TAGS.sub("", text), text
+
+    def test_unchanged_text_is_not_copied(self):
+        text = "nothing to strip here"
+        assert strip_system_tags(text) is text
+
+    @pytest.mark.parametrize("text", [
+        "<system-reminder>x" * 50000,
+        "<task-notification" * 50000,
+    ])
+    def test_pathological_input_is_linear(self, text):
+        # The legacy regex takes seconds here; a linear scan takes well under 50ms.
+        start = time.perf_counter()
+        assert strip_system_tags(text) == text
+        assert time.perf_counter() - start < 0.05
+
+
 class TestLastN:
     def test_respects_last_n_limit(self, tmp_path):
         lines = [
@@ -355,6 +443,246 @@ class TestLastN:
         assert len(session.messages) == 1
 
 
+def _msg(role="assistant", text="enough text to count here", is_error=False):
+    return ParsedMessage(timestamp=datetime(2026, 2, 20, tzinfo=timezone.utc), text=text,
+                         activity=Activity.CONVERSING, role=role, is_error=is_error)
+
+
+class TestParsedMessage:
+    def test_timestamp_kept_as_given(self):
+        ts = datetime(2026, 2, 20, 14, 30, 0, 123000, tzinfo=timezone.utc)
+        msg = ParsedMessage(timestamp=ts, text="hi", activity=Activity.CONVERSING)
+        assert msg.timestamp is ts
+        assert msg.epoch_ms == 1771597800123
+        assert ParsedMessage(timestamp=1771597800123, text="hi",
+                             activity=Activity.CONVERSING).epoch_ms == 1771597800123
+        assert ParsedMessage(timestamp=1771597800123, text="hi",
+                             activity=Activity.CONVERSING).timestamp == ts
+
+    def test_naive_timestamp_is_utc(self):
+        msg = ParsedMessage(timestamp=datetime(2026, 2, 20, 14, 30),
+                            text="hi", activity=Activity.CONVERSING)
+        assert msg.timestamp == datetime(2026, 2, 20, 14, 30, tzinfo=timezone.utc)
+        assert msg == ParsedMessage(timestamp=1771597800000, text="hi",
+                                    activity=Activity.CONVERSING)
+
+    def test_is_slotted_with_interned_names(self):
+        a = ParsedMessage(timestamp=0, text="a", activity=Activity.EDITING,
+                          tool_name="".join(["Ed", "it"]), role="".join(["assi", "stant"]))
+        b = ParsedMessage(timestamp=0, text="b", activity=Activity.EDITING, tool_name="Edit")
+        assert not hasattr(a, "__dict__")
+        assert a.tool_name is b.tool_name
+        assert a.role is b.role
+
+    def test_equality(self):
+        assert _msg() == _msg()
+        assert _msg(text="one message text") != _msg(text="another message text")
+
+    def test_drop_text_only_after_scoring(self):
+        msg = _msg(text="Everything works now and the tests pass")
+        msg.drop_text()
+        assert msg.text
+        msg.sentiment = (0.5, 0.4)
+        msg.drop_text()
+        assert msg.text == ""
+        assert msg.has_text
+
+    def test_has_text(self):
+        assert not _msg(text="").has_text
+        assert not _msg(text="   ").has_text
+        assert _msg(text="words").has_text
+
+
+class TestTakeRecent:
+    def test_pulls_only_n(self):
+        newest_first = iter([_msg(text=str(i)) for i in range(10)])
+        kept = take_recent(newest_first, 3)
+        assert [m.text for m in kept] == ["2", "1", "0"]
+        assert next(newest_first).text == "3"  # nothing past n was pulled
+
+    def test_matches_plain_tail(self):
+        messages = [_msg(role=r, text=str(i)) for i, r in enumerate(["user", "assistant"] * 5)]
+        assert take_recent(reversed(messages), 3) == messages[-3:]
+        assert take_recent(reversed(messages), 0) == []
+
+
+class TestReadLinesReversed:
+    def test_reads_backwards_across_chunks(self, tmp_path):
+        path = tmp_path / "f.jsonl"
+        path.write_bytes(b"one\ntwo\n\nthree\n")
+        assert list(read_lines_reversed(path, chunk_size=2)) == [b"three", b"", b"two", b"one"]
+
+    def test_no_trailing_newline(self, tmp_path):
+        path = tmp_path / "f.jsonl"
+        path.write_bytes(b"one\ntwo")
+        assert list(read_lines_reversed(path)) == [b"two", b"one"]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "f.jsonl"
+        path.write_bytes(b"")
+        assert list(read_lines_reversed(path)) == []
+
+
+class TestReadsOnlyLastN:
+    def test_parses_only_the_tail(self, tmp_path, monkeypatch):
+        lines = [
+            _make_assistant_entry(text=f"Message number {i} with enough text to pass the filter")
+            for i in range(50)
+        ]
+        path = _write_session(tmp_path, lines)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        calls = []
+        original = parser._parse_entry
+        monkeypatch.setattr(parser, "_parse_entry", lambda e: calls.append(e) or original(e))
+
+        session = parser.parse_session(path, last_n=4)
+
+        assert len(session.messages) == 4
+        assert "49" in session.messages[-1].text
+        assert len(calls) == 4
+
+
+class TestIterMessages:
+    def _session(self, tmp_path):
+        lines = [
+            _make_assistant_entry(text=f"Message number {i} with enough text to pass the filter",
+                                  timestamp=f"2026-02-20T14:3{i}:00.000Z")
+            for i in range(5)
+        ]
+        return _write_session(tmp_path, lines)
+
+    def test_oldest_first(self, tmp_path):
+        path = self._session(tmp_path)
+        texts = [m.text for m in ClaudeCodeParser(base_path=tmp_path).iter_messages(path)]
+        assert [t.split()[2] for t in texts] == ["0", "1", "2", "3", "4"]
+
+    def test_reverse_is_newest_first(self, tmp_path):
+        path = self._session(tmp_path)
+        texts = [m.text for m in ClaudeCodeParser(base_path=tmp_path).iter_messages(path, reverse=True)]
+        assert [t.split()[2] for t in texts] == ["4", "3", "2", "1", "0"]
+
+    def test_start_skips_older_messages(self, tmp_path):
+        path = self._session(tmp_path)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        start = datetime(2026, 2, 20, 14, 32, tzinfo=timezone.utc)
+        assert len(list(parser.iter_messages(path, start=start))) == 3
+        assert len(list(parser.iter_messages(path, start=start, reverse=True))) == 3
+        # Naive datetimes are taken as UTC.
+        assert len(list(parser.iter_messages(path, start=start.replace(tzinfo=None)))) == 3
+
+    def test_is_lazy(self, tmp_path):
+        path = self._session(tmp_path)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        first = next(parser.iter_messages(path, reverse=True))
+        assert "4" in first.text
+
+    def test_missing_file(self, tmp_path):
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        assert list(parser.iter_messages(tmp_path / "missing.jsonl")) == []
+
+
+def _make_chunk(msg_id, block, timestamp="2026-02-20T14:30:00.000Z", uuid=None):
+    entry = {
+        "type": "assistant",
+        "timestamp": timestamp,
+        "message": {"id": msg_id, "role": "assistant", "content": [block]},
+    }
+    if uuid:
+        entry["uuid"] = uuid
+    return json.dumps(entry)
+
+
+def _reply(msg_id, text, tools=(), minute=30):
+    ts = f"2026-02-20T14:{minute:02d}:%02d.000Z"
+    lines = [
+        _make_chunk(msg_id, {"type": "thinking", "thinking": "hmm"}, ts % 0, f"{msg_id}-0"),
+        _make_chunk(msg_id, {"type": "text", "text": text}, ts % 1, f"{msg_id}-1"),
+    ]
+    for i, (name, tool_input) in enumerate(tools, start=2):
+        lines.append(_make_chunk(msg_id, {"type": "tool_use", "name": name, "input": tool_input},
+                                 ts % i, f"{msg_id}-{i}"))
+    return lines
+
+
+class TestStreamedReplies:
+    def test_chunks_merge_into_one_message(self, tmp_path):
+        lines = _reply("msg_1", "The config needs a new timeout value here",
+                       tools=[("Edit", {"file_path": "a.py"})])
+        path = _write_session(tmp_path, lines)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        for reverse in (False, True):
+            messages = list(parser.iter_messages(path, reverse=reverse))
+            assert len(messages) == 1
+            assert messages[0].text == "The config needs a new timeout value here"
+            assert messages[0].activity == Activity.EDITING
+            assert messages[0].tool_name == "Edit"
+            assert messages[0].timestamp == datetime(2026, 2, 20, 14, 30, 2, tzinfo=timezone.utc)
+
+    def test_latest_tool_use_is_the_activity(self, tmp_path):
+        lines = _reply("msg_1", "Reading the file and then running the tests",
+                       tools=[("Read", {}), ("Bash", {"command": "pytest"})])
+        path = _write_session(tmp_path, lines)
+        for reverse in (False, True):
+            [message] = ClaudeCodeParser(base_path=tmp_path).iter_messages(path, reverse=reverse)
+            assert message.tool_name == "Bash"
+            assert message.activity == Activity.EXECUTING
+
+    def test_duplicate_uuids_are_dropped(self, tmp_path):
+        lines = _reply("msg_1", "A reply that was written to the transcript twice")
+        path = _write_session(tmp_path, lines + lines)
+        messages = list(ClaudeCodeParser(base_path=tmp_path).iter_messages(path))
+        assert len(messages) == 1
+
+    def test_uuid_dedupe_is_bounded(self):
+        def line(i):
+            return json.dumps({"type": "system", "uuid": f"u{i}"}).encode()
+
+        unique = [line(i) for i in range(DEDUPE_WINDOW + 1)]
+        # The newest uuids are still caught; one pushed out of the window is not.
+        entries = list(_read_entries(unique + [line(DEDUPE_WINDOW), line(0)]))
+        assert len(entries) == DEDUPE_WINDOW + 2
+        assert entries[-1]["uuid"] == "u0"
+
+    def test_tool_results_do_not_split_a_reply(self, tmp_path):
+        result = json.dumps({
+            "type": "user",
+            "timestamp": "2026-02-20T14:30:05.000Z",
+            "message": {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": "t1", "content": "ok"},
+            ]},
+        })
+        lines = _reply("msg_1", "Checking both files before the edit",
+                       tools=[("Read", {})])
+        lines.insert(2, result)
+        path = _write_session(tmp_path, lines)
+        assert len(list(ClaudeCodeParser(base_path=tmp_path).iter_messages(path))) == 1
+
+    def test_separate_replies_keep_their_order(self, tmp_path):
+        error = json.dumps({
+            "type": "user",
+            "timestamp": "2026-02-20T14:31:30.000Z",
+            "message": {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": "t1", "is_error": True, "content": "boom"},
+            ]},
+        })
+        lines = (_reply("msg_1", "First reply with plenty of text in it", minute=31)
+                 + [error]
+                 + _reply("msg_2", "Second reply with plenty of text in it", minute=32))
+        path = _write_session(tmp_path, lines)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        roles = [m.role for m in parser.iter_messages(path)]
+        assert roles == ["assistant", "tool_result", "assistant"]
+        assert [m.role for m in parser.iter_messages(path, reverse=True)] == roles[::-1]
+
+    def test_window_counts_replies_not_chunks(self, tmp_path):
+        lines = []
+        for i in range(20):
+            lines += _reply(f"msg_{i}", f"Reply number {i} with enough text to count", minute=i)
+        path = _write_session(tmp_path, lines)
+        session = ClaudeCodeParser(base_path=tmp_path).parse_session(path, last_n=5)
+        assert [m.text.split()[2] for m in session.messages] == ["15", "16", "17", "18", "19"]
+
+
 class TestParsedSession:
     def test_last_activity_time(self, tmp_path):
         lines = [
@@ -0,0 +1,115 @@
+import pytest
+
+from sprites.delta import DeltaCache, frame_hash, row_spans
+from sprites.encoder import BITMAP_SIZE, BYTES_PER_ROW, DISPLAY_HEIGHT, bitmap_to_base64
+
+
+def _frame(dirty_rows=(), fill=0xFF):
+    data = bytearray(BITMAP_SIZE)
+    for row in dirty_rows:
+        data[row * BYTES_PER_ROW:(row + 1) * BYTES_PER_ROW] = bytes([fill]) * BYTES_PER_ROW
+    return bytes(data)
+
+
+class TestFrameHash:
+    def test_stable_and_short(self):
+        frame = _frame([3])
+        assert frame_hash(frame) == frame_hash(bytes(frame))
+        assert len(frame_hash(frame)) == 16
+
+    def test_differs_between_frames(self):
+        assert frame_hash(_frame([1])) != frame_hash(_frame([2]))
+
+
+class TestRowSpans:
+    def test_identical_frames_have_no_spans(self):
+        frame = _frame([5, 6])
+        assert row_spans(frame, frame) == []
+
+    def test_single_changed_row(self):
+        spans = row_spans(_frame(), _frame([10]))
+        assert len(spans) == 1
+        start, count, rows = spans[0]
+        assert (start, count) == (10, 1)
+        assert rows == b"\xff" * BYTES_PER_ROW
+
+    def test_contiguous_rows_grouped(self):
+        spans = row_spans(_frame(), _frame([10, 11, 12, 50]))
+        assert [(s, c) for s, c, _ in spans] == [(10, 3), (50, 1)]
+
+    def test_span_reaching_last_row(self):
+        spans = row_spans(_frame(), _frame([DISPLAY_HEIGHT - 2, DISPLAY_HEIGHT - 1]))
+        assert [(s, c) for s, c, _ in spans] == [(DISPLAY_HEIGHT - 2, 2)]
+
+    def test_applying_spans_reproduces_target(self):
+        old = _frame([0, 1, 2, 100])
+        new = _frame([2, 3, 100, 150, 199])
+        result = bytearray(old)
+        for start, count, rows in row_spans(old, new):
+            result[start * BYTES_PER_ROW:(start + count) * BYTES_PER_ROW] = rows
+        assert bytes(result) == new
+
+
+class TestDeltaCache:
+    def test_unknown_base_returns_full_frame(self):
+        cache = DeltaCache()
+        new = _frame([4])
+        digest, spans = cache.delta("deadbeefdeadbeef", bitmap_to_base64(new))
+        assert digest == frame_hash(new)
+        assert spans == [(0, DISPLAY_HEIGHT, new)]
+
+    def test_no_base_returns_full_frame(self):
+        cache = DeltaCache()
+        _, spans = cache.delta(None, bitmap_to_base64(_frame([4])))
+        assert len(spans) == 1
+        assert spans[0][:2] == (0, DISPLAY_HEIGHT)
+
+    def test_same_frame_returns_no_spans(self):
+        cache = DeltaCache()
+        encoded = bitmap_to_base64(_frame([4]))
+        digest, _ = cache.register(encoded)
+        assert cache.delta(digest, encoded) == (digest, [])
+
+    def test_known_base_returns_changed_rows(self):
+        cache = DeltaCache()
+        old_digest, _ = cache.register(bitmap_to_base64(_frame([4])))
+        _, spans = cache.delta(old_digest, bitmap_to_base64(_frame([4, 5])))
+        assert [(s, c) for s, c, _ in spans] == [(5, 1)]
+
+    def test_deltas_cached_per_pair(self):
+        cache = DeltaCache()
+        old_digest, _ = cache.register(bitmap_to_base64(_frame([1])))
+        encoded = bitmap_to_base64(_frame([2]))
+        _, first = cache.delta(old_digest, encoded)
+        _, second = cache.delta(old_digest, encoded)
+        assert first is second
+
+    def test_delta_cache_is_bounded(self):
+        cache = DeltaCache(max_deltas=2)
+        base, _ = cache.register(bitmap_to_base64(_frame([0])))
+        for row in range(1, 5):
+            cache.delta(base, bitmap_to_base64(_frame([row])))
+        assert len(cache._deltas) == 2
+
+    def test_frame_lookup_by_hash(self):
+        cache = DeltaCache()
+        frame = _frame([7])
+        digest, _ = cache.register(bitmap_to_base64(frame))
+        assert cache.frame(digest) == frame
+        assert cache.frame("missing") is None
+
+    def test_frames_are_bounded(self):
+        cache = DeltaCache(max_frames=2)
+        digests = [cache.register(bitmap_to_base64(_frame([row])))[0] for row in range(4)]
+        assert len(cache._frames) == len(cache._encoded) == 2
+        assert cache.frame(digests[0]) is None
+        assert cache.frame(digests[3]) is not None
+
+    def test_recently_used_frame_survives(self):
+        cache = DeltaCache(max_frames=2)
+        first = bitmap_to_base64(_frame([0]))
+        digest, _ = cache.register(first)
+        cache.register(bitmap_to_base64(_frame([1])))
+        cache.register(first)
+        cache.register(bitmap_to_base64(_frame([2])))
+        assert cache.frame(digest) is not None
@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from core.state import MoodState
+from parsers.claude_code import ClaudeCodeParser
+from watcher.events import MoodBus, MoodChanged, OverflowPolicy
+from watcher.monitor import AgentMonitor, MoodSnapshot, WatcherLoop
+
+
+def _write_jsonl(tmp_path, text="This is a helpful and positive response"):
+    project_dir = tmp_path / "proj"
+    project_dir.mkdir(parents=True, exist_ok=True)
+    path = project_dir / "s.jsonl"
+    entry = json.dumps({
+        "type": "assistant",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": [{"type": "text", "text": text}]},
+    })
+    path.write_text(entry + "\n")
+    return path
+
+
+def _event(agent="claude-code", emotion="neutral"):
+    mood = MoodState("thinking", emotion, 0, "t", False)
+    return MoodChanged(agent, MoodSnapshot.build(mood))
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestMoodBus:
+    def test_delivers_to_all_subscribers(self):
+        bus = MoodBus()
+        a, b = [], []
+        bus.subscribe(a.append)
+        bus.subscribe(b.append)
+
+        event = _event()
+        bus.publish(event)
+        assert _wait_for(lambda: a == [event] and b == [event])
+
+    def test_unsubscribe_stops_delivery(self):
+        bus = MoodBus()
+        received = []
+        sub = bus.subscribe(received.append)
+        bus.unsubscribe(sub)
+        bus.publish(_event())
+        time.sleep(0.05)
+        assert received == []
+        assert bus.subscriptions == []
+
+    def test_handler_errors_are_isolated(self):
+        bus = MoodBus()
+        received = []
+
+        def broken(event):
+            raise RuntimeError("boom")
+
+        bad = bus.subscribe(broken)
+        bus.subscribe(received.append)
+        bus.publish(_event())
+        bus.publish(_event(emotion="positive"))
+        assert _wait_for(lambda: len(received) == 2)
+        assert _wait_for(lambda: bad.errors == 2)
+
+
+class TestOverflowPolicies:
+    def _blocked(self, bus, policy, maxsize):
+        gate = threading.Event()
+        received = []
+
+        def slow(event):
+            gate.wait()
+            received.append(event)
+
+        sub = bus.subscribe(slow, maxsize=maxsize, policy=policy)
+        first = _event(emotion="elated")
+        bus.publish(first)  # taken by the handler, which then blocks
+        assert _wait_for(lambda: sub.pending == 0)
+        return sub, gate, received, first
+
+    def test_slow_consumer_never_blocks_publish(self):
+        bus = MoodBus()
+        sub, gate, _, _ = self._blocked(bus, OverflowPolicy.DROP_OLDEST, maxsize=2)
+        start = time.monotonic()
+        for _ in range(1000):
+            bus.publish(_event())
+        assert time.monotonic() - start < 0.5
+        assert sub.pending == 2
+        gate.set()
+
+    def test_drop_oldest(self):
+        bus = MoodBus()
+        sub, gate, received, first = self._blocked(bus, OverflowPolicy.DROP_OLDEST, maxsize=2)
+        events = [_event(emotion=e) for e in ("negative", "uneasy", "positive")]
+        for event in events:
+            bus.publish(event)
+        gate.set()
+        assert _wait_for(lambda: len(received) == 3)
+        assert received == [first] + events[1:]
+        assert sub.dropped == 1
+
+    def test_drop_newest(self):
+        bus = MoodBus()
+        sub, gate, received, first = self._blocked(bus, OverflowPolicy.DROP_NEWEST, maxsize=2)
+        events = [_event(emotion=e) for e in ("negative", "uneasy", "positive")]
+        for event in events:
+            bus.publish(event)
+        gate.set()
+        assert _wait_for(lambda: len(received) == 3)
+        assert received == [first] + events[:2]
+        assert sub.dropped == 1
+
+    def test_coalesce_keeps_latest_per_agent(self):
+        bus = MoodBus()
+        sub, gate, received, first = self._blocked(bus, OverflowPolicy.COALESCE, maxsize=8)
+        cc = [_event("claude-code", e) for e in ("negative", "uneasy", "positive")]
+        oc = _event("opencode", "neutral")
+        for event in (cc[0], oc, cc[1], cc[2]):
+            bus.publish(event)
+        gate.set()
+        assert _wait_for(lambda: len(received) == 3)
+        assert received[1:] == [cc[2], oc]
+
+
+class TestWatcherPublishes:
+    def test_poll_publishes_mood_changed(self, tmp_path):
+        _write_jsonl(tmp_path)
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))])
+        received = []
+        watcher.bus.subscribe(received.append)
+
+        watcher.poll_all()
+        assert _wait_for(lambda: len(received) == 1)
+        assert received[0].agent == "claude-code"
+        assert received[0].snapshot is watcher.get_snapshot("claude-code")
+
+    def test_unchanged_poll_publishes_nothing(self, tmp_path):
+        _write_jsonl(tmp_path)
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))])
+        received = []
+        watcher.bus.subscribe(received.append)
+
+        watcher.poll_all()
+        watcher.poll_all()
+        time.sleep(0.05)
+        assert len(received) == 1
@@ -0,0 +1,102 @@
+import pytest
+
+from core.state import MoodState
+from watcher.history import BYTES_PER_SAMPLE, MoodHistory, MoodRing, pack_state, unpack_state
+
+
+def _mood(activity="editing", emotion="positive", sleeping=False, score=0.2):
+    return MoodState(activity=activity, emotion=emotion, variant=0,
+                     timestamp="2026-02-20T14:30:00+00:00", sleeping=sleeping,
+                     sentiment_score=score)
+
+
+class TestMoodRing:
+    def test_overwrites_oldest(self):
+        ring = MoodRing(capacity=3)
+        for t in range(5):
+            ring.append(float(t), 0.0, 0)
+        assert len(ring) == 3
+        assert [s[0] for s in ring.range(0, 10)] == [2.0, 3.0, 4.0]
+        assert ring.last[0] == 4.0
+
+    def test_range_is_half_open(self):
+        ring = MoodRing(capacity=8)
+        for t in range(6):
+            ring.append(float(t), 0.0, 0)
+        assert [s[0] for s in ring.range(2, 4)] == [2.0, 3.0]
+        assert list(ring.range(10, 20)) == []
+
+    def test_preallocated(self):
+        ring = MoodRing(capacity=100)
+        size = sum(a.itemsize * len(a) for a in (ring._times, ring._scores, ring._states))
+        assert size == 100 * BYTES_PER_SAMPLE
+
+    def test_rejects_zero_capacity(self):
+        with pytest.raises(ValueError):
+            MoodRing(capacity=0)
+
+
+class TestPackState:
+    @pytest.mark.parametrize("sleeping", [False, True])
+    def test_round_trip(self, sleeping):
+        mood = _mood("system", "elated", sleeping)
+        assert unpack_state(pack_state(mood)) == ("system", "elated", sleeping)
+
+
+class TestMoodHistory:
+    def test_records_transitions_and_periodic_samples(self):
+        history = MoodHistory(sample_interval=60)
+        assert history.observe("a", "s1", _mood(), now=100)
+        assert not history.observe("a", "s1", _mood(score=0.3), now=130)
+        assert history.observe("a", "s1", _mood(emotion="elated"), now=131)
+        assert history.observe("a", "s1", _mood(emotion="elated"), now=200)
+        assert [p["t"] for p in history.query("a", 0, 1000)] == [100, 131, 200]
+
+    def test_sleeping_is_a_transition(self):
+        history = MoodHistory()
+        history.observe("a", "s1", _mood(), now=100)
+        assert history.observe("a", "s1", _mood(sleeping=True), now=101)
+
+    def test_sessions_merged_in_time_order(self):
+        history = MoodHistory()
+        history.observe("a", "s1", _mood(), now=100)
+        history.observe("a", "s2", _mood(), now=150)
+        history.observe("a", "s1", _mood(emotion="negative"), now=200)
+        points = history.query("a", 0, 1000)
+        assert [(p["t"], p["session"]) for p in points] == [(100, "s1"), (150, "s2"), (200, "s1")]
+
+    def test_oldest_session_evicted(self):
+        history = MoodHistory(max_sessions=2)
+        for i, session in enumerate(["s1", "s2", "s1", "s3"]):
+            history.observe("a", session, _mood(emotion="negative" if i % 2 else "positive"), now=i)
+        assert history.sessions("a") == ["s1", "s3"]
+
+    def test_downsampled_buckets(self):
+        history = MoodHistory(sample_interval=1)
+        for t, score, emotion in [(0, 0.0, "neutral"), (5, 0.4, "positive"),
+                                  (12, -0.2, "uneasy"), (35, 0.1, "neutral")]:
+            history.observe("a", "s1", _mood(emotion=emotion, score=score), now=t)
+        points = history.query("a", 0, 40, step=10)
+        assert [(p["t"], p["score"], p["emotion"], p["samples"]) for p in points] == [
+            (0, 0.2, "positive", 2), (10, -0.2, "uneasy", 1), (30, 0.1, "neutral", 1)]
+
+    @pytest.mark.parametrize("start, step", [(0, float("nan")), (float("-inf"), 10), (0, 0),
+                                             (0, 1e-320)])
+    def test_rejects_unbucketable_ranges(self, start, step):
+        history = MoodHistory(sample_interval=1)
+        history.observe("a", "s1", _mood(), now=5)
+        with pytest.raises(ValueError):
+            history.query("a", start, 40, step=step)
+
+    def test_clock_step_back_keeps_order(self):
+        history = MoodHistory()
+        history.observe("a", "s1", _mood(), now=100)
+        history.observe("a", "s1", _mood(emotion="negative"), now=50)
+        assert [p["t"] for p in history.query("a", 0, 1000)] == [100, 100]
+
+    def test_unknown_agent(self):
+        assert MoodHistory().query("missing", 0, 10) == []
+
+    def test_budget(self):
+        history = MoodHistory(capacity=4096, max_sessions=4)
+        assert history.budget(1) == 4096 * 4 * 13
@@ -2,6 +2,8 @@ from pathlib import Path
 
 import pytest
 
+from core.sentiment import VARIANT_COUNTS
+from parsers.base import Activity
 from sprites.manifest import SpriteManifest
 
 
@@ -131,3 +133,91 @@ class TestSpriteManifest:
         neutral = manifest.lookup("thinking", "neutral", 0)
         positive = manifest.lookup("thinking", "positive", 0)
         assert neutral != positive
+
+
+class TestNegativeCache:
+    def test_misses_are_cached(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+
+        manifest.lookup("conversing", "negative", 2)
+        assert manifest._cache["conversing_negative_2.png"] is None
+        assert manifest._cache["thinking_negative_0.png"] is None
+
+    def test_cached_miss_skips_filesystem(self, tmp_path, monkeypatch):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.lookup("conversing", "negative", 0)
+
+        calls = []
+        monkeypatch.setattr(Path, "exists", lambda self: calls.append(self) or False)
+        assert manifest.lookup("conversing", "negative", 0) is None
+        assert calls == []
+
+
+class TestWarmUp:
+    def test_not_warmed_initially(self, tmp_path):
+        manifest = SpriteManifest(assets_dir=tmp_path / "assets")
+        assert manifest.warmed is False
+
+    def test_foreground_warm_up_builds_table(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        _make_sprite(assets, "sleeping_0.png", color="white")
+        manifest = SpriteManifest(assets_dir=assets)
+
+        manifest.warm_up(background=False)
+        assert manifest.warmed is True
+        assert manifest._table[("editing", "neutral", 3, False)] is not None
+        assert manifest._table[("editing", "negative", 0, False)] is None
+        assert manifest._table[("editing", "negative", 0, True)] is not None
+
+    def test_background_warm_up(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+
+        manifest.warm_up()
+        assert manifest.wait_warm(timeout=30) is True
+        assert manifest.lookup("reading", "neutral", 1) is not None
+
+    def test_warmed_lookup_does_no_io(self, tmp_path, monkeypatch):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        manifest._cache.clear()
+
+        monkeypatch.setattr(Path, "exists", lambda self: pytest.fail("filesystem access"))
+        assert manifest.lookup("system", "neutral", 2) is not None
+        assert manifest.lookup("system", "elated", 0) is None
+
+    def test_table_covers_every_engine_state(self, tmp_path):
+        manifest = SpriteManifest(assets_dir=tmp_path / "assets")
+        manifest.warm_up(background=False)
+        for activity in Activity:
+            for band, count in VARIANT_COUNTS.items():
+                for variant in range(count):
+                    assert (activity.value, band.value, variant, False) in manifest._table
+
+    def test_table_is_immutable(self, tmp_path):
+        manifest = SpriteManifest(assets_dir=tmp_path / "assets")
+        manifest.warm_up(background=False)
+        with pytest.raises(TypeError):
+            manifest._table[("thinking", "neutral", 0, False)] = "x"
+
+    def test_unknown_state_falls_back_to_lazy_resolve(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+
+        assert manifest.lookup("thinking", "neutral", 9) is not None
+
+    def test_clear_cache_drops_table(self, tmp_path):
+        manifest = SpriteManifest(assets_dir=tmp_path / "assets")
+        manifest.warm_up(background=False)
+        manifest.clear_cache()
+        assert manifest.warmed is False
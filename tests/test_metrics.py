@@ -0,0 +1,146 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from core.metrics import REGISTRY, MetricsRegistry
+from parsers.claude_code import ClaudeCodeParser
+from watcher.monitor import FIND_SESSION_SECONDS, POLL_SECONDS, POLLS, QUIET_POLL_SAMPLE, AgentMonitor
+
+
+class TestCounter:
+    def test_inc_and_render(self):
+        registry = MetricsRegistry()
+        polls = registry.counter("polls_total", "Polls", ("agent",))
+        polls.inc("a")
+        polls.inc("a", amount=2)
+        polls.inc("b")
+
+        text = registry.render()
+        assert "# TYPE polls_total counter" in text
+        assert 'polls_total{agent="a"} 3' in text
+        assert 'polls_total{agent="b"} 1' in text
+
+    def test_wrong_label_count(self):
+        registry = MetricsRegistry()
+        polls = registry.counter("polls_total", "Polls", ("agent",))
+        with pytest.raises(ValueError):
+            polls.inc("a", "b")
+
+    def test_label_values_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ("x",)).inc('say "hi"\n')
+        assert 'c{x="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+class TestRegistry:
+    def test_same_metric_returned_twice(self):
+        registry = MetricsRegistry()
+        first = registry.counter("c", "C", ("agent",))
+        assert registry.counter("c", "C", ("agent",)) is first
+
+    def test_conflicting_registration(self):
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ("agent",))
+        with pytest.raises(ValueError):
+            registry.histogram("c", "C", ("agent",))
+
+    def test_collectors_render_at_scrape(self):
+        registry = MetricsRegistry()
+        hits = {"n": 0}
+        registry.add_collector(lambda: [("hits_total", "counter", "Hits", [({}, hits["n"])])])
+        hits["n"] = 7
+        assert "hits_total 7" in registry.render()
+
+
+class TestGauge:
+    def test_set_overwrites(self):
+        registry = MetricsRegistry()
+        vbat = registry.gauge("vbat", "Battery", ("device",))
+        vbat.set(4.1, "d1")
+        vbat.set(3.9, "d1")
+        assert vbat.value("d1") == 3.9
+        assert 'vbat{device="d1"} 3.9' in registry.render()
+
+    def test_max_series_evicts_least_recent(self):
+        registry = MetricsRegistry()
+        vbat = registry.gauge("vbat", "Battery", ("device",), max_series=2)
+        vbat.set(4.0, "a")
+        vbat.set(4.0, "b")
+        vbat.set(4.1, "a")
+        vbat.set(4.0, "c")
+        assert vbat.value("a") == 4.1
+        assert vbat.value("b") is None
+        assert vbat.value("c") == 4.0
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("lat_seconds", "Latency", ("agent",), buckets=(0.01, 0.1))
+        latency.observe(0.005, "a")
+        latency.observe(0.05, "a")
+        latency.observe(5, "a")
+
+        text = registry.render()
+        assert 'lat_seconds_bucket{agent="a",le="0.01"} 1' in text
+        assert 'lat_seconds_bucket{agent="a",le="0.1"} 2' in text
+        assert 'lat_seconds_bucket{agent="a",le="+Inf"} 3' in text
+        assert 'lat_seconds_count{agent="a"} 3' in text
+        assert 'lat_seconds_sum{agent="a"} 5.055' in text
+
+    def test_boundary_value_falls_in_its_bucket(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("lat", "Latency", buckets=(1.0,))
+        latency.observe(1.0)
+        assert 'lat_bucket{le="1"} 1' in registry.render()
+
+
+def _write_session(tmp_path, messages=100):
+    project = tmp_path / "proj"
+    project.mkdir()
+    lines = []
+    for i in range(messages):
+        lines.append(json.dumps({
+            "type": "assistant",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": [
+                {"type": "text", "text": f"Step {i}: this looks good, the tests are passing nicely"},
+                {"type": "tool_use", "name": "Bash", "input": {"command": "pytest"}},
+            ]},
+        }))
+    (project / "session.jsonl").write_text("\n".join(lines) + "\n")
+
+
+class TestMonitorInstrumentation:
+    def test_poll_outcomes_counted(self, tmp_path):
+        _write_session(tmp_path, messages=3)
+        monitor = AgentMonitor("metrics-test", ClaudeCodeParser(base_path=tmp_path))
+        changed = POLLS.value("metrics-test", "changed")
+        unchanged = POLLS.value("metrics-test", "unchanged")
+
+        monitor.poll()
+        assert POLLS.value("metrics-test", "changed") == changed + 1
+        monitor.poll()
+        # Unchanged polls are batched until the next flush.
+        assert POLLS.value("metrics-test", "unchanged") == unchanged
+        monitor.flush_metrics()
+        assert POLLS.value("metrics-test", "unchanged") == unchanged + 1
+
+    def test_idle_when_no_session(self, tmp_path):
+        monitor = AgentMonitor("metrics-idle", ClaudeCodeParser(base_path=tmp_path))
+        monitor.poll()
+        assert 'moodbot_polls_total{agent="metrics-idle",result="idle"} 1' in REGISTRY.render()
+        assert POLLS.value("metrics-idle", "idle") == 1
+
+    def test_quiet_polls_sampled(self, tmp_path):
+        _write_session(tmp_path, messages=3)
+        monitor = AgentMonitor("metrics-sampled", ClaudeCodeParser(base_path=tmp_path))
+        for _ in range(2 * QUIET_POLL_SAMPLE):
+            monitor.poll()
+        # Only the sampled polls time find_active_session; the whole poll
+        # is also timed on the first, which parsed.
+        assert FIND_SESSION_SECONDS.count("metrics-sampled") == 2
+        assert POLL_SECONDS.count("metrics-sampled") == 3
+        # Every sampled poll also flushed the batched counts.
+        assert POLLS.value("metrics-sampled", "unchanged") == 2 * QUIET_POLL_SAMPLE - 1
@@ -382,6 +382,69 @@ class TestLastN:
         session = parser.parse_session(Path("ses_1"), last_n=100)
         assert len(session.messages) == 1
 
+    def test_newest_messages_kept(self, tmp_path):
+        db_path = tmp_path / "opencode.db"
+        conn = _init_db(db_path)
+        _add_session(conn, "ses_1")
+        for i in range(20):
+            ts = TS_BASE + i * 1000
+            role = "user" if i % 2 else "assistant"
+            _add_message(conn, f"msg_{i:02d}", "ses_1", role=role, ts=ts)
+            _add_part(conn, f"prt_{i:02d}a", f"msg_{i:02d}", "ses_1", "text", ts=ts,
+                      text=f"Message number {i} with enough text to pass the filter")
+            _add_part(conn, f"prt_{i:02d}b", f"msg_{i:02d}", "ses_1", "text", ts=ts,
+                      text="and a second part")
+        conn.close()
+
+        parser = OpenCodeParser(db_path=db_path)
+        session = parser.parse_session(Path("ses_1"), last_n=4)
+        assert [m.role for m in session.messages] == ["assistant", "user", "assistant", "user"]
+        assert session.messages[0].text.startswith("Message number 16")
+        # Parts within a message keep their order.
+        assert session.messages[-1].text.endswith("and a second part")
+
+
+class TestIterMessages:
+    def _db(self, tmp_path, count=5):
+        db_path = tmp_path / "opencode.db"
+        conn = _init_db(db_path)
+        _add_session(conn, "ses_1")
+        for i in range(count):
+            ts = TS_BASE + i * 60000
+            _add_message(conn, f"msg_{i:02d}", "ses_1", ts=ts)
+            _add_part(conn, f"prt_{i:02d}", f"msg_{i:02d}", "ses_1", "text", ts=ts,
+                      text=f"Message number {i} with enough text to pass the filter")
+        conn.close()
+        return OpenCodeParser(db_path=db_path)
+
+    def test_oldest_first(self, tmp_path):
+        parser = self._db(tmp_path)
+        texts = [m.text for m in parser.iter_messages(Path("ses_1"))]
+        assert [t.split()[2] for t in texts] == ["0", "1", "2", "3", "4"]
+
+    def test_reverse_is_newest_first(self, tmp_path):
+        parser = self._db(tmp_path)
+        texts = [m.text for m in parser.iter_messages(Path("ses_1"), reverse=True)]
+        assert [t.split()[2] for t in texts] == ["4", "3", "2", "1", "0"]
+
+    def test_start_skips_older_messages(self, tmp_path):
+        parser = self._db(tmp_path)
+        start = datetime.fromtimestamp((TS_BASE + 2 * 60000) / 1000, tz=timezone.utc)
+        assert len(list(parser.iter_messages(Path("ses_1"), start=start))) == 3
+        assert len(list(parser.iter_messages(Path("ses_1"), start=start, reverse=True))) == 3
+        naive = start.replace(tzinfo=None)
+        assert len(list(parser.iter_messages(Path("ses_1"), start=naive))) == 3
+
+    def test_reads_in_batches(self, tmp_path, monkeypatch):
+        import parsers.opencode as opencode
+        monkeypatch.setattr(opencode, "FETCH_SIZE", 2)
+        parser = self._db(tmp_path, count=7)
+        assert len(list(parser.iter_messages(Path("ses_1")))) == 7
+
+    def test_unknown_session(self, tmp_path):
+        parser = self._db(tmp_path)
+        assert list(parser.iter_messages(Path("ses_missing"))) == []
+
 
 class TestParsedSession:
     def test_last_activity_time(self, tmp_path):
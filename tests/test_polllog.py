@@ -0,0 +1,166 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.polllog import (
+    PollLogger,
+    PollRecord,
+    drain_curves,
+    log_files,
+    read_poll_log,
+)
+
+
+def _record(minutes=0, device="10.0.0.5", vbat="4.10", agent="claude-code"):
+    return PollRecord(
+        time=datetime(2026, 3, 1, 12, 0) + timedelta(minutes=minutes),
+        device=device, agent=agent, poll="30", vbat=vbat, fw="0.1.0",
+    )
+
+
+class TestPollLogger:
+    def test_writes_on_close(self, tmp_path):
+        path = tmp_path / "battery.log"
+        logger = PollLogger(path, flush_interval=60)
+        logger.start()
+        logger.log(_record())
+        logger.log(_record(1))
+        logger.close()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert lines[0] == "2026-03-01T12:00:00 poll=30s vbat=4.10V fw=0.1.0 agent=claude-code device=10.0.0.5"
+
+    def test_flushes_in_background(self, tmp_path):
+        path = tmp_path / "battery.log"
+        logger = PollLogger(path, flush_interval=0.05)
+        logger.start()
+        logger.log(_record())
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and not path.exists():
+            time.sleep(0.01)
+        assert path.exists()
+        logger.close()
+
+    def test_log_never_blocks_when_queue_full(self, tmp_path):
+        logger = PollLogger(tmp_path / "battery.log", queue_size=2)
+        for minute in range(5):
+            logger.log(_record(minute))
+        assert logger.dropped == 3
+
+    def test_csv_format(self, tmp_path):
+        path = tmp_path / "battery.csv"
+        logger = PollLogger(path, fmt="csv")
+        logger.start()
+        logger.log(_record())
+        logger.close()
+
+        lines = path.read_text().splitlines()
+        assert lines[0] == "time,device,agent,poll,vbat,fw"
+        assert lines[1] == "2026-03-01T12:00:00,10.0.0.5,claude-code,30,4.10,0.1.0"
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError, match="format"):
+            PollLogger(tmp_path / "x.log", fmt="parquet")
+
+    def test_size_rotation(self, tmp_path):
+        path = tmp_path / "battery.log"
+        logger = PollLogger(path, max_bytes=200, backups=2, batch_size=1)
+        logger.start()
+        for minute in range(12):
+            logger.log(_record(minute))
+        logger.close()
+
+        files = log_files(path)
+        assert [f.name for f in files] == ["battery.log.2", "battery.log.1", "battery.log"]
+        assert all(f.stat().st_size < 400 for f in files)
+
+    def test_age_rotation(self, tmp_path):
+        path = tmp_path / "battery.log"
+        logger = PollLogger(path, max_age=3600, batch_size=1)
+        logger.start()
+        logger.log(_record())
+        logger.close()
+
+        logger = PollLogger(path, max_age=3600, batch_size=1)
+        logger.start()  # first record is from 2026-03-01, long past max_age
+        logger.log(_record(1))
+        logger.close()
+        assert (tmp_path / "battery.log.1").exists()
+
+    def test_failed_rotation_drops_batch_and_keeps_writing(self, tmp_path, monkeypatch):
+        path = tmp_path / "battery.log"
+        real_replace = os.replace
+        failures = [OSError("backup locked")]
+
+        def flaky_replace(src, dst):
+            if failures:
+                raise failures.pop()
+            real_replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", flaky_replace)
+        logger = PollLogger(path, max_bytes=1, batch_size=1)
+        logger.start()
+        for minute in range(3):
+            logger.log(_record(minute))
+        logger.close()
+
+        assert logger.dropped == 1
+        assert [r.time.minute for r in read_poll_log(path)] == [0, 2]
+
+    def test_csv_header_after_rotation(self, tmp_path):
+        path = tmp_path / "battery.csv"
+        logger = PollLogger(path, fmt="csv", max_bytes=100, batch_size=1)
+        logger.start()
+        for minute in range(6):
+            logger.log(_record(minute))
+        logger.close()
+        for file in log_files(path):
+            assert file.read_text().startswith("time,device")
+
+
+class TestReader:
+    def test_reads_across_backups_in_order(self, tmp_path):
+        path = tmp_path / "battery.log"
+        logger = PollLogger(path, max_bytes=200, backups=5, batch_size=1)
+        logger.start()
+        for minute in range(10):
+            logger.log(_record(minute))
+        logger.close()
+
+        times = [r.time for r in read_poll_log(path)]
+        assert len(times) == 10
+        assert times == sorted(times)
+
+    def test_reads_legacy_lines(self, tmp_path):
+        path = tmp_path / "battery.log"
+        path.write_text("2026-03-01T12:00:00 poll=30s vbat=4.12V fw=0.1.0 agent=claude-code\n")
+        [record] = list(read_poll_log(path))
+        assert record.vbat == "4.12"
+        assert record.poll == "30"
+        assert record.device == "claude-code"
+
+    def test_skips_garbage(self, tmp_path):
+        path = tmp_path / "battery.log"
+        path.write_text("not a record\n\n")
+        assert list(read_poll_log(path)) == []
+
+
+class TestDrainCurves:
+    def test_groups_by_device(self):
+        records = [
+            _record(0, device="a", vbat="4.10"),
+            _record(0, device="b", vbat="4.00"),
+            _record(30, device="a", vbat="4.05"),
+            _record(60, device="a", vbat="?"),
+        ]
+        curves = drain_curves(records)
+        assert set(curves) == {"a", "b"}
+        assert [v for _, v in curves["a"]] == [4.10, 4.05]
+
+    def test_points_sorted_by_time(self):
+        curves = drain_curves([_record(30, vbat="4.0"), _record(0, vbat="4.1")])
+        [points] = curves.values()
+        assert [v for _, v in points] == [4.1, 4.0]
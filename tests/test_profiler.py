@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from server.profiler import ProfilerBusy, SamplingProfiler
+
+
+def _spin_in_named_thread(name):
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    thread = threading.Thread(target=busy_loop, name=name, daemon=True)
+    thread.start()
+    return stop, thread
+
+
+@pytest.fixture
+def spinner():
+    stop, thread = _spin_in_named_thread("moodbot-test-spin")
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestSamplingProfiler:
+    def test_collapsed_stack_output(self, spinner):
+        output = SamplingProfiler(hz=200).profile(0.2)
+        lines = [l for l in output.splitlines() if l.startswith("moodbot-test-spin;")]
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        frames = stack.split(";")
+        assert frames[-1].endswith("busy_loop")
+        assert frames[1].startswith("threading:")
+
+    def test_thread_filter(self, spinner):
+        output = SamplingProfiler(hz=200).profile(0.1, thread="moodbot-test")
+        assert output
+        assert all(line.startswith("moodbot-test-spin;") for line in output.splitlines())
+
+    def test_excludes_own_thread(self):
+        output = SamplingProfiler(hz=200).profile(0.05, thread=threading.current_thread().name)
+        assert output == ""
+
+    def test_sample_count_follows_rate(self, spinner):
+        output = SamplingProfiler().profile(0.5, hz=50, thread="moodbot-test-spin")
+        samples = sum(int(line.rsplit(" ", 1)[1]) for line in output.splitlines())
+        assert 10 <= samples <= 30
+
+    @pytest.mark.parametrize("seconds, hz", [(float("nan"), None), (0.1, float("nan")), (0, None)])
+    def test_rejects_non_positive_or_nan(self, seconds, hz):
+        profiler = SamplingProfiler()
+        with pytest.raises(ValueError):
+            profiler.profile(seconds, hz=hz)
+        assert profiler.profile(0.01) is not None  # lock was not left held
+
+    def test_clamps_to_limits(self):
+        start = time.monotonic()
+        SamplingProfiler().profile(0.05, hz=float("inf"))
+        assert time.monotonic() - start < 5
+
+    def test_one_profile_at_a_time(self, spinner):
+        profiler = SamplingProfiler(hz=100)
+        worker = threading.Thread(target=profiler.profile, args=(0.5,))
+        worker.start()
+        time.sleep(0.1)
+        with pytest.raises(ProfilerBusy):
+            profiler.profile(0.1)
+        worker.join()
+        assert profiler.profile(0.01) is not None
@@ -0,0 +1,193 @@
+import time
+
+import pytest
+
+from sprites.manifest import SpriteManifest
+from sprites.reloader import AssetWatcher, _load_inotify
+
+
+PIL = pytest.importorskip("PIL", reason="Pillow required for reloader tests")
+from PIL import Image
+
+
+def _make_sprite(assets_dir, name, color="black"):
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    path = assets_dir / name
+    Image.new("RGB", (200, 200), color).save(path)
+    return path
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestManifestReload:
+    def test_reload_picks_up_changed_file(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png", color="black")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        before = manifest.lookup("thinking", "neutral", 0)
+
+        _make_sprite(assets, "thinking_neutral_0.png", color="white")
+        manifest.reload({"thinking_neutral_0.png"})
+        assert manifest.lookup("thinking", "neutral", 0) != before
+
+    def test_reload_picks_up_new_file(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        assert manifest.lookup("thinking", "positive", 0) is None
+
+        _make_sprite(assets, "thinking_positive_0.png")
+        manifest.reload({"thinking_positive_0.png"})
+        assert manifest.lookup("thinking", "positive", 0) is not None
+
+    def test_reload_reuses_unchanged_encodings(self, tmp_path, monkeypatch):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        _make_sprite(assets, "thinking_positive_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+
+        encoded = []
+        import sprites.manifest as manifest_module
+        real = manifest_module.encode_sprite
+        monkeypatch.setattr(manifest_module, "encode_sprite",
+                            lambda path: encoded.append(path.name) or real(path))
+        manifest.reload({"thinking_positive_0.png"})
+        assert encoded == ["thinking_positive_0.png"]
+
+    def test_reload_swaps_table_object(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        old_table = manifest._table
+
+        manifest.reload({"thinking_neutral_0.png"})
+        assert manifest._table is not old_table
+        assert old_table[("thinking", "neutral", 0, False)] is not None
+
+
+    def test_reload_while_encoding_on_other_threads(self, tmp_path):
+        import threading
+        assets = tmp_path / "assets"
+        for i in range(4):
+            _make_sprite(assets, f"thinking_neutral_{i}.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        errors = []
+
+        def lookups():
+            try:
+                for _ in range(20):
+                    manifest.clear_cache()
+                    for i in range(4):
+                        manifest.lookup("thinking", "neutral", i)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=lookups) for _ in range(4)]
+        for t in threads:
+            t.start()
+        try:
+            for _ in range(20):
+                manifest.reload({"thinking_neutral_0.png"})
+        finally:
+            for t in threads:
+                t.join()
+        assert errors == []
+
+
+class TestAssetWatcher:
+    def test_poll_mode_reloads_on_change(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png", color="black")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        before = manifest.lookup("thinking", "neutral", 0)
+
+        watcher = AssetWatcher(manifest, poll_interval=0.05, debounce=0.05,
+                               use_inotify=False)
+        watcher.start()
+        try:
+            assert watcher.mode == "poll"
+            time.sleep(0.1)
+            _make_sprite(assets, "thinking_neutral_0.png", color="white")
+            assert _wait_for(lambda: manifest.lookup("thinking", "neutral", 0) != before)
+        finally:
+            watcher.stop()
+
+    def test_on_reload_called_after_swap(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png", color="black")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+        before = manifest.lookup("thinking", "neutral", 0)
+        seen = []
+
+        watcher = AssetWatcher(manifest, poll_interval=0.05, debounce=0.05, use_inotify=False,
+                               on_reload=lambda: seen.append(manifest.lookup("thinking", "neutral", 0)))
+        watcher.start()
+        try:
+            time.sleep(0.1)
+            _make_sprite(assets, "thinking_neutral_0.png", color="white")
+            assert _wait_for(lambda: seen)
+            assert seen[0] != before
+        finally:
+            watcher.stop()
+
+    @pytest.mark.skipif(_load_inotify() is None, reason="inotify not available")
+    def test_inotify_mode_reloads_on_new_file(self, tmp_path):
+        assets = tmp_path / "assets"
+        _make_sprite(assets, "thinking_neutral_0.png")
+        manifest = SpriteManifest(assets_dir=assets)
+        manifest.warm_up(background=False)
+
+        watcher = AssetWatcher(manifest, poll_interval=0.05, debounce=0.05)
+        watcher.start()
+        try:
+            assert watcher.mode == "inotify"
+            _make_sprite(assets, "editing_positive_0.png")
+            assert _wait_for(lambda: manifest.lookup("editing", "positive", 0) is not None)
+        finally:
+            watcher.stop()
+
+    def test_burst_of_changes_coalesces_into_one_reload(self, tmp_path):
+        assets = tmp_path / "assets"
+        assets.mkdir()
+        manifest = SpriteManifest(assets_dir=assets)
+        watcher = AssetWatcher(manifest, poll_interval=0.05, debounce=0.3,
+                               use_inotify=False)
+        watcher.start()
+        try:
+            time.sleep(0.1)
+            for name in ("thinking_neutral_0.png", "thinking_positive_0.png",
+                         "thinking_uneasy_0.png"):
+                _make_sprite(assets, name)
+            assert _wait_for(lambda: watcher.reload_count >= 1)
+            time.sleep(0.4)
+            assert watcher.reload_count == 1
+        finally:
+            watcher.stop()
+
+    def test_non_png_files_ignored(self, tmp_path):
+        assets = tmp_path / "assets"
+        assets.mkdir()
+        manifest = SpriteManifest(assets_dir=assets)
+        watcher = AssetWatcher(manifest, poll_interval=0.05, debounce=0.05,
+                               use_inotify=False)
+        watcher.start()
+        try:
+            time.sleep(0.1)
+            (assets / "notes.txt").write_text("hello")
+            time.sleep(0.3)
+            assert watcher.reload_count == 0
+        finally:
+            watcher.stop()
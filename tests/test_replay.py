@@ -0,0 +1,110 @@
+import csv
+import json
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from core.replay import ReplayTimings, SimulatedClock, in_time_order, replay
+from core.state import MoodEngine
+from parsers.base import Activity, ParsedMessage, ParsedSession
+
+ROOT = Path(__file__).resolve().parent.parent
+START = datetime(2026, 2, 20, 14, 0, tzinfo=timezone.utc)
+
+
+def _msg(minutes, text="This is a wonderful and helpful response", role="assistant",
+         activity=Activity.CONVERSING):
+    return ParsedMessage(timestamp=START + timedelta(minutes=minutes), text=text,
+                         activity=activity, role=role)
+
+
+def _replay(messages, sleep_timeout=30 * 60, timings=None):
+    clock = SimulatedClock()
+    engine = MoodEngine(sleep_timeout=sleep_timeout, clock=clock)
+    return list(replay(messages, engine, clock, timings=timings))
+
+
+class TestInTimeOrder:
+    def test_sorts_within_window(self):
+        messages = [_msg(2), _msg(0), _msg(1), _msg(3)]
+        assert [m.epoch_ms for m in in_time_order(messages, window=2)] == sorted(
+            m.epoch_ms for m in messages)
+
+    def test_stable_for_equal_times(self):
+        first, second = _msg(0, text="first"), _msg(0, text="second")
+        assert list(in_time_order([first, second])) == [first, second]
+
+
+class TestReplay:
+    def test_one_step_per_message_then_sleep(self):
+        steps = _replay([_msg(0), _msg(1, activity=Activity.EDITING)])
+        assert [s.message is not None for s in steps] == [True, True, False]
+        assert steps[1].mood.activity == "editing"
+        assert not steps[1].mood.sleeping
+        assert steps[2].mood.sleeping
+        assert steps[2].time == (START + timedelta(minutes=31)).timestamp()
+
+    def test_sleeps_during_long_gap(self):
+        steps = _replay([_msg(0), _msg(120)])
+        assert [(s.message is None, s.mood.sleeping) for s in steps] == [
+            (False, False), (True, True), (False, False), (True, True)]
+        assert steps[1].time == (START + timedelta(minutes=30)).timestamp()
+
+    def test_no_sleep_without_timeout(self):
+        steps = _replay([_msg(0), _msg(120)], sleep_timeout=float("inf"))
+        assert len(steps) == 2
+        assert not any(s.mood.sleeping for s in steps)
+
+    def test_matches_engine_on_full_session(self):
+        messages = [_msg(i, text=t) for i, t in enumerate(
+            ["This is great!", "Terrible, everything failed", "OK, fixed it, wonderful"])]
+        last = _replay(messages)[-2].mood
+
+        engine = MoodEngine(clock=lambda: messages[-1].timestamp.timestamp())
+        expected = engine.compute(ParsedSession(file_path=Path("x"), messages=messages,
+                                                last_modified=messages[-1].timestamp.timestamp()))
+        assert (last.emotion, round(last.sentiment_score, 6)) == (
+            expected.emotion, round(expected.sentiment_score, 6))
+
+    def test_timings_recorded(self):
+        timings = ReplayTimings()
+        _replay([_msg(0), _msg(1)], timings=timings)
+        assert timings.compute > 0
+        assert timings.total == sum(timings.to_dict().values())
+
+
+class TestReplayCommand:
+    def _session(self, tmp_path):
+        path = tmp_path / "proj" / "s.jsonl"
+        path.parent.mkdir()
+        lines = []
+        for i, (kind, text) in enumerate([("user", "Please fix the failing login test in the parser"),
+                                          ("assistant", "Done, the tests pass now!")]):
+            lines.append(json.dumps({
+                "type": kind,
+                "uuid": f"u{i}",
+                "timestamp": (START + timedelta(minutes=i)).isoformat(),
+                "message": {"role": kind, "content": [{"type": "text", "text": text}]},
+            }))
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    def _run(self, *args):
+        return subprocess.run([sys.executable, str(ROOT / "__main__.py"), "replay", *args],
+                              capture_output=True, text=True, check=True, cwd=ROOT)
+
+    def test_csv_timeline_and_timings(self, tmp_path):
+        result = self._run(str(self._session(tmp_path)))
+        rows = list(csv.DictReader(result.stdout.splitlines()))
+        assert [r["trigger"] for r in rows] == ["user", "assistant", "sleep"]
+        assert rows[0]["time"] == "2026-02-20T14:00:00.000+00:00"
+        assert rows[-1]["sleeping"] == "True"
+        assert "compute" in result.stderr
+
+    def test_json_changes_only(self, tmp_path):
+        result = self._run(str(self._session(tmp_path)), "--format", "json", "--changes-only")
+        rows = [json.loads(line) for line in result.stdout.splitlines()]
+        assert rows[-1]["sleeping"] is True
+        states = [(r["activity"], r["emotion"], r["sleeping"]) for r in rows]
+        assert all(a != b for a, b in zip(states, states[1:]))
@@ -0,0 +1,34 @@
+import pytest
+
+from watcher.schedule import AdaptiveInterval
+
+
+class TestAdaptiveInterval:
+    def test_starts_at_floor_by_default(self):
+        assert AdaptiveInterval(1, 60).current == 1
+
+    def test_start_clamped_to_bounds(self):
+        assert AdaptiveInterval(1, 60, current=600).current == 60
+        assert AdaptiveInterval(1, 60, current=0.1).current == 1
+
+    def test_backs_off_while_idle(self):
+        interval = AdaptiveInterval(1, 10)
+        assert [interval.update(False) for _ in range(5)] == [2, 4, 8, 10, 10]
+
+    def test_change_resets_to_floor(self):
+        interval = AdaptiveInterval(0.5, 60, current=30)
+        assert interval.update(True) == 0.5
+
+    def test_custom_backoff(self):
+        interval = AdaptiveInterval(1, 100, backoff=3)
+        assert interval.update(False) == 3
+
+    def test_fixed_when_bounds_equal(self):
+        interval = AdaptiveInterval(10, 10)
+        assert interval.update(False) == 10
+        assert interval.update(True) == 10
+
+    @pytest.mark.parametrize("floor, ceiling, backoff", [(0, 10, 2), (5, 1, 2), (1, 10, 0.5)])
+    def test_invalid(self, floor, ceiling, backoff):
+        with pytest.raises(ValueError):
+            AdaptiveInterval(floor, ceiling, backoff)
@@ -0,0 +1,105 @@
+import zlib
+from datetime import datetime, timezone
+
+import pytest
+
+from core import sentiment
+from core.scorecache import ScoreCache
+from core.sentiment import score_message, scoring_version, set_score_cache
+from core.signals import compute_context_modifier
+from parsers.base import Activity, ParsedMessage
+
+
+def _msg(text="This is absolutely wonderful, the tests all pass!", entry_id="uuid-1",
+         role="assistant"):
+    return ParsedMessage(timestamp=datetime(2026, 2, 20, tzinfo=timezone.utc), text=text,
+                         activity=Activity.CONVERSING, role=role, entry_id=entry_id)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ScoreCache(tmp_path / "scores.db", version="v1", flush_interval=60)
+    cache.start()
+    set_score_cache(cache)
+    yield cache
+    set_score_cache(None)
+    cache.close()
+
+
+class TestScoreCache:
+    def test_put_is_visible_before_flush(self, cache):
+        cache.put("a", 123, 0.5, 0.4)
+        assert cache.get("a", 123) == (0.5, 0.4)
+        assert len(cache) == 0
+
+    def test_persists_across_restart(self, tmp_path):
+        path = tmp_path / "scores.db"
+        cache = ScoreCache(path, version="v1")
+        cache.start()
+        cache.put("a", 123, 0.5, 0.4)
+        cache.close()
+
+        reopened = ScoreCache(path, version="v1")
+        reopened.start()
+        assert len(reopened) == 1
+        assert reopened.get("a", 123) == (0.5, 0.4)
+        reopened.close()
+
+    def test_text_change_misses(self, cache):
+        cache.put("a", 123, 0.5, 0.4)
+        assert cache.get("a", 456) is None
+        assert cache.get("missing", 123) is None
+        assert cache.misses == 2
+
+    def test_version_change_discards_rows(self, tmp_path):
+        path = tmp_path / "scores.db"
+        cache = ScoreCache(path, version="v1")
+        cache.start()
+        cache.put("a", 123, 0.5, 0.4)
+        cache.close()
+
+        bumped = ScoreCache(path, version="v2")
+        bumped.start()
+        assert len(bumped) == 0
+        assert bumped.get("a", 123) is None
+        bumped.close()
+
+    def test_full_queue_drops(self, tmp_path):
+        cache = ScoreCache(tmp_path / "scores.db", version="v1", queue_size=1)
+        cache.put("a", 1, 0.1, 0.2)
+        cache.put("b", 2, 0.1, 0.2)
+        assert cache.dropped == 1
+        assert cache.get("b", 2) is None
+
+
+class TestScoreMessage:
+    def test_hit_skips_scoring(self, cache, monkeypatch):
+        msg = _msg()
+        cache.put("uuid-1", zlib.crc32(msg.text.encode()), 0.9, 0.7)
+        monkeypatch.setattr(sentiment, "score_text", lambda text: 1 / 0)
+        assert score_message(msg) == (0.9, 0.7)
+        assert cache.hits == 1
+
+    def test_miss_scores_and_stores(self, cache):
+        msg = _msg()
+        scored = score_message(msg)
+        assert cache.get("uuid-1", zlib.crc32(msg.text.encode())) == scored
+
+    def test_messages_without_id_bypass_cache(self, cache):
+        score_message(_msg(entry_id=None))
+        assert cache.hits == cache.misses == 0
+
+    def test_context_modifier_uses_cache(self, cache):
+        msg = _msg(text="Thanks, this is perfect and I love it", role="user")
+        cache.put("uuid-1", zlib.crc32(msg.text.encode()), -1.0, 1.0)
+        assert compute_context_modifier([msg]) < 0
+
+
+class TestScoringVersion:
+    def test_stable(self):
+        assert scoring_version() == scoring_version()
+
+    def test_changes_with_score_version(self, monkeypatch):
+        before = scoring_version()
+        monkeypatch.setattr(sentiment, "SCORE_VERSION", sentiment.SCORE_VERSION + 1)
+        assert scoring_version() != before
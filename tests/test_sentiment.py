@@ -1,12 +1,16 @@
+from datetime import datetime, timezone
+
 import pytest
 
 from core.sentiment import (
     EmotionBand,
     SentimentScorer,
     emotional_weight,
+    score_message,
     score_text,
     score_to_band,
 )
+from parsers.base import Activity, ParsedMessage
 
 
 class TestScoreText:
@@ -149,3 +153,22 @@ class TestSentimentScorer:
                 band = scorer.add_message(msg)
                 bands_seen.add(band)
         assert len(bands_seen) >= 2
+
+
+class TestScoreMessage:
+    def test_caches_on_message(self, monkeypatch):
+        msg = ParsedMessage(timestamp=datetime(2026, 2, 20, tzinfo=timezone.utc),
+                            text="This works perfectly now!", activity=Activity.CONVERSING)
+        first = score_message(msg)
+        assert first == (score_text(msg.text), emotional_weight(msg.text))
+        monkeypatch.setattr("core.sentiment.score_text", lambda text: 1 / 0)
+        assert score_message(msg) == first
+
+    def test_add_score_matches_add_message(self):
+        text = "This is absolutely wonderful! I love it so much!"
+        by_text, by_score = SentimentScorer(), SentimentScorer()
+        for _ in range(15):
+            by_text.add_message(text)
+            by_score.add_score(score_text(text), emotional_weight(text))
+        assert by_text.current_score == by_score.current_score
+        assert by_text.current_band == by_score.current_band
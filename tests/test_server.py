@@ -1,4 +1,8 @@
+import gzip
+import http.client
 import json
+import socket
+import statistics
 import threading
 import time
 from datetime import datetime, timezone
@@ -8,6 +12,7 @@ import pytest
 
 from parsers.claude_code import ClaudeCodeParser
 from watcher.monitor import AgentMonitor, WatcherLoop
+from server import app as server_app
 from server.app import MoodHandler, run_server, set_watcher
 
 try:
@@ -17,6 +22,14 @@ except ImportError:
     pass
 
 
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
 def _write_jsonl(tmp_path):
     project_dir = tmp_path / "proj"
     project_dir.mkdir(parents=True, exist_ok=True)
@@ -41,8 +54,7 @@ def _get(url: str) -> tuple[int, dict]:
         return e.code, json.loads(e.read())
 
 
-@pytest.fixture
-def live_server(tmp_path):
+def _start_server(tmp_path, **kwargs):
     _write_jsonl(tmp_path)
     parser = ClaudeCodeParser(base_path=tmp_path)
     monitor = AgentMonitor("claude-code", parser)
@@ -50,14 +62,29 @@ def live_server(tmp_path):
     watcher.poll_all()
     set_watcher(watcher)
 
-    server = run_server(host="127.0.0.1", port=0)
-    port = server.server_address[1]
+    server = run_server(host="127.0.0.1", port=0, **kwargs)
     thread = threading.Thread(target=server.serve_forever, daemon=True)
     thread.start()
+    return server
+
+
+def _get_with_headers(url: str, headers: dict) -> tuple[int, dict]:
+    try:
+        resp = urlopen(Request(url, headers=headers))
+        return resp.status, json.loads(resp.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.fixture
+def live_server(tmp_path):
+    server = _start_server(tmp_path)
+    port = server.server_address[1]
 
     yield f"http://127.0.0.1:{port}"
 
     server.shutdown()
+    server.server_close()
 
 
 class TestMoodEndpoint:
@@ -76,6 +103,62 @@ class TestMoodEndpoint:
         assert "error" in data
 
 
+class TestResponseCaching:
+    def test_etag_and_not_modified(self, live_server):
+        resp = urlopen(Request(f"{live_server}/mood/claude-code"))
+        etag = resp.headers["ETag"]
+        resp.read()
+        assert etag
+
+        try:
+            urlopen(Request(f"{live_server}/mood/claude-code", headers={"If-None-Match": etag}))
+            status = 200
+        except HTTPError as e:
+            status = e.code
+        assert status == 304
+
+    def test_stale_etag_returns_body(self, live_server):
+        status, data = _get_with_headers(f"{live_server}/mood/claude-code",
+                                         {"If-None-Match": '"stale"'})
+        assert status == 200
+        assert "activity" in data
+
+    def test_gzip_when_accepted(self, live_server):
+        resp = urlopen(Request(f"{live_server}/mood/claude-code",
+                               headers={"Accept-Encoding": "gzip"}))
+        assert resp.headers["Content-Encoding"] == "gzip"
+        data = json.loads(gzip.decompress(resp.read()))
+        assert "activity" in data
+
+    def test_identity_without_accept_encoding(self, live_server):
+        resp = urlopen(Request(f"{live_server}/mood/claude-code"))
+        assert resp.headers["Content-Encoding"] is None
+        json.loads(resp.read())
+
+
+class TestDeltaEndpoint:
+    def test_without_base_returns_full_frame(self, live_server):
+        status, data = _get(f"{live_server}/mood/claude-code/delta")
+        assert status == 200
+        assert data["bitmap"] is None
+        if data["frame"]:
+            assert len(data["spans"]) == 1
+            assert data["spans"][0][:2] == [0, 200]
+
+    def test_current_frame_returns_no_spans(self, live_server):
+        _, full = _get(f"{live_server}/mood/claude-code")
+        if not full.get("frame"):
+            pytest.skip("no sprite assets available")
+        status, data = _get(f"{live_server}/mood/claude-code/delta?have={full['frame']}")
+        assert status == 200
+        assert data["frame"] == full["frame"]
+        assert data["spans"] == []
+
+    def test_unknown_agent_returns_404(self, live_server):
+        status, _ = _get(f"{live_server}/mood/nonexistent/delta")
+        assert status == 404
+
+
 class TestAgentsListEndpoint:
     def test_returns_all_agents(self, live_server):
         status, data = _get(f"{live_server}/mood")
@@ -84,12 +167,75 @@ class TestAgentsListEndpoint:
         assert "claude-code" in data["agents"]
 
 
+class TestHistoryEndpoint:
+    def test_returns_polled_mood(self, live_server):
+        status, data = _get(f"{live_server}/history/claude-code")
+        assert status == 200
+        assert data["agent"] == "claude-code"
+        [point] = data["points"]
+        assert point["session"] == "session"
+        assert point["samples"] == 1
+
+    def test_step_buckets(self, live_server):
+        status, data = _get(f"{live_server}/history/claude-code?from=0&to={time.time() + 1}&step=1e10")
+        assert status == 200
+        assert data["points"][0]["t"] == 0
+
+    def test_bad_params(self, live_server):
+        assert _get(f"{live_server}/history/claude-code?step=0")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?from=x")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?from=10&to=5")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?step=nan")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?from=-inf&step=60")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?to=inf")[0] == 400
+        assert _get(f"{live_server}/history/claude-code?from=1&to=2e9&step=1e-300")[0] == 400
+
+    def test_unknown_agent_returns_404(self, live_server):
+        assert _get(f"{live_server}/history/nonexistent")[0] == 404
+
+    def test_rollup_without_store_returns_404(self, live_server):
+        assert _get(f"{live_server}/history/claude-code/rollup")[0] == 404
+
+    def test_rollup_from_store(self, live_server, tmp_path):
+        from watcher.store import MoodStore
+
+        store = MoodStore(tmp_path / "moods.db")
+        store.start()
+        server_app._watcher.store = store
+        mood = server_app._watcher.get_mood("claude-code")
+        store.append("claude-code", "session", mood, now=1771545605)
+        store.close()
+        store.start()
+        try:
+            status, data = _get(f"{live_server}/history/claude-code/rollup"
+                                "?from=1771545600&to=1771632000")
+            assert status == 200
+            assert data["resolution"] == "minute"
+            assert [p["samples"] for p in data["points"]] == [1]
+            status, data = _get(f"{live_server}/history/claude-code/rollup"
+                                "?from=1771545600&to=1771632000&resolution=raw")
+            assert data["points"][0]["session"] == "session"
+            assert _get(f"{live_server}/history/claude-code/rollup?resolution=week")[0] == 400
+            assert _get(f"{live_server}/history/claude-code/rollup?from=nan")[0] == 400
+            assert _get(f"{live_server}/history/claude-code/rollup?from=-inf")[0] == 400
+            assert _get(f"{live_server}/history/claude-code/rollup?from=-inf&resolution=raw")[0] == 400
+        finally:
+            store.close()
+
+
 class TestHealthEndpoint:
     def test_returns_ok(self, live_server):
         status, data = _get(f"{live_server}/health")
         assert status == 200
         assert data["status"] == "ok"
 
+    def test_reports_monitor_detail(self, live_server):
+        _, data = _get(f"{live_server}/health")
+        detail = data["monitors"]["claude-code"]
+        assert detail["errors"] == 0
+        assert detail["last_success_age"] >= 0
+        assert detail["overrunning"] is False
+
 
 class TestFirmwareEndpoint:
     def test_returns_version(self, live_server):
@@ -102,3 +248,344 @@ class TestNotFound:
     def test_unknown_path(self, live_server):
         status, data = _get(f"{live_server}/nonexistent")
         assert status == 404
+
+
+class TestConcurrency:
+    def test_stalled_client_does_not_block_others(self, tmp_path):
+        server = _start_server(tmp_path, workers=4, connection_timeout=5)
+        port = server.server_address[1]
+        try:
+            stalled = socket.create_connection(("127.0.0.1", port))
+            stalled.sendall(b"GET /health HTTP/1.1\r\n")  # never finishes headers
+            start = time.monotonic()
+            status, data = _get(f"http://127.0.0.1:{port}/health")
+            assert status == 200
+            assert time.monotonic() - start < 1.0
+            stalled.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_stalled_connection_times_out(self, tmp_path):
+        server = _start_server(tmp_path, workers=2, connection_timeout=0.2)
+        port = server.server_address[1]
+        try:
+            stalled = socket.create_connection(("127.0.0.1", port))
+            stalled.settimeout(2)
+            assert stalled.recv(1) == b""  # server closed the idle connection
+            stalled.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_keep_alive_reuses_connection(self, live_server):
+        host, port = live_server.rsplit("/", 1)[-1].split(":")
+        conn = http.client.HTTPConnection(host, int(port), timeout=5)
+        for _ in range(3):
+            conn.request("GET", "/mood/claude-code")
+            resp = conn.getresponse()
+            assert resp.status == 200
+            assert resp.version == 11
+            json.loads(resp.read())
+        conn.close()
+
+    def test_single_threaded_mode(self, tmp_path):
+        server = _start_server(tmp_path, workers=0)
+        port = server.server_address[1]
+        try:
+            status, _ = _get(f"http://127.0.0.1:{port}/health")
+            assert status == 200
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_single_threaded_mode_closes_connections(self, tmp_path):
+        server = _start_server(tmp_path, workers=0)
+        port = server.server_address[1]
+        try:
+            idle = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            idle.request("GET", "/health")
+            resp = idle.getresponse()
+            resp.read()
+            assert resp.getheader("Connection") == "close"
+            # The idle client no longer holds the only thread.
+            status, _ = _get(f"http://127.0.0.1:{port}/health")
+            assert status == 200
+            idle.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_hundred_devices(self, live_server):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def device():
+            for _ in range(3):
+                start = time.perf_counter()
+                try:
+                    status, _ = _get(f"{live_server}/mood/claude-code?poll=30")
+                except OSError as e:
+                    errors.append(e)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                assert status == 200
+
+        threads = [threading.Thread(target=device) for _ in range(100)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert len(latencies) == 300
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        assert p99 < 2.0
+
+
+def _etag(url: str) -> str:
+    resp = urlopen(Request(url))
+    resp.read()
+    return resp.headers["ETag"]
+
+
+def _touch_session(tmp_path, text):
+    time.sleep(0.05)
+    path = tmp_path / "proj" / "session.jsonl"
+    entry = json.dumps({
+        "type": "assistant",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": [{"type": "text", "text": text}]},
+    })
+    with open(path, "a") as f:
+        f.write(entry + "\n")
+
+
+class TestLongPoll:
+    @pytest.fixture
+    def served(self, tmp_path):
+        server = _start_server(tmp_path, workers=4)
+        yield f"http://127.0.0.1:{server.server_address[1]}", server_app._watcher, tmp_path
+        server.shutdown()
+        server.server_close()
+
+    def test_different_since_returns_immediately(self, served):
+        url, _, _ = served
+        start = time.monotonic()
+        status, data = _get(f"{url}/mood/claude-code?wait=5&since=%22old%22")
+        assert status == 200
+        assert "activity" in data
+        assert time.monotonic() - start < 1.0
+
+    def test_times_out_with_not_modified(self, served):
+        url, _, _ = served
+        etag = _etag(f"{url}/mood/claude-code")
+        start = time.monotonic()
+        try:
+            urlopen(Request(f"{url}/mood/claude-code?wait=0.3&since={etag}"))
+            status = 200
+        except HTTPError as e:
+            status = e.code
+        assert status == 304
+        assert 0.25 < time.monotonic() - start < 2.0
+
+    def test_returns_on_mood_change(self, served):
+        url, watcher, tmp_path = served
+        etag = _etag(f"{url}/mood/claude-code")
+        result = {}
+
+        def wait():
+            resp = urlopen(Request(f"{url}/mood/claude-code?wait=10&since={etag}"))
+            result["etag"] = resp.headers["ETag"]
+            result["data"] = json.loads(resp.read())
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        time.sleep(0.2)
+        assert thread.is_alive()
+
+        _touch_session(tmp_path, "This is terrible, everything failed and nothing works")
+        watcher.poll_all()
+        thread.join(timeout=3)
+        assert not thread.is_alive()
+        assert result["etag"] != etag
+
+    def test_waiters_do_not_hold_workers(self, served):
+        url, watcher, tmp_path = served
+        etag = _etag(f"{url}/mood/claude-code")
+        statuses = []
+
+        def wait():
+            resp = urlopen(Request(f"{url}/mood/claude-code?wait=10&since={etag}"))
+            resp.read()
+            statuses.append(resp.status)
+
+        threads = [threading.Thread(target=wait) for _ in range(50)]
+        for t in threads:
+            t.start()
+        time.sleep(0.5)
+
+        # Only 4 workers, yet the server still answers ordinary requests
+        status, _ = _get(f"{url}/health")
+        assert status == 200
+
+        _touch_session(tmp_path, "This is terrible, everything failed and nothing works")
+        watcher.poll_all()
+        for t in threads:
+            t.join(timeout=5)
+        assert statuses == [200] * 50
+
+    def test_replaced_hub_answers_waiters(self, served):
+        url, watcher, _ = served
+        etag = _etag(f"{url}/mood/claude-code")
+        statuses = []
+
+        def wait():
+            try:
+                urlopen(Request(f"{url}/mood/claude-code?wait=30&since={etag}"))
+                statuses.append(200)
+            except HTTPError as e:
+                statuses.append(e.code)
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        old_hub = server_app._longpoll
+        assert _wait_for(lambda: old_hub.waiting == 1)
+
+        set_watcher(watcher)
+        thread.join(timeout=3)
+        assert not thread.is_alive()
+        assert statuses == [304]
+
+        # A handler still holding the old hub is answered rather than parked.
+        a, b = socket.socketpair()
+        b.settimeout(3)
+        old_hub.park("claude-code", a, etag, 30, watcher.get_snapshot("claude-code"))
+        assert b.recv(64).startswith(b"HTTP/1.1 304")
+        assert old_hub.waiting == 0
+        b.close()
+
+    def test_invalid_wait(self, served):
+        url, _, _ = served
+        status, data = _get(f"{url}/mood/claude-code?wait=soon")
+        assert status == 400
+
+
+class TestStreamEndpoint:
+    def test_streams_current_state(self, live_server):
+        host, port = live_server.rsplit("/", 1)[-1].split(":")
+        sock = socket.create_connection((host, int(port)), timeout=3)
+        sock.sendall(b"GET /mood/stream?agent=claude-code HTTP/1.1\r\nHost: x\r\n\r\n")
+        data = b""
+        while b"\n\n" not in data.split(b"\r\n\r\n", 1)[-1]:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        assert b"text/event-stream" in data
+        assert b'"agent": "claude-code"' in data
+        assert b"bitmap" not in data
+
+    def test_unknown_agent(self, live_server):
+        status, _ = _get(f"{live_server}/mood/stream?agent=nope")
+        assert status == 404
+
+
+class TestPollLogging:
+    def test_polls_are_logged(self, tmp_path):
+        from server.polllog import PollLogger, read_poll_log
+
+        log_path = tmp_path / "battery.log"
+        logger = PollLogger(log_path)
+        logger.start()
+        server_app.set_poll_logger(logger)
+        server = _start_server(tmp_path)
+        try:
+            port = server.server_address[1]
+            _get(f"http://127.0.0.1:{port}/mood/claude-code?poll=30&vbat=4.05&fw=0.2.0")
+        finally:
+            server.shutdown()
+            server.server_close()
+            server_app.set_poll_logger(None)
+            logger.close()
+
+        [record] = list(read_poll_log(log_path))
+        assert record.vbat == "4.05"
+        assert record.fw == "0.2.0"
+        assert record.device == "127.0.0.1"
+        assert record.agent == "claude-code"
+
+
+class TestMetricsEndpoint:
+    def test_exposes_prometheus_text(self, live_server):
+        from server.app import HTTP_SECONDS
+
+        _get(f"{live_server}/mood/claude-code?poll=30&vbat=4.05&fw=0.2.0")
+        assert _wait_for(lambda: HTTP_SECONDS.count("mood", "claude-code") >= 1)
+        resp = urlopen(f"{live_server}/metrics")
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        text = resp.read().decode()
+
+        assert "# TYPE moodbot_http_request_seconds histogram" in text
+        assert 'moodbot_http_request_seconds_count{route="mood",agent="claude-code"}' in text
+        assert 'moodbot_http_responses_total{route="mood",code="200"}' in text
+        assert 'moodbot_parse_session_seconds_count{agent="claude-code"}' in text
+        assert 'moodbot_device_battery_volts{device="127.0.0.1"} 4.05' in text
+        assert 'moodbot_device_poll_interval_seconds{device="127.0.0.1"} 30' in text
+        assert "moodbot_sprite_cache_hits_total" in text
+
+    def test_counts_not_modified(self, live_server):
+        from server.app import HTTP_RESPONSES
+
+        before = HTTP_RESPONSES.value("mood", "304")
+        etag = _etag(f"{live_server}/mood/claude-code")
+        with pytest.raises(HTTPError) as exc:
+            urlopen(Request(f"{live_server}/mood/claude-code", headers={"If-None-Match": etag}))
+        assert exc.value.code == 304
+        # Metrics are recorded after the response is flushed to the client.
+        assert _wait_for(lambda: HTTP_RESPONSES.value("mood", "304") == before + 1)
+
+    def test_unknown_agent_label_collapsed(self, live_server):
+        from server.app import HTTP_SECONDS
+
+        _get(f"{live_server}/mood/no-such-agent")
+        assert _wait_for(lambda: HTTP_SECONDS.count("mood", "unknown") >= 1)
+        assert HTTP_SECONDS.count("mood", "no-such-agent") == 0
+
+
+class TestProfileEndpoint:
+    def test_disabled_by_default(self, live_server):
+        status, data = _get(f"{live_server}/debug/profile?seconds=0.1")
+        assert status == 404
+
+    def test_returns_collapsed_stacks(self, live_server):
+        from server.profiler import SamplingProfiler
+
+        server_app.set_profiler(SamplingProfiler(hz=200))
+        try:
+            resp = urlopen(f"{live_server}/debug/profile?seconds=0.2")
+            text = resp.read().decode()
+        finally:
+            server_app.set_profiler(None)
+        assert resp.headers["Content-Type"].startswith("text/plain")
+        assert text
+        for line in text.splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert ";" in stack
+            assert int(count) > 0
+
+    def test_rejects_bad_seconds(self, live_server):
+        from server.profiler import SamplingProfiler
+
+        server_app.set_profiler(SamplingProfiler())
+        try:
+            assert _get(f"{live_server}/debug/profile?seconds=abc")[0] == 400
+            assert _get(f"{live_server}/debug/profile?seconds=-1")[0] == 400
+            assert _get(f"{live_server}/debug/profile?seconds=nan")[0] == 400
+            assert _get(f"{live_server}/debug/profile?seconds=inf")[0] == 400
+            assert _get(f"{live_server}/debug/profile?seconds=0.1&hz=nan")[0] == 400
+        finally:
+            server_app.set_profiler(None)
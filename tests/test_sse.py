@@ -0,0 +1,149 @@
+import socket
+import threading
+
+import pytest
+
+from core.state import MoodState
+from server.sse import HEARTBEAT, SseHub, _Subscriber, encode_event
+from watcher.monitor import MoodSnapshot
+
+
+def _snapshot(emotion="neutral"):
+    return MoodSnapshot.build(MoodState("thinking", emotion, 0, "t", False, bitmap="AAAA"))
+
+
+def _pair():
+    server_side, client_side = socket.socketpair()
+    client_side.settimeout(2)
+    return server_side, client_side
+
+
+def _read_until(sock, marker, count=1):
+    data = b""
+    while data.count(marker) < count:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class TestEncodeEvent:
+    def test_frame_has_id_and_no_bitmap(self):
+        payload = encode_event(7, "claude-code", _snapshot()).decode()
+        assert payload.startswith("id: 7\nevent: mood\ndata: ")
+        assert payload.endswith("\n\n")
+        assert "bitmap" not in payload
+        assert '"agent": "claude-code"' in payload
+
+
+class TestSseHub:
+    def test_new_subscriber_gets_latest_state(self):
+        hub = SseHub()
+        hub.notify("claude-code", _snapshot("neutral"))
+        hub.notify("claude-code", _snapshot("positive"))
+        server_side, client = _pair()
+
+        hub.subscribe(server_side)
+        data = _read_until(client, b"\n\n")
+        assert b"text/event-stream" in data
+        assert b"id: 2\n" in data
+        assert b"id: 1\n" not in data
+        hub.stop()
+
+    def test_change_fans_out_to_subscribers(self):
+        hub = SseHub()
+        pairs = [_pair() for _ in range(3)]
+        for server_side, _ in pairs:
+            hub.subscribe(server_side)
+        for _, client in pairs:
+            _read_until(client, b"\r\n\r\n")
+
+        hub.notify("claude-code", _snapshot("positive"))
+        for _, client in pairs:
+            assert b'"emotion": "positive"' in _read_until(client, b"\n\n")
+        hub.stop()
+
+    def test_event_serialised_once_for_all_subscribers(self, monkeypatch):
+        import server.sse as sse
+        calls = []
+        real = sse.encode_event
+        monkeypatch.setattr(sse, "encode_event", lambda *a: calls.append(a) or real(*a))
+        hub = SseHub()
+        for _ in range(5):
+            hub.subscribe(_pair()[0])
+        hub.notify("claude-code", _snapshot())
+        assert len(calls) == 1
+        hub.stop()
+
+    def test_agent_filter(self):
+        hub = SseHub()
+        server_side, client = _pair()
+        hub.subscribe(server_side, agent="opencode")
+        _read_until(client, b"\r\n\r\n")
+
+        hub.notify("claude-code", _snapshot("positive"))
+        hub.notify("opencode", _snapshot("uneasy"))
+        data = _read_until(client, b"\n\n")
+        assert b'"agent": "opencode"' in data
+        assert b'"agent": "claude-code"' not in data
+        hub.stop()
+
+    def test_resume_from_last_event_id(self):
+        hub = SseHub()
+        for emotion in ("neutral", "positive", "uneasy"):
+            hub.notify("claude-code", _snapshot(emotion))
+        server_side, client = _pair()
+
+        hub.subscribe(server_side, last_event_id="1")
+        data = _read_until(client, b"\n\n", count=2)
+        assert b"id: 2\n" in data and b"id: 3\n" in data
+        assert b"id: 1\n" not in data
+        hub.stop()
+
+    def test_resume_older_than_log_gets_latest(self):
+        hub = SseHub(log_size=2)
+        for emotion in ("neutral", "positive", "uneasy", "elated"):
+            hub.notify("claude-code", _snapshot(emotion))
+        server_side, client = _pair()
+
+        hub.subscribe(server_side, last_event_id="1")
+        data = _read_until(client, b"\n\n")
+        assert b"id: 4\n" in data
+        hub.stop()
+
+    def test_resume_from_previous_process_gets_latest(self):
+        hub = SseHub()
+        for emotion in ("neutral", "positive"):
+            hub.notify("claude-code", _snapshot(emotion))
+        server_side, client = _pair()
+
+        hub.subscribe(server_side, last_event_id="57")
+        data = _read_until(client, b"\n\n")
+        assert b"id: 2\n" in data
+        hub.stop()
+
+    def test_resume_when_up_to_date_sends_nothing(self):
+        hub = SseHub()
+        hub.notify("claude-code", _snapshot())
+        assert hub._backlog(_Subscriber(None, None), "1") == []
+
+    def test_heartbeat(self):
+        hub = SseHub(heartbeat=0.05)
+        server_side, client = _pair()
+        hub.subscribe(server_side)
+        assert HEARTBEAT in _read_until(client, HEARTBEAT)
+        hub.stop()
+
+    def test_disconnected_subscriber_dropped(self):
+        hub = SseHub(heartbeat=0.05)
+        server_side, client = _pair()
+        hub.subscribe(server_side)
+        client.close()
+        deadline = threading.Event()
+        for _ in range(40):
+            if hub.subscribers == 0:
+                break
+            deadline.wait(0.05)
+        assert hub.subscribers == 0
+        hub.stop()
@@ -277,3 +277,88 @@ class TestMoodEngine:
         mood2 = engine.compute(sad_session)
 
         assert mood1.emotion != mood2.emotion
+
+
+class TestKeepText:
+    def test_drops_text_once_scored(self):
+        engine = MoodEngine(keep_text=False)
+        session = _make_session(messages=[
+            ParsedMessage(timestamp=datetime.now(timezone.utc),
+                          text="This is absolutely wonderful, everything passes!",
+                          activity=Activity.CONVERSING),
+        ])
+        first = engine.compute(session)
+        assert session.messages[0].text == ""
+        second = engine.compute(session)
+        assert second.sentiment_score == first.sentiment_score
+        assert second.emotion == first.emotion
+
+    def test_keeps_text_by_default(self):
+        session = _make_session()
+        MoodEngine().compute(session)
+        assert session.messages[0].text
+
+
+class TestSleepAt:
+    def test_timeout_after_last_message(self):
+        engine = MoodEngine(sleep_timeout=1800)
+        session = _make_session(minutes_ago=10)
+        expected = session.last_activity_time.timestamp() + 1800
+        assert engine.sleep_at(session) == pytest.approx(expected)
+
+    def test_later_of_mtime_and_last_message(self):
+        engine = MoodEngine(sleep_timeout=1800)
+        mtime = datetime.now(timezone.utc).timestamp()
+        session = _make_session(minutes_ago=60, last_modified=mtime)
+        assert engine.sleep_at(session) == pytest.approx(mtime + 1800)
+
+    def test_mtime_only(self):
+        engine = MoodEngine(sleep_timeout=60)
+        session = ParsedSession(file_path=Path("/tmp/x.jsonl"), messages=[], last_modified=1000.0)
+        assert engine.sleep_at(session) == 1060.0
+
+    def test_empty_session_already_asleep(self):
+        session = ParsedSession(file_path=Path("/tmp/x.jsonl"), messages=[])
+        assert MoodEngine().sleep_at(session) == float("-inf")
+
+    def test_never_with_infinite_timeout(self):
+        engine = MoodEngine(sleep_timeout=float("inf"))
+        assert engine.sleep_at(_make_session(minutes_ago=600)) == float("inf")
+
+    def test_naive_timestamp_treated_as_utc(self):
+        engine = MoodEngine(sleep_timeout=0)
+        naive = datetime(2026, 3, 1, 12, 0)
+        session = _make_session(messages=[
+            ParsedMessage(timestamp=naive, text="hi", activity=Activity.CONVERSING)
+        ])
+        assert engine.sleep_at(session) == datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+class TestWindow:
+    @pytest.mark.parametrize("seed", range(20))
+    def test_same_mood_as_last_hundred_messages(self, seed):
+        import random
+
+        from parsers.base import take_recent
+
+        rng = random.Random(seed)
+        start = datetime.now(timezone.utc) - timedelta(minutes=5)
+        texts = ["This is great, the tests pass now!", "Terrible, everything failed again",
+                 "Please fix the broken login flow for me", "OK, looking into the parser code now"]
+        messages = []
+        for i in range(rng.randrange(20, 300)):
+            # User turns and errors interleave, so dropping turns would fake error runs.
+            role = rng.choice(["assistant", "assistant", "user", "tool_result", "tool_result"])
+            messages.append(ParsedMessage(
+                timestamp=start + timedelta(seconds=i), text=rng.choice(texts),
+                activity=rng.choice(list(Activity)), role=role,
+                is_error=role == "tool_result" and rng.random() < 0.7))
+
+        def mood(window):
+            return MoodEngine().compute(_make_session(messages=window))
+
+        engine = MoodEngine()
+        old = mood(messages[-100:])
+        new = mood(take_recent(reversed(messages), engine.window))
+        assert (new.activity, new.emotion, new.sentiment_score) == (
+            old.activity, old.emotion, old.sentiment_score)
@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from core.state import MoodState
+from parsers.claude_code import ClaudeCodeParser
+from watcher.monitor import AgentMonitor, WatcherLoop
+from watcher.store import MoodStore, pick_resolution
+
+DAY = 86400
+T0 = 1771545600  # 2026-02-20T00:00:00Z
+
+
+def _mood(activity="editing", emotion="positive", sleeping=False, score=0.2):
+    return MoodState(activity=activity, emotion=emotion, variant=0,
+                     timestamp="2026-02-20T14:30:00+00:00", sleeping=sleeping,
+                     sentiment_score=score)
+
+
+def _write_jsonl(tmp_path):
+    project_dir = tmp_path / "proj"
+    project_dir.mkdir(parents=True, exist_ok=True)
+    entry = json.dumps({
+        "type": "assistant",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": [{"type": "text", "text": "All good here"}]},
+    })
+    (project_dir / "s.jsonl").write_text(entry + "\n")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MoodStore(tmp_path / "moods.db", flush_interval=0.01, rollup_interval=60)
+    store.start()
+    yield store
+    store.close()
+
+
+def _reopen(store):
+    store.close()
+    reopened = MoodStore(store.path)
+    reopened.start()
+    return reopened
+
+
+class TestMoodStore:
+    def test_raw_samples_persist(self, store):
+        store.append("a", "s1", _mood(), now=T0 + 5)
+        store.append("a", "s1", _mood(emotion="elated", score=0.9), now=T0 + 65)
+        store.append("b", "s2", _mood(), now=T0 + 10)
+        store = _reopen(store)
+        points = store.samples("a", T0, T0 + 60)
+        assert points == [{"t": T0 + 5, "session": "s1", "activity": "editing",
+                           "emotion": "positive", "score": 0.2, "sleeping": False}]
+        store.close()
+
+    def test_rollups_at_each_resolution(self, store):
+        store.append("a", "s1", _mood(score=0.2), now=T0 + 5)
+        store.append("a", "s1", _mood(emotion="negative", score=-0.4), now=T0 + 30)
+        store.append("a", "s1", _mood(activity="reading", sleeping=True, score=0.0), now=T0 + 90)
+        store.append("a", "s1", _mood(score=0.5), now=T0 + DAY + 1)
+        store = _reopen(store)
+
+        minutes = store.rollups("a", T0, T0 + 3600, "minute")
+        assert [(p["t"], p["samples"], p["score"]) for p in minutes] == [
+            (T0, 2, -0.1), (T0 + 60, 1, 0.0)]
+        assert minutes[0]["emotions"] == {"negative": 1, "uneasy": 0, "neutral": 0,
+                                          "positive": 1, "elated": 0}
+        assert minutes[1]["activities"]["reading"] == 1
+        assert minutes[1]["sleeping"] == 1
+
+        [hour] = store.rollups("a", T0, T0 + 3600, "hour")
+        assert (hour["t"], hour["samples"]) == (T0, 3)
+        assert hour["activities"]["editing"] == 2
+
+        days = store.rollups("a", T0, T0 + 2 * DAY, "day")
+        assert [(p["t"], p["samples"]) for p in days] == [(T0, 3), (T0 + DAY, 1)]
+        store.close()
+
+    def test_range_includes_bucket_holding_start(self, store):
+        store.append("a", "s1", _mood(), now=T0 + 5)
+        store = _reopen(store)
+        assert len(store.rollups("a", T0 + 30, T0 + 60, "minute")) == 1
+        store.close()
+
+    def test_open_bucket_refreshed_by_next_pass(self, tmp_path):
+        path = tmp_path / "moods.db"
+        now = time.time()
+        store = MoodStore(path)
+        store.start()
+        store.append("a", "s1", _mood(), now=now)
+        store.close()
+        store = MoodStore(path)
+        store.start()
+        store.append("a", "s1", _mood(), now=now + 0.001)
+        store.close()
+        conn = sqlite3.connect(str(path))
+        assert conn.execute(
+            "SELECT samples FROM rollups WHERE resolution = 86400").fetchone() == (2,)
+        conn.close()
+
+    @pytest.mark.parametrize("start", [float("nan"), float("-inf")])
+    def test_rollups_reject_non_finite_start(self, store, start):
+        with pytest.raises(ValueError):
+            store.rollups("a", start, T0, "minute")
+
+    def test_sample_written_after_a_pass_is_rolled_up(self, store):
+        store.append("a", "s1", _mood(score=0.2), now=T0 + 5)
+        store = _reopen(store)  # the closing pass moves the watermarks to today
+        # Still queued during that pass, so older than every watermark.
+        store.append("a", "s1", _mood(score=0.4), now=T0 + 30)
+        store = _reopen(store)
+        assert [(p["samples"], p["score"]) for p in store.rollups("a", T0, T0 + 60, "minute")] == [
+            (2, 0.3)]
+        [day] = store.rollups("a", T0, T0 + DAY, "day")
+        assert day["samples"] == 2
+        store.close()
+
+    def test_full_queue_drops(self, tmp_path):
+        store = MoodStore(tmp_path / "moods.db", queue_size=1)
+        store.append("a", "s1", _mood())
+        store.append("a", "s1", _mood())
+        assert store.dropped == 1
+
+    def test_closed_store_reads_nothing(self, tmp_path):
+        assert MoodStore(tmp_path / "moods.db").samples("a", 0, T0) == []
+
+
+class TestPickResolution:
+    @pytest.mark.parametrize("span, expected", [
+        (3600, "minute"), (7 * DAY, "hour"), (90 * DAY, "day"),
+    ])
+    def test_by_span(self, span, expected):
+        assert pick_resolution(span) == expected
+
+
+class TestWatcherFeedsStore:
+    def test_polled_moods_are_stored(self, tmp_path):
+        _write_jsonl(tmp_path)
+        store = MoodStore(tmp_path / "moods.db", flush_interval=0.01)
+        store.start()
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))],
+                              store=store)
+        watcher.poll_all()
+        watcher.poll_all()
+        store.close()
+
+        store = MoodStore(tmp_path / "moods.db")
+        store.start()
+        [sample] = store.samples("claude-code", 0, time.time() + 1)
+        assert sample["session"] == "s"
+        store.close()
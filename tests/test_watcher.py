@@ -1,13 +1,17 @@
+import gzip
 import json
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 import pytest
 
-from core.state import MoodState
+from core.state import MoodEngine, MoodState
 from parsers.claude_code import ClaudeCodeParser
-from watcher.monitor import AgentMonitor, WatcherLoop
+from sprites.delta import DELTAS
+from sprites.encoder import BITMAP_SIZE, BYTES_PER_ROW, bitmap_to_base64
+from watcher.monitor import AgentMonitor, MoodSnapshot, WatcherLoop
 
 
 def _write_jsonl(tmp_path, text="This is a helpful and positive response", project="proj", name="s.jsonl"):
@@ -115,3 +119,280 @@ class TestWatcherLoop:
         time.sleep(0.2)
         assert watcher.get_mood("claude-code") is not None
         watcher.stop()
+
+    def test_fixed_interval_without_bounds(self, tmp_path):
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))],
+                              interval=10)
+        assert watcher.effective_interval("claude-code") == 10
+        assert watcher.effective_interval("nope") is None
+
+    def test_adaptive_interval_speeds_up_and_backs_off(self, tmp_path):
+        path = _write_jsonl(tmp_path)
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))],
+                              interval=1, min_interval=0.05, max_interval=0.4)
+        watcher.start()
+        try:
+            # The first poll reads a new file, so the interval drops to the floor.
+            assert watcher.effective_interval("claude-code") == 0.05
+            time.sleep(0.5)
+            assert watcher.effective_interval("claude-code") == 0.4
+
+            path.write_text(path.read_text() + path.read_text())
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and watcher.effective_interval("claude-code") != 0.05:
+                time.sleep(0.01)
+            assert watcher.intervals == {"claude-code": 0.05}
+        finally:
+            watcher.stop()
+
+    def test_each_monitor_has_its_own_schedule(self, tmp_path):
+        _write_jsonl(tmp_path)
+        busy = AgentMonitor("busy", ClaudeCodeParser(base_path=tmp_path))
+        idle = AgentMonitor("idle", ClaudeCodeParser(base_path=tmp_path / "empty"))
+        watcher = WatcherLoop([busy, idle], interval=0.1, min_interval=0.05, max_interval=5)
+        watcher.start()
+        try:
+            assert watcher.effective_interval("busy") == 0.05
+            assert watcher.effective_interval("idle") == 0.2
+        finally:
+            watcher.stop()
+
+    def test_stop_does_not_wait_for_interval(self, tmp_path):
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))],
+                              interval=30)
+        watcher.start()
+        start = time.monotonic()
+        watcher.stop()
+        assert time.monotonic() - start < 1
+
+    def test_thread_is_named_for_profiling(self, tmp_path):
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))],
+                              interval=0.1)
+        watcher.start()
+        try:
+            assert "moodbot-watcher" in {t.name for t in threading.enumerate()}
+        finally:
+            watcher.stop()
+
+
+class TestSleepTransition:
+    def test_unchanged_polls_do_not_parse(self, tmp_path, monkeypatch):
+        _write_jsonl(tmp_path)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        monitor = AgentMonitor("claude-code", parser)
+        monitor.poll()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged poll parsed the session")
+
+        monkeypatch.setattr(parser, "parse_session", fail)
+        assert monitor.poll() is False
+        assert monitor.current_mood.sleeping is False
+
+    def test_falls_asleep_on_time_without_parsing(self, tmp_path, monkeypatch):
+        _write_jsonl(tmp_path)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        monitor = AgentMonitor("claude-code", parser, engine=MoodEngine(sleep_timeout=0.3))
+        monitor.poll()
+        assert monitor.current_mood.sleeping is False
+        assert monitor.sleep_at == pytest.approx(time.time() + 0.3, abs=0.1)
+
+        monkeypatch.setattr(parser, "parse_session", lambda *a, **k: pytest.fail("parsed"))
+        time.sleep(0.35)
+        monitor.poll()
+        assert monitor.current_mood.sleeping is True
+        assert monitor.sleep_at is None
+
+    def test_watcher_wakes_at_sleep_time(self, tmp_path):
+        _write_jsonl(tmp_path)
+        monitor = AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path),
+                               engine=MoodEngine(sleep_timeout=0.3))
+        watcher = WatcherLoop([monitor], interval=30)
+        watcher.start()
+        try:
+            assert watcher.get_mood("claude-code").sleeping is False
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and not watcher.get_mood("claude-code").sleeping:
+                time.sleep(0.01)
+            assert watcher.get_mood("claude-code").sleeping is True
+        finally:
+            watcher.stop()
+
+
+class _FakeMonitor:
+    """Just enough of AgentMonitor for WatcherLoop scheduling tests."""
+
+    def __init__(self, name, delay=0.0, fail=0):
+        self.name = name
+        self.bus = None
+        self.sleep_at = None
+        self.delay = delay
+        self.fail = fail
+        self.polls = []
+
+    def poll(self):
+        self.polls.append(time.monotonic())
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("database is locked")
+        time.sleep(self.delay)
+        return False
+
+
+class TestParallelPolling:
+    def test_slow_monitor_does_not_delay_others(self):
+        slow = _FakeMonitor("opencode", delay=0.5)
+        fast = _FakeMonitor("claude-code")
+        watcher = WatcherLoop([slow, fast], interval=0.05)
+        watcher.start()
+        try:
+            # The slow monitor is mid-poll for most of this window.
+            time.sleep(0.3)
+            assert len(slow.polls) == 2
+            assert len(fast.polls) >= 4
+        finally:
+            watcher.stop()
+
+    def test_failure_is_isolated_and_retried(self, monkeypatch):
+        import watcher.monitor as monitor_module
+
+        monkeypatch.setattr(monitor_module, "RETRY_BASE_SECONDS", 0.05)
+        flaky = _FakeMonitor("opencode", fail=2)
+        healthy = _FakeMonitor("claude-code")
+        watcher = WatcherLoop([flaky, healthy], interval=0.05)
+        watcher.start()
+        try:
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline and len(flaky.polls) < 3:
+                time.sleep(0.01)
+            health = watcher.health()
+        finally:
+            watcher.stop()
+
+        assert len(flaky.polls) >= 3
+        # Retries back off: 0.05 s after the first failure, 0.1 s after the second.
+        assert flaky.polls[2] - flaky.polls[1] >= 0.09
+        assert health["opencode"]["errors"] == 2
+        assert health["opencode"]["consecutive_errors"] == 0
+        assert health["opencode"]["last_error"] == "RuntimeError: database is locked"
+        assert health["claude-code"]["errors"] == 0
+        assert len(healthy.polls) >= 3
+
+    def test_poll_all_survives_exceptions(self):
+        flaky = _FakeMonitor("opencode", fail=1)
+        healthy = _FakeMonitor("claude-code")
+        watcher = WatcherLoop([flaky, healthy])
+        watcher.poll_all()
+        assert len(healthy.polls) == 1
+        assert watcher.health()["opencode"]["consecutive_errors"] == 1
+        assert watcher.health()["claude-code"]["last_success_age"] is not None
+
+    def test_overrun_detected(self):
+        slow = _FakeMonitor("opencode", delay=0.3)
+        watcher = WatcherLoop([slow], poll_deadline=0.1)
+        thread = threading.Thread(target=watcher.poll_all)
+        thread.start()
+        time.sleep(0.2)
+        assert watcher.health()["opencode"]["overrunning"] is True
+        thread.join()
+        time.sleep(0.2)
+        health = watcher.health()["opencode"]
+        assert health["overrunning"] is False
+        assert health["overruns"] == 1
+
+
+class TestMoodSnapshot:
+    def test_body_matches_mood(self):
+        mood = MoodState(activity="thinking", emotion="neutral", variant=0,
+                         timestamp="2026-02-20T14:30:00Z", sleeping=False)
+        snapshot = MoodSnapshot.build(mood)
+        assert json.loads(snapshot.body) == mood.to_dict()
+        assert gzip.decompress(snapshot.gzip_body) == snapshot.body
+
+    def test_etag_depends_on_content(self):
+        a = MoodSnapshot.build(MoodState("thinking", "neutral", 0, "t", False))
+        b = MoodSnapshot.build(MoodState("thinking", "neutral", 0, "t", False))
+        c = MoodSnapshot.build(MoodState("thinking", "positive", 0, "t", False))
+        assert a.etag == b.etag
+        assert a.etag != c.etag
+
+    def test_frame_registered_for_deltas(self):
+        old = bytearray(BITMAP_SIZE)
+        new = bytearray(BITMAP_SIZE)
+        new[3 * BYTES_PER_ROW] = 0xFF
+        DELTAS.clear()
+        shown = MoodSnapshot.build(MoodState("thinking", "neutral", 0, "t", False,
+                                             bitmap=bitmap_to_base64(bytes(old))))
+        have = json.loads(shown.body)["frame"]
+
+        # A device that got the frame from any snapshot gets only changed rows.
+        assert DELTAS.frame(have) == bytes(old)
+        _, spans = DELTAS.delta(have, bitmap_to_base64(bytes(new)))
+        assert [span[:2] for span in spans] == [(3, 1)]
+
+    def test_monitor_publishes_snapshot(self, tmp_path):
+        _write_jsonl(tmp_path)
+        monitor = AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))
+        assert monitor.snapshot is None
+
+        monitor.poll()
+        assert monitor.snapshot is not None
+        assert monitor.snapshot.mood is monitor.current_mood
+
+    def test_snapshot_kept_when_unchanged(self, tmp_path):
+        _write_jsonl(tmp_path)
+        monitor = AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))
+        monitor.poll()
+        first = monitor.snapshot
+        monitor.poll()
+        assert monitor.snapshot is first
+
+    def test_refresh_sprite_republishes_new_bitmap(self, tmp_path):
+        class _Sprites:
+            bitmap = "b2xk"
+
+            def lookup(self, activity, emotion, variant, sleeping=False):
+                return self.bitmap
+
+        _write_jsonl(tmp_path)
+        sprites = _Sprites()
+        monitor = AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path),
+                               engine=MoodEngine(sprites=sprites))
+        watcher = WatcherLoop([monitor])
+        monitor.poll()
+        first = monitor.snapshot
+        assert first.mood.bitmap == "b2xk"
+        assert watcher.refresh_sprites() == []
+
+        sprites.bitmap = "bmV3"
+        assert watcher.refresh_sprites() == ["claude-code"]
+        assert monitor.current_mood.bitmap == "bmV3"
+        assert monitor.current_mood.emotion == first.mood.emotion
+        assert monitor.snapshot.etag != first.etag
+
+
+class TestAgentsBody:
+    def test_lists_all_agents(self, tmp_path):
+        _write_jsonl(tmp_path)
+        parser = ClaudeCodeParser(base_path=tmp_path)
+        watcher = WatcherLoop([
+            AgentMonitor("claude-code", parser),
+            AgentMonitor("idle", ClaudeCodeParser(base_path=tmp_path / "none")),
+        ])
+        watcher.poll_all()
+
+        data = json.loads(watcher.agents_body())
+        assert data["agents"]["idle"] is None
+        assert data["agents"]["claude-code"]["activity"] == "conversing"
+
+    def test_body_reused_until_snapshot_changes(self, tmp_path):
+        _write_jsonl(tmp_path)
+        watcher = WatcherLoop([AgentMonitor("claude-code", ClaudeCodeParser(base_path=tmp_path))])
+        watcher.poll_all()
+        first = watcher.agents_body()
+        assert watcher.agents_body() is first
+
+        time.sleep(0.05)
+        _write_jsonl(tmp_path, text="This is terrible, everything failed and is broken")
+        watcher.poll_all()
+        assert watcher.agents_body() is not first
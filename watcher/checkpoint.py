@@ -0,0 +1,60 @@
+import gzip
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from parsers.base import Activity, ParsedMessage
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+
+def message_to_row(msg: ParsedMessage) -> list:
+    return [msg.epoch_ms, msg.text, msg.activity.value, msg.tool_name, msg.role,
+            msg.is_error, msg.entry_id, msg.sentiment]
+
+
+def message_from_row(row: list, keep_sentiment: bool = True) -> ParsedMessage:
+    epoch_ms, text, activity, tool_name, role, is_error, entry_id, sentiment = row
+    msg = ParsedMessage(timestamp=epoch_ms, text=text, activity=Activity(activity),
+                        tool_name=tool_name, role=role, is_error=is_error, entry_id=entry_id)
+    if keep_sentiment and sentiment is not None:
+        msg.sentiment = tuple(sentiment)
+    return msg
+
+
+def file_identity(path: Path) -> Optional[tuple[int, int, float]]:
+    """``(inode, size, mtime)`` of ``path``, or None if it can't be stat'd."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime
+
+
+def save_checkpoint(path: Path, data: dict) -> None:
+    """Write ``data`` as gzipped JSON, replacing ``path`` atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = gzip.compress(json.dumps({"version": CHECKPOINT_VERSION, **data},
+                                    separators=(",", ":")).encode("utf-8"), mtime=0)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path) -> Optional[dict]:
+    """The saved checkpoint, or None if it is missing, unreadable or from another version."""
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(gzip.decompress(f.read()))
+    except (OSError, EOFError, ValueError, zlib.error):
+        return None
+    if not isinstance(data, dict) or data.get("version") != CHECKPOINT_VERSION:
+        return None
+    return data
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from .monitor import MoodSnapshot
+
+DEFAULT_QUEUE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class MoodChanged:
+    agent: str
+    snapshot: "MoodSnapshot"
+    timestamp: float = field(default_factory=time.time)
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    COALESCE = "coalesce"
+
+
+class Subscription:
+    """A bounded queue of events delivered to ``handler`` on its own thread.
+
+    ``publish`` only ever appends under a short lock, so a slow or stuck
+    handler costs its own queue, never the watcher. When the queue is full:
+
+    - DROP_OLDEST discards the oldest queued event
+    - DROP_NEWEST discards the incoming event
+    - COALESCE keeps only the newest event per agent (a full queue of
+      distinct agents falls back to dropping the oldest)
+    """
+
+    def __init__(self, handler: Callable[[MoodChanged], None],
+                 maxsize: int = DEFAULT_QUEUE_SIZE,
+                 policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 name: str = "subscriber"):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue: deque[MoodChanged] = deque()
+        self._latest: OrderedDict[str, MoodChanged] = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._latest) if self.policy is OverflowPolicy.COALESCE else len(self._queue)
+
+    def offer(self, event: MoodChanged) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            if self.policy is OverflowPolicy.COALESCE:
+                if event.agent in self._latest:
+                    self.dropped += 1
+                elif len(self._latest) >= self.maxsize:
+                    self._latest.popitem(last=False)
+                    self.dropped += 1
+                self._latest[event.agent] = event
+            elif len(self._queue) >= self.maxsize:
+                self.dropped += 1
+                if self.policy is OverflowPolicy.DROP_NEWEST:
+                    return
+                self._queue.popleft()
+                self._queue.append(event)
+            else:
+                self._queue.append(event)
+            self._cond.notify()
+
+    def close(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _next(self) -> Optional[MoodChanged]:
+        with self._cond:
+            while not self._closed and not self._queue and not self._latest:
+                self._cond.wait()
+            if self._closed:
+                return None
+            if self._latest:
+                return self._latest.popitem(last=False)[1]
+            return self._queue.popleft()
+
+    def _run(self) -> None:
+        while True:
+            event = self._next()
+            if event is None:
+                return
+            try:
+                self.handler(event)
+                self.delivered += 1
+            except Exception:
+                self.errors += 1
+
+
+class MoodBus:
+    """In-process pub/sub for mood changes.
+
+    The watcher publishes one ``MoodChanged`` per new snapshot; response
+    caches, long-poll waiters, SSE, metrics and history subscribe.
+    """
+
+    def __init__(self):
+        self._subscriptions: list[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler: Callable[[MoodChanged], None],
+                  maxsize: int = DEFAULT_QUEUE_SIZE,
+                  policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                  name: str = "subscriber") -> Subscription:
+        subscription = Subscription(handler, maxsize=maxsize, policy=policy, name=name)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+        subscription.close()
+
+    @property
+    def subscriptions(self) -> list[Subscription]:
+        return list(self._subscriptions)
+
+    def publish(self, event: MoodChanged) -> None:
+        for subscription in self._subscriptions:
+            subscription.offer(event)
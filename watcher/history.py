@@ -0,0 +1,202 @@
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+from core.sentiment import EmotionBand
+from core.state import MoodState
+from parsers.base import Activity
+
+DEFAULT_CAPACITY = 4096
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_SAMPLE_INTERVAL = 60.0
+
+ACTIVITIES = tuple(a.value for a in Activity)
+EMOTIONS = tuple(b.value for b in EmotionBand)
+ACTIVITY_CODES = {name: i for i, name in enumerate(ACTIVITIES)}
+EMOTION_CODES = {name: i for i, name in enumerate(EMOTIONS)}
+
+# One float64 time, one float32 score and one byte packing activity (bits
+# 0-2), emotion (bits 3-5) and sleeping (bit 6).
+BYTES_PER_SAMPLE = 8 + 4 + 1
+
+# (unix time, score, packed state)
+Sample = tuple[float, float, int]
+
+
+def pack_state(mood: MoodState) -> int:
+    return (ACTIVITY_CODES.get(mood.activity, 0)
+            | EMOTION_CODES.get(mood.emotion, 0) << 3
+            | bool(mood.sleeping) << 6)
+
+
+def unpack_state(code: int) -> tuple[str, str, bool]:
+    return ACTIVITIES[code & 7], EMOTIONS[code >> 3 & 7], bool(code & 64)
+
+
+def _tagged(samples: Iterator[Sample], session: str) -> Iterator[tuple[float, float, int, str]]:
+    for t, score, state in samples:
+        yield t, score, state, session
+
+
+class MoodRing:
+    """The last ``capacity`` samples of one session, oldest overwritten first.
+
+    Columns are preallocated typed arrays, so a ring costs
+    ``capacity * BYTES_PER_SAMPLE`` bytes however full it is. Samples are
+    appended in time order, which lets range lookups bisect.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be >= 1, got {capacity}")
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._scores = array("f", bytes(4 * capacity))
+        self._states = array("B", bytes(capacity))
+        self._start = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last(self) -> Optional[Sample]:
+        if not self._count:
+            return None
+        i = (self._start + self._count - 1) % self.capacity
+        return self._times[i], self._scores[i], self._states[i]
+
+    def append(self, t: float, score: float, state: int) -> None:
+        if self._count < self.capacity:
+            i = (self._start + self._count) % self.capacity
+            self._count += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._times[i] = t
+        self._scores[i] = score
+        self._states[i] = state
+
+    def _bisect(self, t: float) -> int:
+        """Logical index of the first sample at or after ``t``."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._times[(self._start + mid) % self.capacity] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start: float, end: float) -> Iterator[Sample]:
+        """Samples with ``start <= t < end``, oldest first."""
+        for k in range(self._bisect(start), self._bisect(end)):
+            i = (self._start + k) % self.capacity
+            yield self._times[i], self._scores[i], self._states[i]
+
+
+class MoodHistory:
+    """Recent moods per agent and session, for ``/history``.
+
+    ``observe`` is called on every poll and keeps a sample only when the
+    activity, emotion or sleeping state changed, or ``sample_interval``
+    seconds have passed since the session's last sample. Each agent keeps
+    rings for its ``max_sessions`` most recently seen sessions, so the
+    whole history is bounded by ``budget(agents)`` bytes.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.capacity = capacity
+        self.max_sessions = max_sessions
+        self.sample_interval = sample_interval
+        self._agents: dict[str, OrderedDict[str, MoodRing]] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, agents: int) -> int:
+        """Upper bound on bytes held by sample arrays for ``agents`` agents."""
+        return agents * self.max_sessions * self.capacity * BYTES_PER_SAMPLE
+
+    def observe(self, agent: str, session: str, mood: MoodState,
+                now: Optional[float] = None) -> bool:
+        """Record ``mood`` if it is a transition or a sample is due; returns whether it was."""
+        now = time.time() if now is None else now
+        state = pack_state(mood)
+        with self._lock:
+            rings = self._agents.setdefault(agent, OrderedDict())
+            ring = rings.get(session)
+            if ring is None:
+                ring = rings[session] = MoodRing(self.capacity)
+                while len(rings) > self.max_sessions:
+                    rings.popitem(last=False)
+            else:
+                rings.move_to_end(session)
+                last = ring.last
+                if last and last[2] == state and now - last[0] < self.sample_interval:
+                    return False
+                if last and now < last[0]:
+                    # Wall clock stepped back; keep the ring sorted.
+                    now = last[0]
+            ring.append(now, mood.sentiment_score, state)
+            return True
+
+    def sessions(self, agent: str) -> list[str]:
+        with self._lock:
+            return list(self._agents.get(agent, ()))
+
+    def query(self, agent: str, start: float, end: float,
+              step: Optional[float] = None) -> list[dict]:
+        """Samples of ``agent`` in ``[start, end)`` across its sessions, oldest first.
+
+        With ``step``, samples are grouped into buckets of ``step`` seconds
+        from ``start``; each bucket reports the mean score and the last
+        activity, emotion and sleeping state in it.
+        """
+        if step is not None and not (math.isfinite(start) and math.isfinite(step) and step > 0
+                                     and math.isfinite((end - start) / step)):
+            raise ValueError("step must be positive, and start and the bucket count finite")
+        with self._lock:
+            rings = list((self._agents.get(agent) or {}).items())
+            merged = list(heapq.merge(*[_tagged(ring.range(start, end), session)
+                                        for session, ring in rings]))
+        if not step:
+            return [self._point(t, score, state, session, 1)
+                    for t, score, state, session in merged]
+
+        points = []
+        bucket = None
+        total = 0.0
+        count = 0
+        last = None
+        for sample in merged:
+            index = int((sample[0] - start) // step)
+            if index != bucket and count:
+                points.append(self._point(start + bucket * step, total / count,
+                                          last[2], last[3], count))
+                total, count = 0.0, 0
+            bucket = index
+            total += sample[1]
+            count += 1
+            last = sample
+        if count:
+            points.append(self._point(start + bucket * step, total / count,
+                                      last[2], last[3], count))
+        return points
+
+    @staticmethod
+    def _point(t: float, score: float, state: int, session: str, count: int) -> dict:
+        activity, emotion, sleeping = unpack_state(state)
+        return {
+            "t": round(t, 3),
+            "session": session,
+            "activity": activity,
+            "emotion": emotion,
+            "score": round(score, 3),
+            "sleeping": sleeping,
+            "samples": count,
+        }
@@ -1,55 +1,401 @@
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
 import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from pathlib import Path
 from typing import Optional
 
+from core.metrics import REGISTRY
+from core.sentiment import scoring_version
 from core.state import MoodEngine, MoodState
-from parsers.base import AgentParser
+from parsers.base import AgentParser, ParsedSession
+from sprites.delta import DELTAS
+from .checkpoint import (
+    DEFAULT_CHECKPOINT_INTERVAL,
+    file_identity,
+    load_checkpoint,
+    message_from_row,
+    message_to_row,
+    save_checkpoint,
+)
+from .events import MoodBus, MoodChanged
+from .history import MoodHistory
+from .store import MoodStore
+from .schedule import DEFAULT_BACKOFF, AdaptiveInterval
+
+FIND_SESSION_SECONDS = REGISTRY.histogram(
+    "moodbot_find_active_session_seconds", "Time spent locating the active session", ("agent",))
+PARSE_SESSION_SECONDS = REGISTRY.histogram(
+    "moodbot_parse_session_seconds", "Time spent parsing the session tail", ("agent",))
+COMPUTE_SECONDS = REGISTRY.histogram(
+    "moodbot_compute_seconds", "Time spent in MoodEngine.compute", ("agent",))
+SPRITE_LOOKUP_SECONDS = REGISTRY.histogram(
+    "moodbot_sprite_lookup_seconds", "Time spent resolving the sprite bitmap", ("agent",))
+POLL_SECONDS = REGISTRY.histogram(
+    "moodbot_poll_seconds", "Total time of one monitor poll", ("agent",))
+POLLS = REGISTRY.counter(
+    "moodbot_polls_total", "Monitor polls by outcome (changed, unchanged, idle)",
+    ("agent", "result"))
+POLL_INTERVAL = REGISTRY.gauge(
+    "moodbot_poll_interval_seconds", "Current adaptive poll interval", ("agent",))
+POLL_ERRORS = REGISTRY.counter(
+    "moodbot_poll_errors_total", "Monitor polls that raised", ("agent",))
+POLL_OVERRUNS = REGISTRY.counter(
+    "moodbot_poll_overruns_total", "Monitor polls that ran past their deadline", ("agent",))
+
+# Most polls find the session unchanged and cost tens of microseconds, so
+# they are counted in plain ints flushed to POLLS in batches (and whenever
+# /metrics is scraped), and one poll in QUIET_POLL_SAMPLE times
+# find_active_session. POLL_SECONDS covers every poll that parsed or
+# changed the mood, plus the sampled ones.
+QUIET_POLL_SAMPLE = 32
+POLL_RESULTS = ("changed", "unchanged", "idle")
+
+_monitors: "weakref.WeakSet[AgentMonitor]" = weakref.WeakSet()
+_monitors_lock = threading.Lock()
+
+
+def _flush_poll_counts() -> None:
+    with _monitors_lock:
+        monitors = list(_monitors)
+    for monitor in monitors:
+        monitor.flush_metrics()
+
+
+REGISTRY.add_flush(_flush_poll_counts)
+
+DEFAULT_POLL_DEADLINE = 30.0
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+
+@dataclass(frozen=True)
+class MoodSnapshot:
+    """A mood state with its HTTP response body serialised once."""
+
+    mood: MoodState
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    built_at: float = field(default_factory=time.monotonic)
+
+    def newer_than(self, other: Optional["MoodSnapshot"]) -> bool:
+        return other is None or self.built_at > other.built_at
+
+    @classmethod
+    def build(cls, mood: MoodState) -> "MoodSnapshot":
+        data = mood.to_dict()
+        if mood.bitmap:
+            data["frame"], _ = DELTAS.register(mood.bitmap)
+        body = json.dumps(data).encode("utf-8")
+        return cls(
+            mood=mood,
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+            etag='"' + hashlib.sha1(body).hexdigest()[:16] + '"',
+        )
 
 
 class AgentMonitor:
-    def __init__(self, name: str, parser: AgentParser, engine: Optional[MoodEngine] = None):
+    def __init__(self, name: str, parser: AgentParser, engine: Optional[MoodEngine] = None,
+                 bus: Optional[MoodBus] = None, history: Optional[MoodHistory] = None,
+                 store: Optional[MoodStore] = None):
         self.name = name
         self.parser = parser
         self.engine = engine or MoodEngine()
-        self._current_mood: Optional[MoodState] = None
+        self.bus = bus
+        self.history = history
+        self.store = store
+        self._snapshot: Optional[MoodSnapshot] = None
         self._last_mtime: Optional[float] = None
         self._last_path: Optional[str] = None
+        # (path, inode, size, mtime) of the file _session was parsed from
+        self._last_file: Optional[tuple[str, int, int, float]] = None
+        self._session: Optional[ParsedSession] = None
+        self._sleep_at: Optional[float] = None
+        # Polls and sprite refreshes both publish; one at a time.
+        self._publish_lock = threading.Lock()
+        # Bumped only by the polling thread; unchanged polls are the rest.
+        self._polls = 0
+        self._changed_polls = 0
+        self._idle_polls = 0
+        self._flushed_counts = dict.fromkeys(POLL_RESULTS, 0)
+        self._flush_lock = threading.Lock()
+        with _monitors_lock:
+            _monitors.add(self)
 
     @property
     def current_mood(self) -> Optional[MoodState]:
-        return self._current_mood
+        snapshot = self._snapshot
+        return snapshot.mood if snapshot else None
+
+    @property
+    def snapshot(self) -> Optional[MoodSnapshot]:
+        return self._snapshot
+
+    @property
+    def sleep_at(self) -> Optional[float]:
+        """Unix time the current mood falls asleep unless the session changes."""
+        return self._sleep_at
+
+    def _publish(self, mood: MoodState) -> None:
+        snapshot = MoodSnapshot.build(mood)
+        with self._publish_lock:
+            self._publish_snapshot(snapshot)
+
+    def _publish_snapshot(self, snapshot: MoodSnapshot) -> None:
+        if self._snapshot and self._snapshot.body == snapshot.body:
+            return
+        self._snapshot = snapshot
+        if self.bus:
+            self.bus.publish(MoodChanged(self.name, snapshot))
+
+    def refresh_sprite(self) -> bool:
+        """Re-resolve the current mood's bitmap after the sprites changed.
+
+        Returns whether a new snapshot was published.
+        """
+        sprites = getattr(self.engine, "sprites", None)
+        with self._publish_lock:
+            snapshot = self._snapshot
+            if snapshot is None or sprites is None:
+                return False
+            mood = snapshot.mood
+            bitmap = sprites.lookup(mood.activity, mood.emotion, mood.variant,
+                                    sleeping=mood.sleeping)
+            if bitmap == mood.bitmap:
+                return False
+            self._publish_snapshot(MoodSnapshot.build(replace(mood, bitmap=bitmap)))
+            return True
 
     def poll(self) -> bool:
-        active = self.parser.find_active_session()
+        start = time.perf_counter()
+        before = self._snapshot
+        sampled = (self._polls + 1) % QUIET_POLL_SAMPLE == 0
+        file_changed = self._poll(sampled)
+        if file_changed is None:
+            self._idle_polls += 1
+        else:
+            self._record()
+            if self._snapshot is not before:
+                self._changed_polls += 1
+                sampled = True
+        self._polls += 1
+        if sampled or file_changed:
+            POLL_SECONDS.observe(time.perf_counter() - start, self.name)
+            self.flush_metrics()
+        return bool(file_changed)
+
+    def flush_metrics(self) -> None:
+        """Add the polls counted since the last flush to POLLS."""
+        with self._flush_lock:
+            # Read the total first: a poll still in flight may already be
+            # counted as changed or idle, never the other way round.
+            polls = self._polls
+            counts = {"changed": self._changed_polls, "idle": self._idle_polls}
+            counts["unchanged"] = polls - counts["changed"] - counts["idle"]
+            for result, count in counts.items():
+                flushed = self._flushed_counts[result]
+                if count > flushed:
+                    POLLS.inc(self.name, result, amount=count - flushed)
+                    self._flushed_counts[result] = count
+
+    def _record(self) -> None:
+        """Offer the current mood to the history; samples it keeps also go to the store."""
+        snapshot, path = self._snapshot, self._last_path
+        if not self.history or snapshot is None or path is None:
+            return
+        session = Path(path).stem
+        now = time.time()
+        if self.history.observe(self.name, session, snapshot.mood, now) and self.store:
+            self.store.append(self.name, session, snapshot.mood, now)
+
+    def _parse(self, active: Path) -> ParsedSession:
+        start = time.perf_counter()
+        session = self.parser.parse_session(active, last_n=self.engine.window)
+        PARSE_SESSION_SECONDS.observe(time.perf_counter() - start, self.name)
+        return session
+
+    def _compute(self, session: ParsedSession) -> MoodState:
+        start = time.perf_counter()
+        mood = self.engine.compute(session)
+        COMPUTE_SECONDS.observe(time.perf_counter() - start, self.name)
+        SPRITE_LOOKUP_SECONDS.observe(self.engine.last_lookup_seconds, self.name)
+        return mood
+
+    def _poll(self, timed: bool) -> Optional[bool]:
+        """Whether the session file changed, or None when there is no session."""
+        if timed:
+            start = time.perf_counter()
+            active = self.parser.find_active_session()
+            FIND_SESSION_SECONDS.observe(time.perf_counter() - start, self.name)
+        else:
+            active = self.parser.find_active_session()
         if not active:
-            return False
+            return None
 
         try:
-            mtime = active.stat().st_mtime
+            st = active.stat()
         except OSError:
-            return False
+            return None
+        mtime = st.st_mtime
 
         file_changed = str(active) != self._last_path or mtime != self._last_mtime
 
-        if not file_changed and self._current_mood is not None:
-            if not self._current_mood.sleeping:
-                session = self.parser.parse_session(active, last_n=100)
-                if self.engine._is_sleeping(session):
-                    self._current_mood = self.engine.compute(session)
+        if not file_changed and self._session is not None:
+            # Nothing new to parse; only the clock can move the mood on.
+            if self._sleep_at is not None and time.time() >= self._sleep_at:
+                self._update(self._session)
             return False
 
-        session = self.parser.parse_session(active, last_n=100)
-        self._current_mood = self.engine.compute(session)
+        self._update(self._parse(active))
         self._last_mtime = mtime
         self._last_path = str(active)
+        self._last_file = (str(active), st.st_ino, st.st_size, mtime)
         return file_changed
 
+    def _update(self, session: ParsedSession) -> None:
+        mood = self._compute(session)
+        self._publish(mood)
+        self._session = session
+        self._sleep_at = None if mood.sleeping else self.engine.sleep_at(session)
+
+    def checkpoint(self) -> dict:
+        """State a restarted monitor needs to skip its first parse."""
+        data = {"engine": self.engine.checkpoint()}
+        # Read the file identity before the session: a poll landing in
+        # between then leaves a newer session under an older identity,
+        # which fails validation rather than passing off stale messages.
+        parsed_from = self._last_file
+        session, snapshot = self._session, self._snapshot
+        if parsed_from and session is not None and snapshot is not None:
+            path, inode, size, mtime = parsed_from
+            data["session"] = {
+                "path": path, "inode": inode, "size": size, "mtime": mtime,
+                "last_modified": session.last_modified,
+                "messages": [message_to_row(m) for m in session.messages],
+                "mood": snapshot.mood.to_dict(),
+            }
+        return data
+
+    def restore(self, data: dict, keep_scores: bool = True) -> bool:
+        """Adopt a checkpoint; the session only if its file is exactly as it was then.
+
+        Returns whether the session was restored, making the next poll an
+        unchanged one.
+        """
+        self.engine.restore(data.get("engine") or {})
+        saved = data.get("session")
+        if not saved:
+            return False
+        try:
+            path = Path(saved["path"])
+            if file_identity(path) != (saved["inode"], saved["size"], saved["mtime"]):
+                return False
+            messages = [message_from_row(row, keep_scores) for row in saved["messages"]]
+            mood = MoodState(**saved["mood"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        session = ParsedSession(file_path=path, messages=messages,
+                                last_modified=saved.get("last_modified"))
+        self._publish(mood)
+        self._session = session
+        self._sleep_at = None if mood.sleeping else self.engine.sleep_at(session)
+        self._last_mtime = saved["mtime"]
+        self._last_path = str(path)
+        self._last_file = (str(path), saved["inode"], saved["size"], saved["mtime"])
+        return True
+
+
+@dataclass
+class MonitorHealth:
+    errors: int = 0
+    consecutive_errors: int = 0
+    overruns: int = 0
+    last_error: Optional[str] = None
+    last_success: Optional[float] = None
+    last_duration: Optional[float] = None
+    started: Optional[float] = None
+
+    def to_dict(self, deadline: float) -> dict:
+        now = time.monotonic()
+        running_for = now - self.started if self.started is not None else None
+        return {
+            "last_success_age": (round(now - self.last_success, 3)
+                                 if self.last_success is not None else None),
+            "errors": self.errors,
+            "consecutive_errors": self.consecutive_errors,
+            "last_error": self.last_error,
+            "overruns": self.overruns,
+            "last_duration": round(self.last_duration, 4) if self.last_duration is not None else None,
+            "overrunning": running_for is not None and running_for > deadline,
+        }
+
 
 class WatcherLoop:
-    def __init__(self, monitors: list[AgentMonitor], interval: float = 10.0):
+    """Polls each monitor on its own adaptive schedule.
+
+    Monitors start at ``interval``, drop to ``min_interval`` when their
+    session file changes and back off by ``backoff`` per idle poll up to
+    ``max_interval``. Without bounds every monitor polls at a fixed
+    ``interval``. Due times live in a heap, so the loop sleeps exactly until
+    the next monitor is due.
+
+    Polls run on a bounded pool, so a slow OpenCode query does not hold up
+    Claude Code. A monitor is rescheduled only once its poll finishes; one
+    running past ``poll_deadline`` is reported as overrunning. A poll that
+    raises is counted and retried with exponential backoff instead of
+    killing the loop.
+
+    With ``checkpoint_path``, monitor, engine and interval state is saved
+    there every ``checkpoint_interval`` seconds and on ``stop``, and
+    restored by ``start`` so the first polls after a restart skip parsing.
+
+    Every poll also offers the current mood to ``history``, and the
+    samples it keeps are appended to ``store`` if one is given.
+    """
+
+    def __init__(self, monitors: list[AgentMonitor], interval: float = 10.0,
+                 bus: Optional[MoodBus] = None, history: Optional[MoodHistory] = None,
+                 store: Optional[MoodStore] = None, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, backoff: float = DEFAULT_BACKOFF,
+                 poll_workers: Optional[int] = None,
+                 poll_deadline: float = DEFAULT_POLL_DEADLINE,
+                 checkpoint_path: Optional[Path] = None,
+                 checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.bus = bus or MoodBus()
+        self.history = history or MoodHistory()
+        self.store = store
+        for monitor in monitors:
+            monitor.bus = self.bus
+            monitor.history = self.history
+            monitor.store = store
         self.monitors = {m.name: m for m in monitors}
         self.interval = interval
+        floor = min_interval if min_interval is not None else interval
+        ceiling = max_interval if max_interval is not None else max(interval, floor)
+        self._intervals = {
+            m.name: AdaptiveInterval(floor, ceiling, backoff, current=interval) for m in monitors
+        }
+        self.poll_deadline = poll_deadline
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoint_lock = threading.Lock()
+        self._health = {m.name: MonitorHealth() for m in monitors}
+        self._pool = ThreadPoolExecutor(max_workers=poll_workers or max(1, len(monitors)),
+                                        thread_name_prefix="moodbot-poll")
+        # (due, seq, agent); agent None is the next checkpoint
+        self._schedule: list[tuple[float, int, Optional[str]]] = []
+        self._seq = itertools.count()
+        self._agents_body: Optional[tuple[tuple, bytes]] = None
         self._running = False
+        self._cond = threading.Condition()
         self._thread: Optional[threading.Thread] = None
 
     def get_mood(self, agent: str) -> Optional[MoodState]:
@@ -58,27 +404,173 @@ class WatcherLoop:
             return None
         return monitor.current_mood
 
+    def get_snapshot(self, agent: str) -> Optional[MoodSnapshot]:
+        monitor = self.monitors.get(agent)
+        if not monitor:
+            return None
+        return monitor.snapshot
+
+    def agents_body(self) -> bytes:
+        """The ``/mood`` listing, reassembled only when some snapshot changed."""
+        snapshots = tuple(m.snapshot for m in self.monitors.values())
+        cached = self._agents_body
+        if cached and all(a is b for a, b in zip(cached[0], snapshots)):
+            return cached[1]
+        parts = [
+            json.dumps(name).encode("utf-8") + b": " + (snap.body if snap else b"null")
+            for name, snap in zip(self.monitors, snapshots)
+        ]
+        body = b'{"agents": {' + b", ".join(parts) + b"}}"
+        self._agents_body = (snapshots, body)
+        return body
+
     @property
     def agent_names(self) -> list[str]:
         return list(self.monitors.keys())
 
+    def effective_interval(self, agent: str) -> Optional[float]:
+        """Seconds until ``agent`` is polled again after its latest poll."""
+        interval = self._intervals.get(agent)
+        return interval.current if interval else None
+
+    @property
+    def intervals(self) -> dict[str, float]:
+        return {name: interval.current for name, interval in self._intervals.items()}
+
+    def health(self) -> dict[str, dict]:
+        """Per-monitor poll health for ``/health``."""
+        with self._cond:
+            return {
+                name: {**h.to_dict(self.poll_deadline), "interval": self._intervals[name].current}
+                for name, h in self._health.items()
+            }
+
+    def refresh_sprites(self) -> list[str]:
+        """Republish every current mood whose sprite changed; returns those agents."""
+        return [name for name, m in self.monitors.items() if m.refresh_sprite()]
+
     def poll_all(self) -> None:
-        for monitor in self.monitors.values():
-            monitor.poll()
+        """Poll every monitor concurrently, waiting up to ``poll_deadline``."""
+        futures = [self._pool.submit(self._run_poll, name) for name in self.monitors]
+        wait(futures, timeout=self.poll_deadline)
+
+    def save_checkpoint(self) -> bool:
+        if not self.checkpoint_path:
+            return False
+        # A periodic save still running on the pool and the one in stop()
+        # would otherwise both write <path>.tmp; the later one also has the
+        # newer state, so it must be the one that lands.
+        with self._checkpoint_lock:
+            data = {
+                "scoring": scoring_version(),
+                "intervals": self.intervals,
+                "agents": {name: m.checkpoint() for name, m in self.monitors.items()},
+            }
+            try:
+                save_checkpoint(self.checkpoint_path, data)
+            except OSError:
+                return False
+        return True
+
+    def restore_checkpoint(self) -> list[str]:
+        """Restore saved state; returns the agents whose session was restored."""
+        data = load_checkpoint(self.checkpoint_path) if self.checkpoint_path else None
+        if not data:
+            return []
+        # Cached sentiment is only reusable if it was scored the same way.
+        keep_scores = data.get("scoring") == scoring_version()
+        for name, current in (data.get("intervals") or {}).items():
+            interval = self._intervals.get(name)
+            if interval and isinstance(current, (int, float)):
+                interval.current = min(max(current, interval.floor), interval.ceiling)
+        agents = data.get("agents") or {}
+        return [name for name, monitor in self.monitors.items()
+                if isinstance(agents.get(name), dict) and monitor.restore(agents[name], keep_scores)]
 
     def start(self) -> None:
         self._running = True
-        self.poll_all()
-        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._schedule = []
+        if self.checkpoint_path:
+            self.restore_checkpoint()
+            self._schedule.append(
+                (time.monotonic() + self.checkpoint_interval, next(self._seq), None))
+        futures = [self._pool.submit(self._poll_and_reschedule, name) for name in self.monitors]
+        wait(futures, timeout=self.poll_deadline)
+        self._thread = threading.Thread(target=self._loop, name="moodbot-watcher", daemon=True)
         self._thread.start()
 
     def stop(self) -> None:
-        self._running = False
+        with self._cond:
+            self._running = False
+            self._cond.notify()
         if self._thread:
             self._thread.join(timeout=self.interval + 1)
+        self.save_checkpoint()
+        self._pool.shutdown(wait=False)
+
+    def _run_poll(self, name: str) -> Optional[bool]:
+        """Poll one monitor, recording its health; None if the poll raised."""
+        health = self._health[name]
+        start = time.monotonic()
+        with self._cond:
+            health.started = start
+        changed = None
+        error = None
+        try:
+            changed = self.monitors[name].poll()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        duration = time.monotonic() - start
+        with self._cond:
+            health.started = None
+            health.last_duration = duration
+            if duration > self.poll_deadline:
+                health.overruns += 1
+                POLL_OVERRUNS.inc(name)
+            if error is None:
+                health.last_success = time.monotonic()
+                health.consecutive_errors = 0
+            else:
+                health.errors += 1
+                health.consecutive_errors += 1
+                health.last_error = error
+                POLL_ERRORS.inc(name)
+        return changed
+
+    def _retry_delay(self, name: str) -> float:
+        failures = self._health[name].consecutive_errors
+        return min(RETRY_BASE_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS)
+
+    def _poll_and_reschedule(self, name: str) -> None:
+        changed = self._run_poll(name)
+        if changed is None:
+            delay = self._retry_delay(name)
+        else:
+            delay = self._intervals[name].update(changed)
+            POLL_INTERVAL.set(delay, name)
+            # Wake exactly when the mood is due to fall asleep, even if the
+            # idle interval has backed off past that point.
+            sleep_at = self.monitors[name].sleep_at
+            if sleep_at is not None:
+                delay = max(0.0, min(delay, sleep_at - time.time()))
+        with self._cond:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._seq), name))
+            self._cond.notify()
 
     def _loop(self) -> None:
-        while self._running:
-            time.sleep(self.interval)
-            if self._running:
-                self.poll_all()
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                delay = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                if delay is None or delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, name = heapq.heappop(self._schedule)
+                if name is None:
+                    heapq.heappush(self._schedule, (
+                        time.monotonic() + self.checkpoint_interval, next(self._seq), None))
+            if name is None:
+                self._pool.submit(self.save_checkpoint)
+            else:
+                self._pool.submit(self._poll_and_reschedule, name)
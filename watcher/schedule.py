@@ -0,0 +1,32 @@
+from dataclasses import dataclass, field
+
+DEFAULT_BACKOFF = 2.0
+
+
+@dataclass
+class AdaptiveInterval:
+    """Poll interval that drops to ``floor`` on activity and backs off while idle.
+
+    Each idle poll multiplies the interval by ``backoff`` up to ``ceiling``;
+    any change resets it to ``floor``. With ``floor == ceiling`` it is a
+    fixed interval.
+    """
+
+    floor: float
+    ceiling: float
+    backoff: float = DEFAULT_BACKOFF
+    current: float = field(default=0.0)
+
+    def __post_init__(self):
+        if self.floor <= 0 or self.ceiling < self.floor:
+            raise ValueError(f"Invalid interval bounds: floor={self.floor}, ceiling={self.ceiling}")
+        if self.backoff < 1:
+            raise ValueError(f"Backoff must be >= 1, got {self.backoff}")
+        self.current = min(max(self.current or self.floor, self.floor), self.ceiling)
+
+    def update(self, changed: bool) -> float:
+        if changed:
+            self.current = self.floor
+        else:
+            self.current = min(self.current * self.backoff, self.ceiling)
+        return self.current
@@ -0,0 +1,250 @@
+import math
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from core.state import MoodState
+from .history import ACTIVITIES, ACTIVITY_CODES, EMOTION_CODES, EMOTIONS
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_ROLLUP_INTERVAL = 60.0
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_QUEUE_SIZE = 10000
+
+# Rollup resolutions in seconds, each built from the one before it.
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+_COUNTS = EMOTIONS + ACTIVITIES
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS samples (
+    t REAL NOT NULL,
+    agent TEXT NOT NULL,
+    session TEXT NOT NULL,
+    activity INTEGER NOT NULL,
+    emotion INTEGER NOT NULL,
+    sleeping INTEGER NOT NULL,
+    score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_agent_t ON samples (agent, t);
+CREATE INDEX IF NOT EXISTS samples_t ON samples (t);
+CREATE TABLE IF NOT EXISTS rollups (
+    agent TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    sleeping INTEGER NOT NULL,
+    {", ".join(f"{name} INTEGER NOT NULL" for name in _COUNTS)},
+    PRIMARY KEY (agent, resolution, bucket)
+) WITHOUT ROWID;
+"""
+
+# Minute buckets count samples; coarser ones add up the level below.
+_ROLLUP_FROM_SAMPLES = f"""
+INSERT OR REPLACE INTO rollups
+SELECT agent, :res, CAST(t / :res AS INTEGER) * :res AS b, COUNT(*), SUM(score), SUM(sleeping),
+       {", ".join(f"SUM(emotion = {i})" for i in range(len(EMOTIONS)))},
+       {", ".join(f"SUM(activity = {i})" for i in range(len(ACTIVITIES)))}
+FROM samples WHERE t >= :since GROUP BY agent, b
+"""
+_ROLLUP_FROM_ROLLUPS = f"""
+INSERT OR REPLACE INTO rollups
+SELECT agent, :res, bucket / :res * :res AS b, SUM(samples), SUM(score_sum), SUM(sleeping),
+       {", ".join(f"SUM({name})" for name in _COUNTS)}
+FROM rollups WHERE resolution = :source AND bucket >= :since GROUP BY agent, b
+"""
+
+# (t, agent, session, activity, emotion, sleeping, score)
+Row = tuple[float, str, str, int, int, int, float]
+
+
+def pick_resolution(span: float) -> str:
+    """The coarsest resolution that still gives a detailed chart of ``span`` seconds."""
+    if span <= RESOLUTIONS["day"]:
+        return "minute"
+    if span <= 60 * RESOLUTIONS["day"]:
+        return "hour"
+    return "day"
+
+
+class MoodStore:
+    """Every recorded mood sample on disk, with minute, hour and day rollups.
+
+    Samples are appended to a SQLite table indexed by ``(agent, t)``. A
+    background thread writes them in batches (dropping them if the queue
+    is full) and, every ``rollup_interval`` seconds, folds new samples into
+    per-minute buckets, minutes into hours and hours into days. Each bucket
+    holds the sample count, score sum, and counts per emotion band,
+    activity and sleeping, so a months-long chart reads a few hundred
+    rows instead of every sample.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 rollup_interval: float = DEFAULT_ROLLUP_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._conn = conn
+        self._thread = threading.Thread(target=self._run, name="moodbot-moodstore", daemon=True)
+        self._thread.start()
+
+    def append(self, agent: str, session: str, mood: MoodState,
+               now: Optional[float] = None) -> None:
+        row = (time.time() if now is None else now, agent, session,
+               ACTIVITY_CODES.get(mood.activity, 0), EMOTION_CODES.get(mood.emotion, 0),
+               int(mood.sleeping), mood.sentiment_score)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Write everything queued so far, roll it up and stop the writer."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def samples(self, agent: str, start: float, end: float) -> list[dict]:
+        """Raw samples of ``agent`` with ``start <= t < end``, oldest first."""
+        rows = self._read(
+            "SELECT t, session, activity, emotion, sleeping, score FROM samples "
+            "WHERE agent = ? AND t >= ? AND t < ? ORDER BY t",
+            (agent, start, end),
+        )
+        return [{
+            "t": t,
+            "session": session,
+            "activity": ACTIVITIES[activity],
+            "emotion": EMOTIONS[emotion],
+            "score": round(score, 3),
+            "sleeping": bool(sleeping),
+        } for t, session, activity, emotion, sleeping, score in rows]
+
+    def rollups(self, agent: str, start: float, end: float, resolution: str) -> list[dict]:
+        """Buckets of ``agent`` overlapping ``[start, end)`` at ``resolution``, oldest first."""
+        res = RESOLUTIONS[resolution]
+        if not math.isfinite(start):
+            raise ValueError("start must be finite to find its bucket")
+        rows = self._read(
+            f"SELECT bucket, samples, score_sum, sleeping, {', '.join(_COUNTS)} FROM rollups "
+            "WHERE agent = ? AND resolution = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (agent, res, math.floor(start / res) * res, end),
+        )
+        n_emotions = len(EMOTIONS)
+        return [{
+            "t": row[0],
+            "samples": row[1],
+            "score": round(row[2] / row[1], 3) if row[1] else 0.0,
+            "sleeping": row[3],
+            "emotions": dict(zip(EMOTIONS, row[4:4 + n_emotions])),
+            "activities": dict(zip(ACTIVITIES, row[4 + n_emotions:])),
+        } for row in rows]
+
+    def _rollup(self, conn: sqlite3.Connection, now: Optional[float] = None,
+                oldest_written: Optional[float] = None) -> None:
+        """Recompute every bucket from each resolution's watermark up to ``now``.
+
+        The watermark is the start of the bucket that was still open at the
+        previous pass, so partly filled buckets are refreshed next time.
+        Samples still queued during that pass can be older than it;
+        ``oldest_written``, the oldest sample written since, pulls the
+        watermark back to its bucket.
+        """
+        now = time.time() if now is None else now
+        source = None
+        with conn:
+            for name, res in RESOLUTIONS.items():
+                key = f"rollup_{name}"
+                row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+                since = int(row[0]) if row else 0
+                if oldest_written is not None:
+                    since = min(since, math.floor(oldest_written / res) * res)
+                params = {"res": res, "since": since, "source": source}
+                if source is None:
+                    conn.execute(_ROLLUP_FROM_SAMPLES, params)
+                else:
+                    conn.execute(_ROLLUP_FROM_ROLLUPS, params)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             (key, str(math.floor(now / res) * res)))
+                source = res
+
+    def _read(self, sql: str, params: tuple) -> list[tuple]:
+        with self._lock:
+            if self._conn is None:
+                return []
+            try:
+                return self._conn.execute(sql, params).fetchall()
+            except sqlite3.Error:
+                return []
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self) -> None:
+        conn = self._connect()
+        next_rollup = time.monotonic() + self.rollup_interval
+        oldest_written: Optional[float] = None
+        try:
+            while True:
+                batch: list[Row] = []
+                deadline = time.monotonic() + self.flush_interval
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        stop = True
+                        break
+                    batch.append(row)
+                if batch and self._write(conn, batch):
+                    oldest = min(row[0] for row in batch)
+                    if oldest_written is None or oldest < oldest_written:
+                        oldest_written = oldest
+                if stop or time.monotonic() >= next_rollup:
+                    try:
+                        self._rollup(conn, oldest_written=oldest_written)
+                        oldest_written = None
+                    except sqlite3.Error:
+                        pass
+                    next_rollup = time.monotonic() + self.rollup_interval
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list[Row]) -> bool:
+        try:
+            with conn:
+                conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        except sqlite3.Error:
+            self.dropped += len(batch)
+            return False
+        return True